@@ -3,7 +3,6 @@ from fastapi import APIRouter, Request, Response, Depends
 from fastapi.security import OAuth2PasswordRequestForm
 
 from api.auth.schemas.inputs import UserLogin, Token, PasswordRecovery, ResetPasswordUserInput
-from api.auth.services.auth_services import AuthServices
 from api.users.schemas.inputs import UserBasic
 from core.api_response import ApiResponse
 from core.auth import get_current_user
@@ -27,8 +26,8 @@ async def login_user(
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[TokenResponse]:
     api_response.logger.info('Login user in controller')
-    auth_service = AuthServices(request.app.database, api_response)
-    tokens = await auth_service.login_user(user_login)
+    auth_service = request.app.container.auth_services
+    tokens = await auth_service.login_user(user_login, request.headers.get('user-agent'))
     api_response.logger.info(f'User logged in controller')
     return tokens
 
@@ -46,7 +45,7 @@ async def refresh_token(
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[TokenResponse]:
     api_response.logger.info('Refresh token in controller')
-    auth_service = AuthServices(request.app.database, api_response)
+    auth_service = request.app.container.auth_services
     tokens = await auth_service.refresh_token(refresh_token_user.token)
     api_response.logger.info(f'Token refreshed in controller')
     return tokens
@@ -65,12 +64,31 @@ async def logout_user(
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel:
     api_response.logger.info('Logging out user in controller')
-    auth_service = AuthServices(request.app.database, api_response)
-    await auth_service.logout_user(token_data.id)
+    auth_service = request.app.container.auth_services
+    await auth_service.logout_user(token_data)
     api_response.logger.info(f'User logged out in controller')
     return
 
 
+@auth_router.post(
+    path="/logout-all",
+    tags=["auth"],
+    description="Logout user from all sessions",
+)
+@response_handler()
+async def logout_user_everywhere(
+        request: Request,
+        response: Response,
+        token_data: Annotated[TokenData, Depends(get_current_user)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+) -> ResponseModel:
+    api_response.logger.info('Logging out user from all sessions in controller')
+    auth_service = request.app.container.auth_services
+    await auth_service.logout_user_everywhere(token_data.id)
+    api_response.logger.info(f'User logged out of all sessions in controller')
+    return
+
+
 @auth_router.post(
     path="/token",
     tags=["auth"],
@@ -85,8 +103,8 @@ async def auth_user_token(
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> dict:
     api_response.logger.info('Authenticate user in controller')
-    auth_service = AuthServices(request.app.database, api_response)
-    tokens = await auth_service.auth_user_token(form_data)
+    auth_service = request.app.container.auth_services
+    tokens = await auth_service.auth_user_token(form_data, request.headers.get('user-agent'))
     api_response.logger.info(f'User authenticated in controller')
     return tokens.model_dump()
 
@@ -104,7 +122,7 @@ async def forgot_password(
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel:
     api_response.logger.info('Recovery password in controller')
-    auth_service = AuthServices(request.app.database, api_response)
+    auth_service = request.app.container.auth_services
     await auth_service.forgot_password(email_user.email)
     api_response.logger.info('Password reset email sent successfully in controller')
     return
@@ -123,7 +141,7 @@ async def reset_password(
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[UserBasic]:
     api_response.logger.info('Reset password in controller')
-    auth_service = AuthServices(request.app.database, api_response)
+    auth_service = request.app.container.auth_services
     password_updated = await auth_service.reset_password(password_data)
     api_response.logger.info('Password updated in controller')
     return password_updated
@@ -1,103 +1,122 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import EmailStr
 
 from api.auth.schemas.inputs import UserLogin, ResetPasswordUserInput
 from api.users.schemas.inputs import UserBasic
-from core.api_response import ApiResponse
+from core.api_response import RequestScoped
 from core.errors import UnauthorizedError
-from core.jwt_handler import create_random_token, decode_token, TokenType, create_token
+from core.jwt_handler import (create_random_token, decode_token, TokenType, create_token_pair,
+                              REFRESH_TOKEN_EXPIRE_DAYS)
 from core.security import verify_password, hash_password, confirmation_verify_user
 from models.response_model import LocationError
-from models.users import TokenData, TokenResponse
+from models.users import TokenData, TokenResponse, UsersModel
+from repositories.sessions import SessionsRepository
 from repositories.users import UsersRepository
 from services.email_sending_service import EmailService
 
 
-class AuthServices:
-    def __init__(self, db: AsyncIOMotorDatabase, api_response: ApiResponse):
+class AuthServices(RequestScoped):
+    logger_name = 'services.auth'
+
+    def __init__(self, db: AsyncIOMotorDatabase, email_service: EmailService):
         self.db = db
-        self.api_response = api_response
-        self.users_repository = UsersRepository(self.db, self.api_response)
-        self.email_service = EmailService()
+        self.users_repository = UsersRepository(self.db)
+        self.sessions_repository = SessionsRepository(self.db)
+        self.email_service = email_service
+
+    # Function to start a session of the user, with its first refresh token
+    async def start_session(self, user: UsersModel, device: str | None) -> TokenResponse:
+        session_id, jti = str(uuid4()), str(uuid4())
+        token_data = TokenData(**user.model_dump(), sid=session_id)
+        access_token, refresh_token = create_token_pair(token_data.model_dump(), jti)
+
+        await self.sessions_repository.create({
+            "id": session_id,
+            "user_id": user.id,
+            "jti": jti,
+            "device": device,
+            "expires_at": datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        })
+        return TokenResponse(access_token=access_token, refresh_token=refresh_token)
 
-    async def login_user(self, user_login: UserLogin) -> TokenResponse:
-        self.api_response.logger.info('Getting user in db')
+    async def login_user(self, user_login: UserLogin, device: str | None = None) -> TokenResponse:
+        self.logger.info('Getting user in db')
         user = await self.users_repository.get_user_by_username(user_login.username)
         await verify_password(user_login.password, user.password)
         await confirmation_verify_user(user.is_verified)
 
-        token_data = TokenData(**user.model_dump())
-        access_token = create_token(data=token_data.model_dump(), token_type=TokenType.ACCESS_TOKEN)
-        refresh_token = create_token(data=token_data.model_dump(), token_type=TokenType.REFRESH_TOKEN)
-        user.refresh_token = refresh_token
-
-        await self.users_repository.patch(user.id, user)
-        self.api_response.logger.info(f'User logged in service')
-        return TokenResponse(access_token=access_token, refresh_token=refresh_token)
+        tokens = await self.start_session(user, device)
+        self.logger.info('User logged in service')
+        return tokens
 
     async def refresh_token(self, refresh_token_user: str) -> TokenResponse:
-        self.api_response.logger.info('Verifying refresh token')
+        self.logger.info('Verifying refresh token')
         payload = decode_token(refresh_token_user, TokenType.REFRESH_TOKEN)
-
-        user = await self.users_repository.get_by_id(payload.get("id"))
-
-        if not refresh_token_user == user.refresh_token:
+        if not payload.get("jti") or not payload.get("sid"):
             raise UnauthorizedError(message="Invalid token", location=LocationError.Body)
 
-        token_data = TokenData(**user.model_dump())
-        new_access_token = create_token(data=token_data.model_dump(), token_type=TokenType.ACCESS_TOKEN)
-        new_refresh_token = create_token(data=token_data.model_dump(), token_type=TokenType.REFRESH_TOKEN)
-        user.refresh_token = new_refresh_token
+        token_data = TokenData(**payload)
+        new_jti = str(uuid4())
+        new_access_token, new_refresh_token = create_token_pair(token_data.model_dump(), new_jti)
 
-        await self.users_repository.patch(user.id, user)
-        self.api_response.logger.info(f'Token refreshed in service')
+        # Only the current refresh token of the session can be rotated
+        await self.sessions_repository.rotate(payload["sid"], payload["jti"], new_jti,
+                                              datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+        self.logger.info('Token refreshed in service')
         return TokenResponse(access_token=new_access_token, refresh_token=new_refresh_token)
 
-    async def logout_user(self, user_id: str):
-        self.api_response.logger.info('Getting user in db')
-        user = await self.users_repository.get_by_id(user_id)
-        user.refresh_token = None
-        await self.users_repository.patch(user.id, user)
-        self.api_response.logger.info(f'User logged out in service')
+    async def is_session_active(self, token_data: TokenData) -> bool:
+        return bool(token_data.sid) and await self.sessions_repository.is_active(token_data.sid)
+
+    async def logout_user(self, token_data: TokenData):
+        self.logger.info('Revoking session in db')
+        if token_data.sid:
+            await self.sessions_repository.revoke_session(token_data.sid)
+        self.logger.info('User logged out in service')
+
+    async def logout_user_everywhere(self, user_id: str):
+        self.logger.info('Revoking all sessions in db')
+        await self.sessions_repository.revoke_user(user_id)
+        self.logger.info('User logged out of all sessions in service')
 
-    async def auth_user_token(self, form_data) -> TokenResponse:
-        self.api_response.logger.info('Getting user in db')
+    async def auth_user_token(self, form_data, device: str | None = None) -> TokenResponse:
+        self.logger.info('Getting user in db')
         user = await self.users_repository.get_user_by_username(form_data.username)
         await verify_password(form_data.password, user.password)
 
-        token_data = TokenData(**user.model_dump())
-        access_token = create_token(data=token_data.model_dump(), token_type=TokenType.ACCESS_TOKEN)
-        refresh_token = create_token(data=token_data.model_dump(), token_type=TokenType.REFRESH_TOKEN)
-
-        self.api_response.logger.info(f'User authenticated in service')
-        return TokenResponse(access_token=access_token, refresh_token=refresh_token)
+        tokens = await self.start_session(user, device)
+        self.logger.info('User authenticated in service')
+        return tokens
 
     async def forgot_password(self, email_user: EmailStr) -> None:
-        self.api_response.logger.info('Getting user in db')
+        self.logger.info('Getting user in db')
         user = await self.users_repository.get_user_by_email(email_user)
 
         password_reset_token = create_random_token()
-        self.api_response.logger.info(f'Password reset created token')
+        self.logger.info('Password reset created token')
 
-        user.password_token = password_reset_token
-        await self.users_repository.patch(user.id, user)
+        await self.users_repository.patch(user.id, {"password_token": password_reset_token})
 
         await self.email_service.create_password_reset_message(user.id, email_user, password_reset_token)
-        self.api_response.logger.info(f'Password reset email sent successfully')
+        self.logger.info('Password reset email sent successfully')
 
     async def reset_password(self, password_data: ResetPasswordUserInput) -> UserBasic:
-        self.api_response.logger.info('Getting user in db')
+        self.logger.info('Getting user in db')
         user_found = await self.users_repository.get_by_id(password_data.user_id)
 
-        self.api_response.logger.info("Verify that the authenticated user can only access")
+        self.logger.info("Verify that the authenticated user can only access")
         if not user_found.password_token == password_data.token_password_reset:
             raise UnauthorizedError(message="Invalid token", location=LocationError.Body)
 
         hashed_password = await hash_password(password_data.new_password)
-        user_found.password = hashed_password
-        user_found.password_token = None
 
-        user_updated = await self.users_repository.patch(user_found.id, user_found)
+        user_updated = await self.users_repository.patch(user_found.id,
+                                                         {"password": hashed_password, "password_token": None})
+        # Whoever knew the old password is logged out
+        await self.sessions_repository.revoke_user(user_found.id)
         user = UserBasic(**user_updated.model_dump())
-        self.api_response.logger.info(f'Password updated in service')
+        self.logger.info('Password updated in service')
         return user
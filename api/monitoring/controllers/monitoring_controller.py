@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Request, Response
+from fastapi.params import Depends
+
+from api.monitoring.schemas.outputs import HealthStatus
+from core.api_response import ApiResponse
+from core.metrics import metrics
+from models.response_model import ResponseModel, Status
+from utils.response_handler import response_handler
+
+monitoring_router: APIRouter = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@monitoring_router.get(
+    path="/metrics",
+    tags=["monitoring"],
+    description="Request, database, bcrypt and SMTP metrics in the Prometheus text format",
+)
+async def get_metrics() -> Response:
+    return Response(content=metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@monitoring_router.get(
+    path="/health",
+    tags=["monitoring"],
+    description="Check the database connection and the use of its connection pool. The status is degraded when "
+                "the pool is close to full or requests are waiting for a connection, and 503 when the database "
+                "cannot be reached",
+)
+@response_handler()
+async def get_health(
+        request: Request,
+        response: Response,
+        api_response: ApiResponse = Depends(ApiResponse)
+) -> ResponseModel[HealthStatus]:
+    monitoring_service = request.app.container.monitoring_service
+
+    health = await monitoring_service.get_health()
+    if health.status == "unavailable":
+        api_response.status = Status.SERVICE_UNAVAILABLE
+    return health
@@ -0,0 +1,17 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class DatabaseHealth(BaseModel):
+    reachable: bool
+    ping_ms: float | None = None
+    connections_in_use: int
+    max_pool_size: int
+    pool_saturation: float
+    waiting_checkouts: int
+
+
+class HealthStatus(BaseModel):
+    status: Literal["ok", "degraded", "unavailable"]
+    database: DatabaseHealth
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import PyMongoError
+
+from api.monitoring.schemas.outputs import DatabaseHealth, HealthStatus
+from core.api_response import RequestScoped
+from core.config import settings
+from core.metrics import db_pool_connections_in_use, db_pool_waiting_checkouts
+
+
+class MonitoringService(RequestScoped):
+    logger_name = 'services.monitoring'
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+
+    async def _ping_database(self) -> float | None:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.db.command("ping"), timeout=settings.HEALTH_CHECK_TIMEOUT)
+        except (asyncio.TimeoutError, PyMongoError) as error:
+            self.logger.error('Database ping failed', error=error)
+            return None
+        return (time.perf_counter() - start) * 1000
+
+    async def get_health(self) -> HealthStatus:
+        ping_ms = await self._ping_database()
+        # Pool usage as seen by the driver event listeners. DB_MAX_POOL_SIZE is the size of the pool of each
+        # server, so the saturation is the one of the busiest pool
+        connections_by_server = db_pool_connections_in_use.values()
+        connections_in_use = int(sum(connections_by_server.values()))
+        waiting_checkouts = int(sum(db_pool_waiting_checkouts.values().values()))
+        pool_saturation = max(connections_by_server.values(), default=0) / settings.DB_MAX_POOL_SIZE
+
+        if ping_ms is None:
+            status = "unavailable"
+        elif pool_saturation >= settings.DB_POOL_SATURATION_THRESHOLD or waiting_checkouts:
+            status = "degraded"
+        else:
+            status = "ok"
+        self.logger.info('Health status', status=status)
+        return HealthStatus(status=status, database=DatabaseHealth(
+            reachable=ping_ms is not None,
+            ping_ms=ping_ms,
+            connections_in_use=connections_in_use,
+            max_pool_size=settings.DB_MAX_POOL_SIZE,
+            pool_saturation=pool_saturation,
+            waiting_checkouts=waiting_checkouts,
+        ))
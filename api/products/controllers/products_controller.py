@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Request, Response
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Request, Response, Query
 from fastapi.params import Depends
+from fastapi.responses import StreamingResponse
 
-from api.products.schemas.inputs import ProductInput, PatchProductInput
-from api.products.services.products_services import ProductsService
+from api.products.schemas.inputs import (ProductBatchGetInput, ProductDisableFilter, ProductInput, PatchProductInput,
+                                        ProductSearchInput)
+from api.products.schemas.outputs import BulkDisableResult, BulkImportResult, ProductsBatch, ProductsSummary
 from core.api_response import ApiResponse
-from models.products import ProductsModel
+from core.conditional import collection_etag, document_etag, has_conditional_headers, is_not_modified, \
+    not_modified_response, set_validators
+from core.config import settings
+from models.products import ProductsModel, PartialProductsModel
 from models.response_model import ResponseModel
 from utils.response_handler import response_handler
 
@@ -14,9 +21,10 @@ products_router: APIRouter = APIRouter(prefix="/products")
 @products_router.post(
     path="",
     tags=["products"],
-    description="Create a new product",
+    description="Create a new product. Retries with the same Idempotency-Key header get the response of the first "
+                "request without creating the product again",
 )
-@response_handler()
+@response_handler(idempotent=True)
 async def create_product(
         request: Request,
         response: Response,
@@ -24,17 +32,101 @@ async def create_product(
         api_response: ApiResponse = Depends(ApiResponse)
 ) -> ResponseModel[ProductsModel]:
     api_response.logger.info('Creating product in controller')
-    product_service = ProductsService(request.app.database, api_response)
+    product_service = request.app.container.products_service
 
     product_created = await product_service.create_product(product_input)
     api_response.logger.info(f'Product created in controller')
     return product_created
 
 
+@products_router.get(
+    path="/search",
+    tags=["products"],
+    description="Search products by category, brand, supplier and price range, with an optional text search "
+                "over the product name",
+)
+@response_handler()
+async def search_products(
+        request: Request,
+        response: Response,
+        search: Annotated[ProductSearchInput, Query()],
+        api_response: ApiResponse = Depends(ApiResponse)
+) -> ResponseModel[list[ProductsModel]]:
+    api_response.logger.info('Searching products in controller')
+    product_service = request.app.container.products_service
+
+    products_found = await product_service.search_products(search)
+    api_response.logger.info(f'Products found in controller')
+    return products_found
+
+
+@products_router.post(
+    path="/batch-get",
+    tags=["products"],
+    description=f"Get up to {settings.BATCH_GET_MAX_IDS} products by id in one request, in the order of the ids. "
+                "The ids not found are returned in missing_ids. With fields, only those fields are returned",
+)
+@response_handler()
+async def batch_get_products(
+        request: Request,
+        response: Response,
+        batch_input: ProductBatchGetInput,
+        api_response: ApiResponse = Depends(ApiResponse)
+) -> ResponseModel[ProductsBatch]:
+    api_response.logger.info('Getting products by id in controller')
+    product_service = request.app.container.products_service
+
+    products_batch = await product_service.get_products_by_ids(batch_input)
+    api_response.logger.info('Products found by id in controller')
+    return products_batch
+
+
+@products_router.get(
+    path="/stats",
+    tags=["products"],
+    description="Get the number of active products, the average price and the total quantity by category, brand "
+                "and supplier, and the number of products by price range. The summary is kept up to date by every "
+                "product write, with live=true it is computed from the products collection",
+)
+@response_handler()
+async def get_products_summary(
+        request: Request,
+        response: Response,
+        live: bool = False,
+        api_response: ApiResponse = Depends(ApiResponse)
+) -> ResponseModel[ProductsSummary]:
+    api_response.logger.info('Getting products summary in controller')
+    product_service = request.app.container.products_service
+
+    products_summary = await product_service.get_products_summary(live)
+    api_response.logger.info(f'Products summary found in controller')
+    return products_summary
+
+
+@products_router.post(
+    path="/stats/rebuild",
+    tags=["products"],
+    description="Compute the products summary again from the products collection",
+)
+@response_handler()
+async def rebuild_products_summary(
+        request: Request,
+        response: Response,
+        api_response: ApiResponse = Depends(ApiResponse)
+) -> ResponseModel[ProductsSummary]:
+    api_response.logger.info('Rebuilding products summary in controller')
+    product_service = request.app.container.products_service
+
+    products_summary = await product_service.rebuild_products_summary()
+    api_response.logger.info(f'Products summary rebuilt in controller')
+    return products_summary
+
+
 @products_router.get(
     path="/{product_id}",
     tags=["products"],
-    description="Get a product by id",
+    description="Get a product by id. Sends an ETag and Last-Modified, and 304 when If-None-Match or "
+                "If-Modified-Since show the product did not change",
 )
 @response_handler()
 async def get_product_by_id(
@@ -44,9 +136,18 @@ async def get_product_by_id(
         api_response: ApiResponse = Depends(ApiResponse)
 ) -> ResponseModel[ProductsModel]:
     api_response.logger.info('Getting product in controller')
-    product_service = ProductsService(request.app.database, api_response)
+    product_service = request.app.container.products_service
+
+    # Polling clients are answered from the update_at alone when they already have the current product
+    if has_conditional_headers(request):
+        update_at = await product_service.get_product_update_at(product_id)
+        etag = document_etag(product_id, update_at)
+        if is_not_modified(request, etag, update_at):
+            api_response.logger.info(f'Product not modified in controller')
+            return not_modified_response(etag, update_at)
 
     product_found = await product_service.get_product_by_id(product_id)
+    set_validators(response, document_etag(product_found.id, product_found.update_at), product_found.update_at)
     api_response.logger.info(f'Product found in controller')
     return product_found
 
@@ -54,18 +155,38 @@ async def get_product_by_id(
 @products_router.get(
     path="/all/",
     tags=["products"],
-    description="Get all products",
+    description="Get all products, one page at a time. The next page cursor is sent in the X-Next-Cursor header. "
+                "The ETag changes with every write to the products, and 304 is sent while it matches If-None-Match. "
+                "With stream=true every product after the cursor is sent as NDJSON",
 )
 @response_handler()
 async def get_all_products(
         request: Request,
         response: Response,
+        limit: Annotated[int, Query(ge=1, le=settings.PAGE_MAX_LIMIT)] = settings.PAGE_DEFAULT_LIMIT,
+        cursor: str | None = None,
+        fields: Annotated[list[str] | None, Query()] = None,
+        stream: bool = False,
         api_response: ApiResponse = Depends(ApiResponse)
-) -> ResponseModel[list[ProductsModel]]:
+) -> ResponseModel[list[PartialProductsModel]]:
     api_response.logger.info('Getting all products in controller')
-    product_service = ProductsService(request.app.database, api_response)
+    product_service = request.app.container.products_service
+
+    if stream:
+        return StreamingResponse(product_service.stream_all_products(cursor, fields),
+                                 media_type="application/x-ndjson")
 
-    all_products = await product_service.get_all_products()
+    # The version is read first, so a write during the read gives a newer version on the next request
+    version, last_modified = await product_service.get_products_version()
+    etag = collection_etag('products', version)
+    if is_not_modified(request, etag, last_modified):
+        api_response.logger.info(f'Products not modified in controller')
+        return not_modified_response(etag, last_modified)
+
+    all_products, next_cursor = await product_service.get_all_products(limit, cursor, fields)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    set_validators(response, etag, last_modified)
     api_response.logger.info(f'All products found in controller')
     return all_products
 
@@ -84,7 +205,7 @@ async def update_product(
         api_response: ApiResponse = Depends(ApiResponse)
 ) -> ResponseModel[ProductsModel]:
     api_response.logger.info('Updating some product data in controller')
-    product_service = ProductsService(request.app.database, api_response)
+    product_service = request.app.container.products_service
 
     product_updated = await product_service.update_product(product_id, update_data)
     api_response.logger.info(f'Product updated some data in controller')
@@ -105,7 +226,7 @@ async def update_all_product(
         api_response: ApiResponse = Depends(ApiResponse)
 ) -> ResponseModel[ProductsModel]:
     api_response.logger.info('Updating all product in controller')
-    product_service = ProductsService(request.app.database, api_response)
+    product_service = request.app.container.products_service
 
     product_all_updated = await product_service.update_all_product(product_id, product_data)
     api_response.logger.info(f'Product all updated in controller')
@@ -115,7 +236,7 @@ async def update_all_product(
 @products_router.patch(
     path="/disable/{product_id}",
     tags=["products"],
-    description="Disable product",
+    description="Disable product. It can be restored for SOFT_DELETE_RETENTION_DAYS days, then it is removed",
 )
 @response_handler()
 async def disable_product(
@@ -125,13 +246,54 @@ async def disable_product(
         api_response: ApiResponse = Depends(ApiResponse)
 ) -> ResponseModel:
     api_response.logger.info('Disabling product in controller')
-    product_service = ProductsService(request.app.database, api_response)
+    product_service = request.app.container.products_service
 
     await product_service.disable_product(product_id)
     api_response.logger.info(f'Product disabled in controller')
     return
 
 
+@products_router.patch(
+    path="/restore/{product_id}",
+    tags=["products"],
+    description="Restore a disabled product",
+)
+@response_handler()
+async def restore_product(
+        request: Request,
+        response: Response,
+        product_id: str,
+        api_response: ApiResponse = Depends(ApiResponse)
+) -> ResponseModel:
+    api_response.logger.info('Restoring product in controller')
+    product_service = request.app.container.products_service
+
+    await product_service.restore_product(product_id)
+    api_response.logger.info('Product restored in controller')
+    return
+
+
+@products_router.patch(
+    path="/bulk/disable",
+    tags=["products"],
+    description="Disable every active product of a supplier, category or brand. Returns the number of products "
+                "disabled",
+)
+@response_handler()
+async def bulk_disable_products(
+        request: Request,
+        response: Response,
+        disable_filter: ProductDisableFilter,
+        api_response: ApiResponse = Depends(ApiResponse)
+) -> ResponseModel[BulkDisableResult]:
+    api_response.logger.info('Disabling products in controller')
+    product_service = request.app.container.products_service
+
+    disable_result = await product_service.disable_products(disable_filter)
+    api_response.logger.info('Products disabled in controller')
+    return disable_result
+
+
 @products_router.delete(
     path="/delete/{product_id}",
     tags=["products"],
@@ -145,8 +307,49 @@ async def delete_product(
         api_response: ApiResponse = Depends(ApiResponse)
 ) -> ResponseModel:
     api_response.logger.info('Deleting product in controller')
-    product_service = ProductsService(request.app.database, api_response)
+    product_service = request.app.container.products_service
 
     await product_service.delete_product(product_id)
     api_response.logger.info(f'Product deleted in controller')
     return
+
+
+@products_router.post(
+    path="/bulk",
+    tags=["products"],
+    description="Create products in bulk from a text/csv or application/x-ndjson body, with the ProductInput fields. "
+                "Returns the number of products created and the errors of each rejected row",
+)
+@response_handler()
+async def bulk_import_products(
+        request: Request,
+        response: Response,
+        api_response: ApiResponse = Depends(ApiResponse)
+) -> ResponseModel[BulkImportResult]:
+    api_response.logger.info('Importing products in controller')
+    product_service = request.app.container.products_service
+
+    import_result = await product_service.bulk_import_products(request.stream(),
+                                                               request.headers.get("content-type", ""))
+    api_response.logger.info(f'Products imported in controller')
+    return import_result
+
+
+@products_router.get(
+    path="/bulk/export",
+    tags=["products"],
+    description="Export all products as csv or ndjson, with the same fields accepted by the bulk import",
+)
+@response_handler()
+async def bulk_export_products(
+        request: Request,
+        response: Response,
+        export_format: Annotated[Literal["csv", "ndjson"], Query(alias="format")] = "ndjson",
+        api_response: ApiResponse = Depends(ApiResponse)
+) -> ResponseModel:
+    api_response.logger.info('Exporting products in controller')
+    product_service = request.app.container.products_service
+
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(product_service.export_products(export_format), media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename=products.{export_format}"})
@@ -1,4 +1,10 @@
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, Field, model_validator
+
+from core.config import settings
+from core.errors import InvalidParameterError
+from models.response_model import LocationError
 
 
 class ProductInput(BaseModel):
@@ -21,3 +27,44 @@ class PatchProductInput(BaseModel):
     product_quantity_presentation: int | None = None
     product_price: float | None = None
     supplier_name: str | None = None
+
+
+class ProductBatchGetInput(BaseModel):
+    ids: list[str] = Field(min_length=1, max_length=settings.BATCH_GET_MAX_IDS)
+    fields: list[str] | None = None
+
+
+# Products of a supplier, category or brand, at least one of them is required
+class ProductDisableFilter(BaseModel):
+    supplier_name: str | None = None
+    product_category: str | None = None
+    product_brand: str | None = None
+
+    @model_validator(mode='after')
+    def validate_filter(self):
+        if self.supplier_name is None and self.product_category is None and self.product_brand is None:
+            raise InvalidParameterError(message='supplier_name, product_category or product_brand is required',
+                                        location=LocationError.Body)
+        return self
+
+
+class ProductSearchInput(BaseModel):
+    q: str | None = None
+    product_category: str | None = None
+    product_brand: str | None = None
+    supplier_name: str | None = None
+    min_price: float | None = Field(default=None, ge=0)
+    max_price: float | None = Field(default=None, ge=0)
+    sort_by: Literal["relevance", "create_at", "product_name", "product_price"] | None = None
+    sort_order: Literal["asc", "desc"] = "asc"
+    limit: int = Field(default=settings.PAGE_DEFAULT_LIMIT, ge=1, le=settings.PAGE_MAX_LIMIT)
+    skip: int = Field(default=0, ge=0)
+
+    @model_validator(mode='after')
+    def validate_search(self):
+        if self.min_price is not None and self.max_price is not None and self.min_price > self.max_price:
+            raise InvalidParameterError(message='min_price must be lower than max_price', location=LocationError.Params)
+        if self.sort_by == 'relevance' and not self.q:
+            raise InvalidParameterError(message='Sorting by relevance requires a search text',
+                                        location=LocationError.Params)
+        return self
@@ -0,0 +1,50 @@
+from pydantic import BaseModel
+
+from models.products import PartialProductsModel
+
+
+class BulkRowError(BaseModel):
+    row: int
+    product_code: int | None = None
+    message: str
+
+
+class BulkImportResult(BaseModel):
+    received: int = 0
+    inserted: int = 0
+    failed: int = 0
+    errors: list[BulkRowError] = []
+
+
+# Products in the order of the requested ids, each id once
+class ProductsBatch(BaseModel):
+    products: list[PartialProductsModel] = []
+    missing_ids: list[str] = []
+
+
+class BulkDisableResult(BaseModel):
+    disabled: int = 0
+
+
+class ProductGroupStats(BaseModel):
+    value: str
+    count: int
+    average_price: float
+    total_quantity: int
+
+
+# The "other" range, with the prices outside the configured ranges, has no limits
+class PriceRangeStats(BaseModel):
+    min_price: float | None = None
+    max_price: float | None = None
+    count: int
+
+
+class ProductsSummary(BaseModel):
+    total_products: int = 0
+    average_price: float = 0
+    total_quantity: int = 0
+    categories: list[ProductGroupStats] = []
+    brands: list[ProductGroupStats] = []
+    suppliers: list[ProductGroupStats] = []
+    price_ranges: list[PriceRangeStats] = []
@@ -1,75 +1,369 @@
+import asyncio
+import bisect
+import csv
+import io
+import json
 from datetime import datetime
+from typing import AsyncIterator
 
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import ValidationError
 
-from api.products.schemas.inputs import ProductInput, PatchProductInput
-from core.api_response import ApiResponse
+from api.products.schemas.inputs import (ProductBatchGetInput, ProductDisableFilter, ProductInput, PatchProductInput,
+                                        ProductSearchInput)
+from api.products.schemas.outputs import (BulkDisableResult, BulkImportResult, BulkRowError, PriceRangeStats,
+                                         ProductGroupStats, ProductsBatch, ProductsSummary)
+from core.api_response import RequestScoped
+from core.config import settings
+from core.errors import InvalidParameterError
+from models.products import ProductsModel, PartialProductsModel
+from models.response_model import LocationError
+from repositories.products import ProductSearchFilter, ProductsRepository
+from repositories.products_summary import (OTHER_PRICE_RANGE, PRICE_RANGE_DIMENSION, SUMMARY_GROUP_FIELDS,
+                                           TOTAL_DIMENSION)
+from utils.streaming import iter_lines, iter_ndjson
 
-from models.products import ProductsModel
-from repositories.products import ProductsRepository
+BULK_FIELDS = list(ProductInput.model_fields)
 
 
-class ProductsService:
-    def __init__(self, db: AsyncIOMotorDatabase, api_response: ApiResponse):
+class ProductsService(RequestScoped):
+    logger_name = 'services.products'
+
+    def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
-        self.api_response = api_response
-        self.products_repository = ProductsRepository(self.db, self.api_response)
+        self.products_repository = ProductsRepository(self.db)
+        self.products_summary_repository = self.products_repository.summary_repository
+        # Rebuild in progress, shared by the requests that ask for one while it runs
+        self._summary_rebuild: asyncio.Future | None = None
 
     async def create_product(self, product_input: ProductInput) -> ProductsModel:
-        self.api_response.logger.info('Check product in db')
+        self.logger.info('Check product in db')
         await self.products_repository.check_if_the_product_exists(product_input.product_code)
 
         product_created = await self.products_repository.create(product_input.model_dump())
-        self.api_response.logger.info(f'Product created in service')
+        self.logger.info('Product created in service')
         return product_created
 
     async def get_product_by_id(self, product_id: str) -> ProductsModel:
-        self.api_response.logger.info('Getting product in db')
+        self.logger.info('Getting product in db')
         product_found = await self.products_repository.get_by_id(product_id)
-        self.api_response.logger.info(f'Product found in service')
+        self.logger.info('Product found in service')
         return product_found
 
-    async def get_all_products(self) -> list[ProductsModel]:
-        self.api_response.logger.info('Getting all products in db')
-        all_products = await self.products_repository.get_all()
-        self.api_response.logger.info(f'All products found in service')
-        return all_products
+    async def get_products_by_ids(self, batch_input: ProductBatchGetInput) -> ProductsBatch:
+        self.logger.info('Getting products by id in db', count=len(batch_input.ids))
+        if batch_input.fields:
+            documents, missing_ids = await self.products_repository.get_many(batch_input.ids, batch_input.fields)
+            products = [PartialProductsModel.model_validate(document) for document in documents]
+        else:
+            # Whole products come from the cache, the misses are read in one query by the batch loader
+            unique_ids = list(dict.fromkeys(batch_input.ids))
+            products_found = await asyncio.gather(
+                *(self.products_repository.get_by_id(product_id, raise_exception=False) for product_id in unique_ids))
+            products = [PartialProductsModel.model_validate(product.model_dump())
+                        for product in products_found if product]
+            missing_ids = [product_id for product_id, product in zip(unique_ids, products_found) if not product]
+        self.logger.info('Products found in service', count=len(products), missing=len(missing_ids))
+        return ProductsBatch(products=products, missing_ids=missing_ids)
+
+    async def get_product_update_at(self, product_id: str) -> datetime:
+        return await self.products_repository.get_update_at(product_id)
+
+    async def get_products_version(self) -> tuple[int, datetime | None]:
+        return await self.products_repository.get_collection_version()
+
+    async def get_all_products(self, limit: int, cursor: str | None = None,
+                               fields: list[str] | None = None) -> tuple[list[PartialProductsModel], str | None]:
+        self.logger.info('Getting all products in db')
+        documents, next_cursor = await self.products_repository.get_all(limit, cursor, fields)
+        all_products = [PartialProductsModel.model_validate(document) for document in documents]
+        self.logger.info('All products found in service')
+        return all_products, next_cursor
+
+    def stream_all_products(self, cursor: str | None = None, fields: list[str] | None = None) -> AsyncIterator[str]:
+        self.logger.info('Streaming all products from db')
+        documents = self.products_repository.stream_all(cursor, fields)
+        return iter_ndjson(documents, PartialProductsModel)
+
+    async def search_products(self, search: ProductSearchInput) -> list[ProductsModel]:
+        self.logger.info('Searching products in db')
+        documents = await self.products_repository.search(ProductSearchFilter(**search.model_dump()))
+        products_found = [ProductsModel.model_validate(document) for document in documents]
+        self.logger.info('Products found in service')
+        return products_found
+
+    @staticmethod
+    def _build_summary(documents: list[dict]) -> ProductsSummary:
+        summary = ProductsSummary()
+        groups = {dimension: [] for dimension in SUMMARY_GROUP_FIELDS}
+        boundaries = settings.PRODUCT_PRICE_RANGES
+        for document in documents:
+            dimension, value, count = document["dimension"], document["value"], document["count"]
+            if dimension == TOTAL_DIMENSION:
+                summary.total_products = count
+                summary.average_price = document["price_sum"] / count if count else 0
+                summary.total_quantity = document["quantity_sum"]
+            elif count <= 0:
+                continue
+            elif dimension in groups:
+                groups[dimension].append(ProductGroupStats(value=value, count=count,
+                                                           average_price=document["price_sum"] / count,
+                                                           total_quantity=document["quantity_sum"]))
+            elif dimension == PRICE_RANGE_DIMENSION and value == OTHER_PRICE_RANGE:
+                summary.price_ranges.append(PriceRangeStats(count=count))
+            elif dimension == PRICE_RANGE_DIMENSION:
+                upper_index = bisect.bisect_right(boundaries, value)
+                max_price = boundaries[upper_index] if upper_index < len(boundaries) else None
+                summary.price_ranges.append(PriceRangeStats(min_price=value, max_price=max_price, count=count))
+
+        for dimension, stats in groups.items():
+            setattr(summary, dimension, sorted(stats, key=lambda group: (-group.count, group.value)))
+        summary.price_ranges.sort(key=lambda price_range: (price_range.min_price is None,
+                                                           price_range.min_price or 0))
+        return summary
+
+    async def get_products_summary(self, live: bool = False) -> ProductsSummary:
+        self.logger.info('Getting products summary')
+        if live:
+            return self._build_summary(await self.products_repository.aggregate_summary())
+
+        documents = await self.products_summary_repository.get_documents()
+        if documents is None:
+            return await self.rebuild_products_summary()
+        self.logger.info('Products summary found in service')
+        return self._build_summary(documents)
+
+    async def _rebuild_summary_documents(self) -> list[dict]:
+        documents = await self.products_repository.aggregate_summary()
+        await self.products_summary_repository.replace(documents)
+        return documents
+
+    async def rebuild_products_summary(self) -> ProductsSummary:
+        self.logger.info('Rebuilding products summary')
+        if self._summary_rebuild is None:
+            self._summary_rebuild = asyncio.ensure_future(self._rebuild_summary_documents())
+            self._summary_rebuild.add_done_callback(self._end_summary_rebuild)
+        # A cancelled request does not cancel the rebuild the other requests are waiting for
+        documents = await asyncio.shield(self._summary_rebuild)
+        self.logger.info('Products summary rebuilt in service')
+        return self._build_summary(documents)
+
+    def _end_summary_rebuild(self, rebuild: asyncio.Future) -> None:
+        self._summary_rebuild = None
+        # Mark the exception as retrieved when every waiting request was cancelled
+        if not rebuild.cancelled():
+            rebuild.exception()
 
     async def update_product(self, product_id: str, update_data: PatchProductInput) -> ProductsModel:
-        self.api_response.logger.info('Getting product in db')
-        await self.products_repository.get_by_id(product_id)
+        self.logger.info('Check product in db')
         await self.products_repository.check_if_the_product_exists(update_data.product_code)
 
-        product_updated = await self.products_repository.update(product_id, update_data.model_dump())
-        self.api_response.logger.info(f'Product updated data in service')
+        product_updated = await self.products_repository.patch(product_id, update_data)
+        self.logger.info('Product updated data in service')
         return product_updated
 
     async def update_all_product(self, product_id: str, product_data: ProductInput) -> ProductsModel:
-        self.api_response.logger.info('Getting product in db')
+        self.logger.info('Check product in db')
         await self.products_repository.check_if_the_product_exists(product_data.product_code)
-        product = await self.products_repository.get_by_id(product_id)
-
-        product.update_at = datetime.utcnow()
-        product.product_code = product_data.product_code
-        product.product_name = product_data.product_name
-        product.product_category = product_data.product_category
-        product.product_brand = product_data.product_brand
-        product.product_unit_presentation = product_data.product_unit_presentation
-        product.product_quantity_presentation = product_data.product_quantity_presentation
-        product.product_price = product_data.product_price
-        product.supplier_name = product_data.supplier_name
-        product_all_updated = await self.products_repository.update_all(product_id, product.model_dump())
-        print(f'Product all updated in service')
+
+        product_all_updated = await self.products_repository.update_all(product_id, product_data)
+        self.logger.info('Product all updated in service')
         return product_all_updated
 
     async def disable_product(self, product_id: str) -> None:
-        self.api_response.logger.info('Getting product in db')
-        product = await self.products_repository.get_by_id(product_id)
-        product.is_deleted = True
+        await self.products_repository.disable(product_id)
+        self.logger.info('Product disabled in service')
 
-        await self.products_repository.disable(product_id, product.model_dump())
-        self.api_response.logger.info(f'Product disabled in service')
+    async def restore_product(self, product_id: str) -> None:
+        await self.products_repository.restore(product_id)
+        self.logger.info('Product restored in service')
+
+    async def disable_products(self, disable_filter: ProductDisableFilter) -> BulkDisableResult:
+        disabled = await self.products_repository.disable_many(disable_filter.model_dump(exclude_none=True))
+        self.logger.info('Products disabled in service', count=disabled)
+        return BulkDisableResult(disabled=disabled)
 
     async def delete_product(self, product_id: str) -> None:
         await self.products_repository.delete(product_id)
-        self.api_response.logger.info(f'Product deleted in service')
+        self.logger.info('Product deleted in service')
+
+    @staticmethod
+    async def _parse_ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+        row_number = 0
+        async for line in lines:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield row_number, None, f'Invalid JSON: {error}'
+                continue
+            if not isinstance(row, dict):
+                yield row_number, None, 'Each line must be a JSON object'
+                continue
+            yield row_number, row, None
+
+    # Function to tell whether a quoted field is still open at the end of a line, with the rules of the csv module:
+    # a quote only opens a field at its start, and two quotes inside a quoted field are an escaped quote
+    @staticmethod
+    def _ends_in_quoted_field(line: str, in_quotes: bool = False) -> bool:
+        if not in_quotes and '"' not in line:
+            return False
+        field_start = not in_quotes
+        index = 0
+        while index < len(line):
+            char = line[index]
+            if in_quotes:
+                if char == '"':
+                    if line.startswith('"', index + 1):
+                        index += 1
+                    else:
+                        in_quotes = False
+            elif char == ',':
+                field_start = True
+                index += 1
+                continue
+            elif char == '"' and field_start:
+                in_quotes = True
+            field_start = False
+            index += 1
+        return in_quotes
+
+    # Yields the lines of each record with the error of the records longer than BULK_MAX_RECORD_LENGTH. The lines
+    # after a too long record start a new one, so a quote that never closes does not take the rest of the file
+    @staticmethod
+    async def _csv_records(lines: AsyncIterator[str]) -> AsyncIterator[tuple[list[str], str | None]]:
+        record = []
+        length = 0
+        in_quotes = False
+        async for line in lines:
+            if not record and not line.strip():
+                continue
+            record.append(line + '\n')
+            length += len(line) + 1
+            # A record goes on in the next line while one of its quoted fields is open
+            in_quotes = ProductsService._ends_in_quoted_field(line, in_quotes)
+            if length > settings.BULK_MAX_RECORD_LENGTH:
+                yield [], f'record longer than {settings.BULK_MAX_RECORD_LENGTH} characters'
+            elif in_quotes:
+                continue
+            else:
+                yield record, None
+            record, length, in_quotes = [], 0, False
+        if record:
+            yield record, None
+
+    @staticmethod
+    async def _parse_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+        header = None
+        row_number = 0
+        async for record, error in ProductsService._csv_records(lines):
+            if error is None:
+                # The reader joins the lines of a record with a quoted newline
+                try:
+                    values = next(csv.reader(record, strict=True))
+                except csv.Error as csv_error:
+                    error = str(csv_error)
+            if error is not None:
+                if header is None:
+                    raise InvalidParameterError(message=f'Invalid CSV header: {error}', location=LocationError.Body)
+                row_number += 1
+                yield row_number, None, f'Invalid CSV: {error}'
+                continue
+            if header is None:
+                header = [column.strip().lstrip('\ufeff') for column in values]
+                continue
+            row_number += 1
+            if len(values) != len(header):
+                yield row_number, None, f'Expected {len(header)} columns, found {len(values)}'
+                continue
+            yield row_number, dict(zip(header, values)), None
+
+    @staticmethod
+    def _add_row_error(result: BulkImportResult, row_number: int, product_code: int | None, message: str) -> None:
+        result.failed += 1
+        if len(result.errors) < settings.BULK_MAX_ERRORS:
+            result.errors.append(BulkRowError(row=row_number, product_code=product_code, message=message))
+
+    async def _import_chunk(self, chunk: list[tuple[int, dict]], result: BulkImportResult) -> None:
+        products: dict[int, tuple[int, ProductInput]] = {}
+        for row_number, row in chunk:
+            try:
+                product = ProductInput.model_validate(row)
+            except ValidationError as error:
+                message = '; '.join(f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}" for detail in error.errors())
+                self._add_row_error(result, row_number, None, message)
+                continue
+            if product.product_code in products:
+                self._add_row_error(result, row_number, product.product_code, 'Duplicated product_code in the file')
+                continue
+            products[product.product_code] = (row_number, product)
+
+        existing_codes = await self.products_repository.get_existing_product_codes(list(products))
+        new_products = []
+        for product_code, (row_number, product) in products.items():
+            if product_code in existing_codes:
+                self._add_row_error(result, row_number, product_code, 'There is already a product with that product_code')
+            else:
+                new_products.append((row_number, product))
+        if not new_products:
+            return
+
+        inserted, write_errors = await self.products_repository.create_many(
+            [product.model_dump() for _, product in new_products])
+        result.inserted += inserted
+        for index, message in write_errors.items():
+            row_number, product = new_products[index]
+            self._add_row_error(result, row_number, product.product_code, message)
+
+    async def bulk_import_products(self, body: AsyncIterator[bytes], content_type: str) -> BulkImportResult:
+        self.logger.info('Importing products in bulk')
+        if 'csv' in content_type:
+            rows = self._parse_csv_rows(iter_lines(body))
+        elif 'json' in content_type:
+            rows = self._parse_ndjson_rows(iter_lines(body))
+        else:
+            raise InvalidParameterError(message='Content-Type must be text/csv or application/x-ndjson',
+                                        location=LocationError.Headers)
+
+        result = BulkImportResult()
+        chunk = []
+        try:
+            async for row_number, row, error in rows:
+                result.received += 1
+                if error:
+                    self._add_row_error(result, row_number, None, error)
+                    continue
+                chunk.append((row_number, row))
+                if len(chunk) >= settings.BULK_CHUNK_SIZE:
+                    await self._import_chunk(chunk, result)
+                    chunk = []
+        except UnicodeDecodeError:
+            raise InvalidParameterError(message=f'The body must be UTF-8 encoded, {result.inserted} products were '
+                                                f'created before row {result.received + 1}',
+                                        location=LocationError.Body)
+        if chunk:
+            await self._import_chunk(chunk, result)
+
+        self.logger.info('Products imported in service', inserted=result.inserted, received=result.received)
+        return result
+
+    async def export_products(self, export_format: str) -> AsyncIterator[str]:
+        self.logger.info('Exporting products from db')
+        documents = self.products_repository.stream_all(fields=BULK_FIELDS)
+        if export_format == 'ndjson':
+            async for document in documents:
+                yield json.dumps({field: document.get(field) for field in BULK_FIELDS}) + '\n'
+            return
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(BULK_FIELDS)
+        async for document in documents:
+            writer.writerow([document.get(field) for field in BULK_FIELDS])
+            if buffer.tell() >= settings.BULK_EXPORT_BUFFER_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
@@ -1,10 +1,14 @@
 from typing import Annotated
-from fastapi import APIRouter, Request, Response, Depends
+from fastapi import APIRouter, Request, Response, Depends, Query
+from fastapi.responses import StreamingResponse
 
-from api.users.schemas.inputs import UserInput, PatchUserInput, UserBasic, ChangePasswordUserInput
-from api.users.services.users_services import UsersService
+from api.users.schemas.inputs import UserInput, PatchUserInput, UserBasic, ChangePasswordUserInput, RestoreUserInput
+from api.users.schemas.outputs import PartialUserBasic
 from core.api_response import ApiResponse
+from core.config import settings
 from core.auth import get_current_user
+from core.conditional import document_etag, has_conditional_headers, is_not_modified, not_modified_response, \
+    set_validators
 from models.response_model import ResponseModel
 from models.users import UsersModel, TokenData
 from utils.response_handler import response_handler
@@ -15,9 +19,10 @@ users_router: APIRouter = APIRouter(prefix="/users")
 @users_router.post(
     path="",
     tags=["users"],
-    description="Create a new user",
+    description="Create a new user. Retries with the same Idempotency-Key header get the response of the first "
+                "request without creating the user or sending the email again",
 )
-@response_handler()
+@response_handler(idempotent=True)
 async def create_user(
         request: Request,
         response: Response,
@@ -25,7 +30,7 @@ async def create_user(
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[UserBasic]:
     api_response.logger.info('Creating user in controller')
-    user_service = UsersService(request.app.database, api_response)
+    user_service = request.app.container.users_service
     user_created = await user_service.create_user(user_input)
     api_response.logger.info(f'User created in controller')
     return user_created
@@ -45,7 +50,7 @@ async def verify_email(
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel:
     api_response.logger.info('Verifying email address')
-    user_service = UsersService(request.app.database, api_response)
+    user_service = request.app.container.users_service
     await user_service.verify_email(id, token)
     return
 
@@ -53,7 +58,8 @@ async def verify_email(
 @users_router.get(
     path="/{user_id}",
     tags=["users"],
-    description="Get user by id",
+    description="Get user by id. Sends an ETag and Last-Modified, and 304 when If-None-Match or "
+                "If-Modified-Since show the user did not change",
 )
 @response_handler()
 async def get_user_by_id(
@@ -64,8 +70,18 @@ async def get_user_by_id(
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[UserBasic]:
     api_response.logger.info('Getting user in controller')
-    user_service = UsersService(request.app.database, api_response, token_data)
-    user_found = await user_service.get_user_by_id(user_id)
+    user_service = request.app.container.users_service
+
+    # Polling clients are answered from the update_at alone when they already have the current user
+    if has_conditional_headers(request):
+        update_at = await user_service.get_user_update_at(user_id, token_data)
+        etag = document_etag(user_id, update_at)
+        if is_not_modified(request, etag, update_at):
+            api_response.logger.info(f'User not modified in controller')
+            return not_modified_response(etag, update_at)
+
+    user_found, update_at = await user_service.get_user_by_id(user_id, token_data)
+    set_validators(response, document_etag(user_id, update_at), update_at)
     api_response.logger.info(f'User found in controller')
     return user_found
 
@@ -73,22 +89,53 @@ async def get_user_by_id(
 @users_router.get(
     path="",
     tags=["users"],
-    description="Get all users",
+    description="Get all users, one page at a time. The next page cursor is sent in the X-Next-Cursor header. "
+                "With stream=true every user after the cursor is sent as NDJSON",
 )
 @response_handler()
 async def get_all_users(
         request: Request,
         response: Response,
         token_data: Annotated[TokenData, Depends(get_current_user)],
-        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
-) -> ResponseModel[list[UserBasic]]:
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)],
+        limit: Annotated[int, Query(ge=1, le=settings.PAGE_MAX_LIMIT)] = settings.PAGE_DEFAULT_LIMIT,
+        cursor: str | None = None,
+        fields: Annotated[list[str] | None, Query()] = None,
+        stream: bool = False
+) -> ResponseModel[list[PartialUserBasic]]:
     api_response.logger.info('Getting all users in controller')
-    user_service = UsersService(request.app.database, api_response)
-    all_users = await user_service.get_all_users()
+    user_service = request.app.container.users_service
+
+    if stream:
+        return StreamingResponse(user_service.stream_all_users(cursor, fields), media_type="application/x-ndjson")
+
+    all_users, next_cursor = await user_service.get_all_users(limit, cursor, fields)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     api_response.logger.info(f'All users found in controller')
     return all_users
 
 
+@users_router.patch(
+    path="/restore",
+    tags=["users"],
+    description="Restore a disabled user with its username and password. It can be restored for "
+                "SOFT_DELETE_RETENTION_DAYS days, then it is removed",
+)
+@response_handler()
+async def restore_user(
+        request: Request,
+        response: Response,
+        restore_input: RestoreUserInput,
+        api_response: ApiResponse = Depends(ApiResponse)
+) -> ResponseModel:
+    api_response.logger.info('Restoring user in controller')
+    user_service = request.app.container.users_service
+    await user_service.restore_user(restore_input)
+    api_response.logger.info('User restored in controller')
+    return
+
+
 @users_router.patch(
     path="/{user_id}",
     tags=["users"],
@@ -104,8 +151,8 @@ async def update_user(
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[UserBasic]:
     api_response.logger.info('Updating user data in controller')
-    user_service = UsersService(request.app.database, api_response, token_data)
-    user_updated = await user_service.update_user(user_id, update_data)
+    user_service = request.app.container.users_service
+    user_updated = await user_service.update_user(user_id, token_data, update_data)
     api_response.logger.info(f'User updated some data in controller')
     return user_updated
 
@@ -124,8 +171,8 @@ async def disable_user(
         api_response: ApiResponse = Depends(ApiResponse)
 ) -> ResponseModel:
     api_response.logger.info('Disabling user in controller')
-    user_service = UsersService(request.app.database, api_response, token_data)
-    await user_service.disable_user(user_id)
+    user_service = request.app.container.users_service
+    await user_service.disable_user(user_id, token_data)
     api_response.logger.info(f'User disabled in controller')
     return
 
@@ -144,8 +191,8 @@ async def delete_user(
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel:
     api_response.logger.info('Deleting user in controller')
-    user_service = UsersService(request.app.database, api_response, token_data)
-    await user_service.delete_user(user_id)
+    user_service = request.app.container.users_service
+    await user_service.delete_user(user_id, token_data)
     api_response.logger.info(f'User deleted in controller')
     return
 
@@ -165,7 +212,7 @@ async def change_password(
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[UserBasic]:
     api_response.logger.info('Updating password in controller')
-    user_service = UsersService(request.app.database, api_response, token_data)
-    changed_password = await user_service.change_password(user_id, password_data)
+    user_service = request.app.container.users_service
+    changed_password = await user_service.change_password(user_id, token_data, password_data)
     api_response.logger.info(f'Password updated in controller')
     return changed_password
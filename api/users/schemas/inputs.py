@@ -22,6 +22,11 @@ class PatchUserInput(BaseModel):
     email: EmailStr | None = None
 
 
+class RestoreUserInput(BaseModel):
+    username: str
+    password: str
+
+
 class ChangePasswordUserInput(BaseModel):
     current_password: str
     new_password: str
@@ -1,7 +1,13 @@
 from pydantic import EmailStr, BaseModel
 
+from api.users.schemas.inputs import UserBasic
+from models.base_models import partial_model
+
 
 class UserOutput(BaseModel):
     username: str
     full_name: str
     email: EmailStr
+
+
+PartialUserBasic = partial_model(UserBasic)
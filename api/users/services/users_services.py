@@ -1,27 +1,34 @@
+from datetime import datetime
+from typing import AsyncIterator
+
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
-from api.users.schemas.inputs import UserInput, PatchUserInput, UserBasic, ChangePasswordUserInput
-from core.api_response import ApiResponse
-from core.errors import UnauthorizedError
+from api.users.schemas.inputs import UserInput, PatchUserInput, UserBasic, ChangePasswordUserInput, RestoreUserInput
+from api.users.schemas.outputs import PartialUserBasic
+from core.api_response import RequestScoped
+from core.errors import UnauthorizedError, InvalidParameterError
 from core.jwt_handler import create_random_token
 from core.security import hash_password, verify_password
 from models.response_model import LocationError
 from models.users import TokenData
+from repositories.sessions import SessionsRepository
 from repositories.users import UsersRepository
 from services.email_sending_service import EmailService
 from utils.auth import verify_user
+from utils.streaming import iter_ndjson
+
 
+class UsersService(RequestScoped):
+    logger_name = 'services.users'
 
-class UsersService:
-    def __init__(self, db: AsyncIOMotorDatabase, api_response: ApiResponse, token_data: TokenData | None = None):
+    def __init__(self, db: AsyncIOMotorDatabase, email_service: EmailService):
         self.db = db
-        self.api_response = api_response
-        self.token_data = token_data
-        self.users_repository = UsersRepository(self.db, self.api_response)
-        self.email_service = EmailService()
+        self.users_repository = UsersRepository(self.db)
+        self.sessions_repository = SessionsRepository(self.db)
+        self.email_service = email_service
 
     async def create_user(self, user_input: UserInput) -> UserBasic:
-        self.api_response.logger.info('Check user in db')
+        self.logger.info('Check user in db')
         await self.users_repository.check_if_the_username_exists(user_input.username)
 
         hashed_password = await hash_password(user_input.password)
@@ -37,82 +44,110 @@ class UsersService:
                                                              user_confirmation_token)
 
         user = UserBasic(**user_created.model_dump())
-        self.api_response.logger.info(f'User created in service')
+        self.logger.info('User created in service')
         return user
 
     async def verify_email(self, user_id: str, user_verification_token: str) -> None:
-        self.api_response.logger.info('Check user in db')
-        user_found = await self.users_repository.get_by_id(user_id)
-
-        self.api_response.logger.info("Verify that the authenticated user can only access")
-        if not user_found.verification_token == user_verification_token:
+        self.logger.info('Verifying user in db')
+        # The user is only verified if the token matches the stored one
+        user_verified = await self.users_repository.patch(user_id, {"is_verified": True, "verification_token": None},
+                                                          query={"verification_token": user_verification_token},
+                                                          raise_exception=False)
+        if not user_verified:
             raise UnauthorizedError(message="Invalid token", location=LocationError.Body)
+        self.logger.info('User verified in db')
 
-        user_found.is_verified = True
-        user_found.verification_token = None
-        await self.users_repository.patch(user_id, user_found)
-        self.api_response.logger.info(f'User verified in db')
-
-    async def get_user_by_id(self, user_id: str) -> UserBasic:
-        self.api_response.logger.info("Verify that the authenticated user can only access their own information")
-        verify_user(user_id, self.token_data)
+    # Returns the user and the time of its last change, for the conditional requests
+    async def get_user_by_id(self, user_id: str, token_data: TokenData) -> tuple[UserBasic, datetime]:
+        self.logger.info("Verify that the authenticated user can only access their own information")
+        verify_user(user_id, token_data)
 
-        self.api_response.logger.info('Getting user in db')
+        self.logger.info('Getting user in db')
         user_found = await self.users_repository.get_by_id(user_id)
         user = UserBasic(**user_found.model_dump())
-        self.api_response.logger.info(f'User found in service')
-        return user
-
-    async def get_all_users(self) -> list[UserBasic]:
-        self.api_response.logger.info('Getting all users in db')
-        all_users = await self.users_repository.get_all()
-        users = [UserBasic(**user.model_dump()) for user in all_users]
-        self.api_response.logger.info(f'All users found in service')
-        return users
-
-    async def update_user(self, user_id: str, update_data: PatchUserInput) -> UserBasic:
-        self.api_response.logger.info("Verify that the authenticated user can only access their own information")
-        verify_user(user_id, self.token_data)
-
-        self.api_response.logger.info('Getting user in db')
+        self.logger.info('User found in service')
+        return user, user_found.update_at
+
+    async def get_user_update_at(self, user_id: str, token_data: TokenData) -> datetime:
+        self.logger.info("Verify that the authenticated user can only access their own information")
+        verify_user(user_id, token_data)
+        return await self.users_repository.get_update_at(user_id)
+
+    @staticmethod
+    def _user_fields(fields: list[str] | None) -> list[str]:
+        # Only the public user fields can be read, so passwords and tokens never leave the db
+        public_fields = list(UserBasic.model_fields)
+        if not fields:
+            return public_fields
+        unknown_fields = [field for field in fields if field not in public_fields]
+        if unknown_fields:
+            raise InvalidParameterError(message=f"Unknown fields: {', '.join(unknown_fields)}",
+                                        location=LocationError.Params)
+        return fields
+
+    async def get_all_users(self, limit: int, cursor: str | None = None,
+                            fields: list[str] | None = None) -> tuple[list[PartialUserBasic], str | None]:
+        self.logger.info('Getting all users in db')
+        documents, next_cursor = await self.users_repository.get_all(limit, cursor, self._user_fields(fields))
+        users = [PartialUserBasic.model_validate(document) for document in documents]
+        self.logger.info('All users found in service')
+        return users, next_cursor
+
+    def stream_all_users(self, cursor: str | None = None, fields: list[str] | None = None) -> AsyncIterator[str]:
+        self.logger.info('Streaming all users from db')
+        documents = self.users_repository.stream_all(cursor, self._user_fields(fields))
+        return iter_ndjson(documents, PartialUserBasic)
+
+    async def update_user(self, user_id: str, token_data: TokenData, update_data: PatchUserInput) -> UserBasic:
+        self.logger.info("Verify that the authenticated user can only access their own information")
+        verify_user(user_id, token_data)
+
+        self.logger.info('Getting user in db')
         await self.users_repository.check_if_the_username_exists(update_data.username)
-        await self.users_repository.get_by_id(user_id)
 
         user_updated = await self.users_repository.patch(user_id, update_data)
         user = UserBasic(**user_updated.model_dump())
-        self.api_response.logger.info(f'User updated data in service')
+        self.logger.info('User updated data in service')
         return user
 
-    async def disable_user(self, user_id: str) -> None:
-        self.api_response.logger.info("Verify that the authenticated user can only access their own information")
-        verify_user(user_id, self.token_data)
+    async def disable_user(self, user_id: str, token_data: TokenData) -> None:
+        self.logger.info("Verify that the authenticated user can only access their own information")
+        verify_user(user_id, token_data)
+
+        await self.users_repository.disable(user_id)
+        await self.sessions_repository.revoke_user(user_id)
+        self.logger.info('User disabled in service')
 
-        self.api_response.logger.info('Getting user in db')
-        user = await self.users_repository.get_by_id(user_id)
-        user.is_deleted = True
-        user.refresh_token = None
+    # A disabled user has no sessions left, so the password proves the ownership of the account
+    async def restore_user(self, restore_input: RestoreUserInput) -> None:
+        self.logger.info('Getting disabled user in db')
+        user = await self.users_repository.get_user_by_username(restore_input.username, is_deleted=True)
+        await verify_password(restore_input.password, user.password)
 
-        await self.users_repository.disable(user_id, user.model_dump())
-        self.api_response.logger.info(f'User disabled in service')
+        await self.users_repository.restore(user.id)
+        self.logger.info('User restored in service')
 
-    async def delete_user(self, user_id: str) -> None:
-        self.api_response.logger.info("Verify that the authenticated user can only access their own information")
-        verify_user(user_id, self.token_data)
+    async def delete_user(self, user_id: str, token_data: TokenData) -> None:
+        self.logger.info("Verify that the authenticated user can only access their own information")
+        verify_user(user_id, token_data)
 
         await self.users_repository.delete(user_id)
-        self.api_response.logger.info(f'User deleted in service')
+        await self.sessions_repository.revoke_user(user_id)
+        self.logger.info('User deleted in service')
 
-    async def change_password(self, user_id: str, update_data: ChangePasswordUserInput) -> UserBasic:
-        self.api_response.logger.info("Verify that the authenticated user can only access their own information")
-        verify_user(user_id, self.token_data)
+    async def change_password(self, user_id: str, token_data: TokenData,
+                              update_data: ChangePasswordUserInput) -> UserBasic:
+        self.logger.info("Verify that the authenticated user can only access their own information")
+        verify_user(user_id, token_data)
 
-        self.api_response.logger.info('Getting user in db')
+        self.logger.info('Getting user in db')
         user_found = await self.users_repository.get_by_id(user_id)
         await verify_password(update_data.current_password, user_found.password)
         hashed_password = await hash_password(update_data.new_password)
-        user_found.password = hashed_password
 
-        user_updated = await self.users_repository.patch(user_id, user_found)
+        user_updated = await self.users_repository.patch(user_id, {"password": hashed_password})
+        # The other sessions are logged out, the one that changed the password goes on
+        await self.sessions_repository.revoke_user(user_id, keep_session_id=token_data.sid)
         user = UserBasic(**user_updated.model_dump())
-        self.api_response.logger.info(f'Password updated in service')
+        self.logger.info('Password updated in service')
         return user
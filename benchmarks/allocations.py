@@ -0,0 +1,166 @@
+# Per request allocations and latency of the API, with one request at a time so tracemalloc sees a single
+# request. Shows the setup cost of each request, like building services and repositories, more than the
+# database time, so it runs against mongomock-motor by default. The setup rows compare building each service
+# for a request, as the controllers did before the container, with taking it from the container.
+#
+#   python -m benchmarks.allocations --requests 500
+#   python -m benchmarks.allocations --backend mongod --output allocations.json
+#
+# The settings are read from the environment and the .env file as in the app, with DB_NAME replaced by a
+# temporary database that is dropped at the end.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Awaitable, Callable
+from uuid import uuid4
+
+
+@dataclass
+class AllocationResult:
+    name: str
+    requests: int
+    mean_us: float
+    # Memory allocated during a request on top of what was already allocated before it, averaged
+    mean_peak_kib: float
+    # Memory still allocated after the request, caches filling up show here
+    mean_retained_bytes: float
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Measure the allocations of each request')
+    parser.add_argument('--backend', choices=('mongod', 'mongomock'), default='mongomock')
+    parser.add_argument('--db-connection', help='MongoDB connection string, DB_CONNECTION by default')
+    parser.add_argument('--requests', type=int, default=500, help='Measured requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=50, help='Requests per endpoint before measuring')
+    parser.add_argument('--products', type=int, default=1000, help='Products in the database')
+    parser.add_argument('--output', type=Path, help='File to write the results as JSON')
+    return parser.parse_args()
+
+
+async def measure(name: str, request: Callable[[int], Awaitable[int]], total: int,
+                  warmup: int) -> AllocationResult:
+    for iteration in range(warmup):
+        await request(iteration)
+
+    elapsed = peak = retained = 0.0
+    tracemalloc.start()
+    try:
+        for iteration in range(total):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            start = time.perf_counter()
+            status_code = await request(iteration)
+            elapsed += time.perf_counter() - start
+            after, request_peak = tracemalloc.get_traced_memory()
+            if status_code >= 400:
+                raise RuntimeError(f'{name} answered {status_code}')
+            peak += request_peak - before
+            retained += after - before
+    finally:
+        tracemalloc.stop()
+    return AllocationResult(name=name, requests=total, mean_us=elapsed / total * 1e6,
+                            mean_peak_kib=peak / total / 1024, mean_retained_bytes=retained / total)
+
+
+def measure_setup(name: str, setup: Callable[[], object], total: int) -> AllocationResult:
+    setup()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        setup()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(total):
+        setup()
+    elapsed = time.perf_counter() - start
+    return AllocationResult(name=name, requests=total, mean_us=elapsed / total * 1e6,
+                            mean_peak_kib=(peak - before) / 1024, mean_retained_bytes=after - before)
+
+
+async def run(args: argparse.Namespace) -> int:
+    os.environ['DB_NAME'] = f'benchmark_{uuid4().hex[:12]}'
+    os.environ['RATE_LIMIT_ENABLED'] = 'false'
+    if args.db_connection:
+        os.environ['DB_CONNECTION'] = args.db_connection
+
+    import httpx
+
+    import main
+    from api.auth.services.auth_services import AuthServices
+    from api.products.services.products_services import ProductsService
+    from api.users.services.users_services import UsersService
+    from benchmarks.scenarios import BenchmarkContext, sample_product_ids, seed_products, seed_users
+    from core.config import settings
+    from services.email_sending_service import EmailService
+
+    if args.backend == 'mongomock':
+        import mongomock_motor
+
+        import core.database
+        core.database.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+
+    results = []
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+            context = BenchmarkContext(client=client, db=main.app.database, workers=1)
+            try:
+                await seed_users(context)
+                await seed_products(context, args.products)
+                product_ids = await sample_product_ids(context)
+                headers = {"Authorization": f'Bearer {context.access_tokens[0]}'}
+                api = settings.API_STR
+
+                async def get_product(iteration: int) -> int:
+                    response = await client.get(f'{api}/products/{product_ids[iteration % len(product_ids)]}')
+                    return response.status_code
+
+                async def get_user(iteration: int) -> int:
+                    response = await client.get(f'{api}/users/{context.user_ids[0]}', headers=headers)
+                    return response.status_code
+
+                async def first_page(iteration: int) -> int:
+                    response = await client.get(f'{api}/products/all/', params={"limit": 20})
+                    return response.status_code
+
+                async def health(iteration: int) -> int:
+                    response = await client.get('/health')
+                    return response.status_code
+
+                for name, request in (('product_by_id', get_product), ('user_by_id_authenticated', get_user),
+                                      ('list_first_page', first_page), ('health', health)):
+                    print(f'Running {name}', file=sys.stderr)
+                    results.append(await measure(name, request, args.requests, args.warmup))
+
+                db, container = main.app.database, main.app.container
+                for name, per_request, shared in (
+                        ('products', lambda: ProductsService(db), lambda: container.products_service),
+                        ('users', lambda: UsersService(db, EmailService()), lambda: container.users_service),
+                        ('auth', lambda: AuthServices(db, EmailService()), lambda: container.auth_services)):
+                    results.append(measure_setup(f'setup_{name}_per_request', per_request, args.requests))
+                    results.append(measure_setup(f'setup_{name}_container', shared, args.requests))
+            finally:
+                await main.app.mongodb_client.drop_database(settings.DB_NAME)
+
+    header = f'{"endpoint":<28} {"requests":>8} {"mean us":>10} {"peak KiB":>10} {"retained B":>11}'
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        print(f'{result.name:<28} {result.requests:>8} {result.mean_us:>10.1f} {result.mean_peak_kib:>10.1f} '
+              f'{result.mean_retained_bytes:>11.1f}')
+    if args.output:
+        args.output.write_text(json.dumps([asdict(result) for result in results], indent=2) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(run(parse_args())))
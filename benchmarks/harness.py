@@ -0,0 +1,118 @@
+import asyncio
+import json
+import math
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Awaitable, Callable
+
+# Receives the worker number and the iteration number and returns the HTTP status code
+RequestFunction = Callable[[int, int], Awaitable[int]]
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    hot: bool
+    requests: int
+    errors: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    throughput: float
+
+
+@dataclass
+class Regression:
+    scenario: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        return self.current / self.baseline - 1 if self.baseline else math.inf
+
+
+# Function to get a percentile of sorted values with the nearest rank method
+def percentile(sorted_values: list[float], quantile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(quantile * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+# Function to send the requests of a scenario from a fixed number of concurrent workers
+async def run_load(name: str, request: RequestFunction, total: int, concurrency: int, warmup: int,
+                   hot: bool = False) -> ScenarioResult:
+    latencies: list[float] = []
+    errors = 0
+    next_iteration = 0
+
+    async def worker(number: int, limit: int, record: bool) -> None:
+        nonlocal next_iteration, errors
+        while next_iteration < limit:
+            iteration = next_iteration
+            next_iteration += 1
+            start = time.perf_counter()
+            status_code = await request(number, iteration)
+            if record:
+                latencies.append(time.perf_counter() - start)
+                errors += status_code >= 400
+
+    await asyncio.gather(*(worker(number, warmup, False) for number in range(concurrency)))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(number, warmup + total, True) for number in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return ScenarioResult(
+        name=name,
+        hot=hot,
+        requests=len(latencies),
+        errors=errors,
+        p50_ms=percentile(latencies, 0.50) * 1000,
+        p95_ms=percentile(latencies, 0.95) * 1000,
+        p99_ms=percentile(latencies, 0.99) * 1000,
+        mean_ms=sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        throughput=len(latencies) / elapsed if elapsed else 0.0,
+    )
+
+
+def save_results(path: Path, meta: dict, results: list[ScenarioResult]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    content = {"meta": meta, "results": {result.name: asdict(result) for result in results}}
+    path.write_text(json.dumps(content, indent=2) + '\n')
+
+
+def load_results(path: Path) -> dict[str, dict]:
+    return json.loads(path.read_text())["results"]
+
+
+# Function to find the scenarios with more errors than the baseline or whose latency grew more than the threshold.
+# Changes under min_delta_ms are ignored, they are noise in the sub-millisecond paths
+def compare(results: list[ScenarioResult], baseline: dict[str, dict], threshold: float,
+            min_delta_ms: float) -> list[Regression]:
+    regressions = []
+    for result in results:
+        baseline_result = baseline.get(result.name)
+        if baseline_result is None:
+            continue
+        if result.errors > baseline_result["errors"]:
+            regressions.append(Regression(result.name, "errors", baseline_result["errors"], result.errors))
+        for metric in ("p50_ms", "p95_ms"):
+            current, previous = getattr(result, metric), baseline_result[metric]
+            if current > previous * (1 + threshold) and current - previous > min_delta_ms:
+                regressions.append(Regression(result.name, metric, previous, current))
+    return regressions
+
+
+def format_table(results: list[ScenarioResult]) -> str:
+    header = f'{"scenario":<32} {"requests":>8} {"errors":>6} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"req/s":>9}'
+    rows = [header, '-' * len(header)]
+    for result in results:
+        name = f'{result.name}{" *" if result.hot else ""}'
+        rows.append(f'{name:<32} {result.requests:>8} {result.errors:>6} {result.p50_ms:>9.2f} '
+                    f'{result.p95_ms:>9.2f} {result.p99_ms:>9.2f} {result.throughput:>9.2f}')
+    return '\n'.join(rows)
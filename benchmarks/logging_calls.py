@@ -0,0 +1,70 @@
+# Micro-benchmark of the log calls of the repositories, in process and without a database. Compares the f-strings
+# with the whole document or list, as the repositories logged before, with the structured calls of
+# utils.logger, with the level enabled and disabled. The records are formatted and dropped, nothing is written.
+#
+#   python -m benchmarks.logging_calls --seconds 2 --documents 1000
+#
+# The settings are read from the environment and the .env file as in the app.
+import argparse
+import logging
+import sys
+from datetime import datetime
+from uuid import uuid4
+
+from benchmarks.jwt_ops import operations_per_second
+from utils.logger import StructuredLogger
+
+
+class FormattingNullHandler(logging.Handler):
+    # Formats the record as the queue handler does before enqueuing it
+    def emit(self, record: logging.LogRecord) -> None:
+        self.format(record)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark the log calls of the repositories')
+    parser.add_argument('--seconds', type=float, default=1.0, help='Time measured per call')
+    parser.add_argument('--documents', type=int, default=1000, help='Documents of the logged list')
+    return parser.parse_args()
+
+
+def build_logger(level: int) -> StructuredLogger:
+    logger = logging.getLogger(f'benchmark.{logging.getLevelName(level).lower()}')
+    logger.setLevel(level)
+    logger.propagate = False
+    if not logger.handlers:
+        logger.addHandler(FormattingNullHandler())
+    return StructuredLogger(logger, {'process_id': str(uuid4())})
+
+
+def main() -> int:
+    args = parse_args()
+    now = datetime.utcnow()
+    document = {"_id": str(uuid4()), "name": "Benchmark product", "description": "x" * 500, "price": 10.5,
+                "quantity": 3, "is_deleted": False, "create_at": now, "update_at": now}
+    documents = [dict(document, _id=str(uuid4())) for _ in range(args.documents)]
+
+    rows = []
+    for level_name, level in (('enabled', logging.DEBUG), ('disabled', logging.WARNING)):
+        logger = build_logger(level)
+        calls = {
+            "fstring_document": lambda: logger.info(f'Instance found: {document}'),
+            "structured_document": lambda: logger.info('Instance found', _id=document["_id"]),
+            "fstring_list": lambda: logger.info(f'Instances found: {documents}'),
+            "structured_list": lambda: logger.info('Instances found', count=len(documents)),
+            "payload_list": lambda: logger.payload('Instances found', documents),
+        }
+        for name, call in calls.items():
+            print(f'Running {name} {level_name}', file=sys.stderr)
+            rows.append((f'{name}_{level_name}', operations_per_second(call, args.seconds)))
+
+    header = f'{"call":<32} {"calls/s":>12} {"us/call":>10}'
+    print(header)
+    print('-' * len(header))
+    for name, per_second in rows:
+        print(f'{name:<32} {per_second:>12.0f} {1e6 / per_second:>10.2f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
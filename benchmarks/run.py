@@ -0,0 +1,133 @@
+# Benchmarks of the API hot paths. The app runs in process and is called through httpx, against a local
+# mongod or against mongomock-motor for micro-benchmarks without a database server.
+#
+#   python -m benchmarks.run --backend mongomock --sizes 10000
+#   python -m benchmarks.run --backend mongod --sizes 10000,100000,1000000 --save-baseline
+#   python -m benchmarks.run --backend mongod --sizes 10000,100000,1000000 --compare --threshold 0.2
+#
+# The settings are read from the environment and the .env file as in the app, with DB_NAME replaced by a
+# temporary database that is dropped at the end. Needs httpx, and mongomock-motor for the mongomock backend.
+# Hot path scenarios are marked with *, a comparison run exits with status 1 when one of them is slower
+# than the baseline past the threshold.
+import argparse
+import asyncio
+import os
+import platform
+import sys
+from datetime import datetime
+from pathlib import Path
+from uuid import uuid4
+
+DEFAULT_BASELINE = Path(__file__).parent / 'baseline.json'
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark the auth, users and products endpoints')
+    parser.add_argument('--backend', choices=('mongod', 'mongomock'), default='mongod')
+    parser.add_argument('--db-connection', help='MongoDB connection string, DB_CONNECTION by default')
+    parser.add_argument('--db-name', help='Database to use, a temporary one by default. It is not dropped')
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help='Comma separated number of products of the list scenarios')
+    parser.add_argument('--scenarios', help='Comma separated prefixes of the scenarios to run, all by default')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario')
+    parser.add_argument('--bulk-requests', type=int, default=20, help='Measured requests of the bulk scenario')
+    parser.add_argument('--warmup', type=int, default=20, help='Requests per scenario before measuring')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--output', type=Path, help='File to write the results as JSON')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--compare', action='store_true', help='Compare the results with the baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed p50 and p95 latency increase over the baseline, 0.2 is 20%%')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='Latency increases smaller than this are not regressions')
+    parser.add_argument('--rate-limit', action='store_true',
+                        help='Keep the rate limits of the auth endpoints, every request comes from the same IP')
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace) -> int:
+    # The settings are loaded on import, so the database is chosen before importing the app
+    temporary_db = args.db_name is None
+    os.environ['DB_NAME'] = args.db_name or f'benchmark_{uuid4().hex[:12]}'
+    if args.db_connection:
+        os.environ['DB_CONNECTION'] = args.db_connection
+    if not args.rate_limit:
+        os.environ['RATE_LIMIT_ENABLED'] = 'false'
+
+    import httpx
+
+    import main
+    from benchmarks.harness import compare, format_table, load_results, run_load, save_results
+    from benchmarks.scenarios import (BenchmarkContext, auth_scenarios, bulk_scenarios, product_scenarios,
+                                      seed_products, seed_users)
+    from core.config import settings
+
+    if args.backend == 'mongomock':
+        import mongomock_motor
+
+        import core.database
+        core.database.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+
+    selected = args.scenarios.split(',') if args.scenarios else None
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    results = []
+
+    async def run_scenarios(scenarios, total: int) -> None:
+        for scenario in scenarios:
+            if selected and not any(scenario.name.startswith(prefix) for prefix in selected):
+                continue
+            print(f'Running {scenario.name}', file=sys.stderr)
+            results.append(await run_load(scenario.name, scenario.request, total,
+                                          scenario.concurrency or args.concurrency, args.warmup, scenario.hot))
+
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+            context = BenchmarkContext(client=client, db=main.app.database, workers=args.concurrency)
+            try:
+                await seed_users(context)
+                await run_scenarios(auth_scenarios(context), args.requests)
+                for size in sizes:
+                    print(f'Seeding {size} products', file=sys.stderr)
+                    await seed_products(context, size)
+                    await run_scenarios(await product_scenarios(context, size), args.requests)
+                # Last, so the bulk inserts do not change the sizes of the list scenarios
+                await run_scenarios(bulk_scenarios(context), args.bulk_requests)
+            finally:
+                if temporary_db:
+                    await main.app.mongodb_client.drop_database(settings.DB_NAME)
+
+    print(format_table(results))
+    meta = {
+        "backend": args.backend,
+        "sizes": sizes,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": datetime.utcnow().isoformat(),
+    }
+    if args.output:
+        save_results(args.output, meta, results)
+
+    exit_code = 0
+    if args.compare:
+        regressions = compare(results, load_results(args.baseline), args.threshold, args.min_delta_ms)
+        hot_scenarios = {result.name for result in results if result.hot}
+        for regression in regressions:
+            hot = regression.scenario in hot_scenarios
+            print(f'{"REGRESSION" if hot else "warning"}: {regression.scenario} {regression.metric} '
+                  f'{regression.baseline:.2f} -> {regression.current:.2f} ({regression.change:+.0%})')
+            exit_code = exit_code or int(hot)
+        if not regressions:
+            print(f'No regressions over {args.baseline}')
+    if args.save_baseline:
+        save_results(args.baseline, meta, results)
+        print(f'Baseline written to {args.baseline}')
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(run(parse_args())))
@@ -0,0 +1,201 @@
+import itertools
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from benchmarks.harness import RequestFunction
+from core.config import settings
+from core.security import hash_password
+from models.products import ProductsModel
+from models.users import UsersModel
+from repositories.base_repository import BaseRepository
+
+BENCHMARK_PASSWORD = 'Benchmark-Passw0rd'
+CATEGORIES = 20
+SEED_BATCH_SIZE = 10000
+CURSOR_SAMPLES = 20
+BULK_ROWS = 1000
+BATCH_GET_IDS = 20
+
+
+@dataclass
+class Scenario:
+    name: str
+    request: RequestFunction
+    hot: bool = False
+    # Overrides the concurrency of the run, for scenarios whose requests depend on the previous one
+    concurrency: int | None = None
+
+
+@dataclass
+class BenchmarkContext:
+    client: httpx.AsyncClient
+    db: AsyncIOMotorDatabase
+    workers: int
+    api: str = settings.API_STR
+    login_users: list[str] = field(default_factory=list)
+    refresh_tokens: list[str] = field(default_factory=list)
+    # Logged in users, with the access token of each one
+    user_ids: list[str] = field(default_factory=list)
+    access_tokens: list[str] = field(default_factory=list)
+    next_product_code: int = 0
+
+
+def product_row(product_code: int) -> dict:
+    return {
+        "product_code": product_code,
+        "product_name": f'benchmark product {product_code}',
+        "product_category": f'category-{product_code % CATEGORIES}',
+        "product_brand": f'brand-{product_code % 50}',
+        "product_unit_presentation": 'unit',
+        "product_quantity_presentation": product_code % 100 + 1,
+        "product_price": product_code % 1000 + 0.99,
+        "supplier_name": f'supplier-{product_code % 10}',
+    }
+
+
+def product_document(product_code: int, create_at: datetime) -> dict:
+    document = ProductsModel(**product_row(product_code), create_at=create_at).model_dump()
+    document["_id"] = document.pop("id")
+    return document
+
+
+async def _login(context: BenchmarkContext, username: str) -> dict:
+    response = await context.client.post(f'{context.api}/auth/login',
+                                         json={"username": username, "password": BENCHMARK_PASSWORD})
+    response.raise_for_status()
+    return response.json()["data"]
+
+
+# Login and refresh change the stored refresh token, so each worker of each scenario gets its own user
+async def seed_users(context: BenchmarkContext) -> None:
+    password = await hash_password(BENCHMARK_PASSWORD)
+    users = []
+    for number in range(context.workers * 2):
+        user = UsersModel(username=f'benchmark-{number}', full_name=f'Benchmark {number}',
+                          email=f'benchmark-{number}@example.com', password=password, is_verified=True,
+                          verification_token=None).model_dump()
+        user["_id"] = user.pop("id")
+        users.append(user)
+    await context.db.get_collection(UsersModel._collection_name.default).insert_many(users)
+
+    context.login_users = [user["username"] for user in users[:context.workers]]
+    for user in users[context.workers:]:
+        tokens = await _login(context, user["username"])
+        context.user_ids.append(user["_id"])
+        context.refresh_tokens.append(tokens["refresh_token"])
+        context.access_tokens.append(tokens["access_token"])
+
+
+# Function to add products until the collection has the given size
+async def seed_products(context: BenchmarkContext, size: int) -> None:
+    collection = context.db.get_collection(ProductsModel._collection_name.default)
+    existing = await collection.count_documents({})
+    start = datetime.utcnow()
+    while existing < size:
+        batch = range(context.next_product_code, context.next_product_code + min(SEED_BATCH_SIZE, size - existing))
+        await collection.insert_many([product_document(code, start + timedelta(microseconds=code)) for code in batch])
+        context.next_product_code += len(batch)
+        existing += len(batch)
+
+
+# Function to get cursors spread over the whole collection, so the pages are not all served by the cache
+async def sample_cursors(context: BenchmarkContext, size: int) -> list[str]:
+    collection = context.db.get_collection(ProductsModel._collection_name.default)
+    cursors = []
+    for sample in range(CURSOR_SAMPLES):
+        documents = await collection.find({"is_deleted": False}, {"create_at": 1}).sort(
+            [("create_at", 1), ("_id", 1)]).skip(size * sample // CURSOR_SAMPLES).limit(1).to_list(None)
+        cursors.extend(BaseRepository.encode_cursor(document) for document in documents)
+    return cursors
+
+
+async def sample_product_ids(context: BenchmarkContext) -> list[str]:
+    collection = context.db.get_collection(ProductsModel._collection_name.default)
+    documents = await collection.find({}, {"_id": 1}).limit(CURSOR_SAMPLES * 10).to_list(None)
+    return [document["_id"] for document in documents]
+
+
+def auth_scenarios(context: BenchmarkContext) -> list[Scenario]:
+    async def login(worker: int, iteration: int) -> int:
+        response = await context.client.post(f'{context.api}/auth/login', json={
+            "username": context.login_users[worker % len(context.login_users)], "password": BENCHMARK_PASSWORD})
+        return response.status_code
+
+    # Each refresh token can be used once, so every worker goes on with the token it got in its last response
+    async def refresh(worker: int, iteration: int) -> int:
+        response = await context.client.post(f'{context.api}/auth/refresh',
+                                             json={"token": context.refresh_tokens[worker]})
+        if response.status_code == 200:
+            context.refresh_tokens[worker] = response.json()["data"]["refresh_token"]
+        return response.status_code
+
+    # Users can only read their own data
+    async def get_user(worker: int, iteration: int) -> int:
+        user = worker % len(context.user_ids)
+        response = await context.client.get(f'{context.api}/users/{context.user_ids[user]}',
+                                            headers={"Authorization": f'Bearer {context.access_tokens[user]}'})
+        return response.status_code
+
+    return [
+        Scenario('login', login, hot=True),
+        Scenario('token_refresh', refresh, hot=True, concurrency=len(context.refresh_tokens)),
+        Scenario('user_by_id_authenticated', get_user, hot=True),
+    ]
+
+
+def bulk_scenarios(context: BenchmarkContext) -> list[Scenario]:
+    async def bulk_import(worker: int, iteration: int) -> int:
+        codes = range(context.next_product_code, context.next_product_code + BULK_ROWS)
+        context.next_product_code += BULK_ROWS
+        rows = (json.dumps(product_row(code)) for code in codes)
+        response = await context.client.post(f'{context.api}/products/bulk', content='\n'.join(rows),
+                                             headers={"Content-Type": "application/x-ndjson"})
+        return response.status_code
+
+    return [Scenario(f'bulk_import_{BULK_ROWS}_rows', bulk_import, hot=True)]
+
+
+async def product_scenarios(context: BenchmarkContext, size: int) -> list[Scenario]:
+    cursors = itertools.cycle(await sample_cursors(context, size))
+    product_ids = await sample_product_ids(context)
+    access_token = context.access_tokens[0]
+
+    async def get_product(worker: int, iteration: int) -> int:
+        product_id = product_ids[iteration % len(product_ids)]
+        response = await context.client.get(f'{context.api}/products/{product_id}',
+                                            headers={"Authorization": f'Bearer {access_token}'})
+        return response.status_code
+
+    # The ids of a cart, fetched in one request instead of one request per product
+    async def batch_get(worker: int, iteration: int) -> int:
+        start = iteration * BATCH_GET_IDS % len(product_ids)
+        ids = (product_ids[start:] + product_ids[:start])[:BATCH_GET_IDS]
+        response = await context.client.post(f'{context.api}/products/batch-get', json={"ids": ids})
+        return response.status_code
+
+    async def first_page(worker: int, iteration: int) -> int:
+        response = await context.client.get(f'{context.api}/products/all/', params={"limit": 100})
+        return response.status_code
+
+    async def cursor_page(worker: int, iteration: int) -> int:
+        response = await context.client.get(f'{context.api}/products/all/',
+                                            params={"limit": 100, "cursor": next(cursors)})
+        return response.status_code
+
+    async def search(worker: int, iteration: int) -> int:
+        response = await context.client.get(f'{context.api}/products/search', params={
+            "product_category": f'category-{iteration % CATEGORIES}', "max_price": 500, "sort_by": "product_price",
+            "limit": 50})
+        return response.status_code
+
+    return [
+        Scenario(f'product_by_id@{size}', get_product, hot=True),
+        Scenario(f'batch_get_{BATCH_GET_IDS}_ids@{size}', batch_get, hot=True),
+        Scenario(f'list_first_page@{size}', first_page, hot=True),
+        Scenario(f'list_cursor_page@{size}', cursor_page, hot=True),
+        Scenario(f'search_category_price@{size}', search),
+    ]
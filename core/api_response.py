@@ -1,9 +1,12 @@
-from typing import Any
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
 from uuid import uuid4
 
+from core.batch_loader import BatchLoader
+from core.config import settings
 from core.errors import BaseExceptions
-from models.response_model import BaseErrorModel, Status, ResponseModel
-from utils.logger import logger_api
+from models.response_model import BaseErrorModel, Status
+from utils.logger import StructuredLogger, logger_api
 
 
 class ApiResponse:
@@ -13,6 +16,8 @@ class ApiResponse:
         self._data = None
         self._errors = []
         self._logger = logger_api(self._process_id)
+        self._module_loggers: dict[str, StructuredLogger] = {}
+        self._batch_loaders: dict[str, BatchLoader] = {}
 
     def add_error(self, error: BaseExceptions):
         self._errors.append(
@@ -38,6 +43,20 @@ class ApiResponse:
     def logger(self):
         return self._logger
 
+    # Logger of a module of the api, with the level set for it in LOG_LEVELS
+    def module_logger(self, module_name: str) -> StructuredLogger:
+        logger = self._module_loggers.get(module_name)
+        if logger is None:
+            logger = self._module_loggers[module_name] = logger_api(self._process_id, module_name)
+        return logger
+
+    # Loader of the request by name, the concurrent loads of the request are merged in batches
+    def batch_loader(self, name: str, load_many: Callable[[list], Awaitable[dict]]) -> BatchLoader:
+        loader = self._batch_loaders.get(name)
+        if loader is None:
+            loader = self._batch_loaders[name] = BatchLoader(load_many, settings.BATCH_LOAD_MAX_SIZE)
+        return loader
+
     @status.setter
     def status(self, value: Status):
         self._status = value
@@ -48,10 +67,40 @@ class ApiResponse:
 
     @property
     def set_result(self):
-        response = ResponseModel(
-            process_id=self._process_id,
-            status=self._status.value,
-            data=self._data,
-            errors=self._errors,
-        ).model_dump()
-        return response
+        # Validated and serialized in one pass by the TypeAdapter of the endpoint response model
+        return {
+            "process_id": self._process_id,
+            "status": self._status.value,
+            "data": self._data,
+            "errors": self._errors,
+        }
+
+
+_current_api_response: ContextVar[ApiResponse | None] = ContextVar('api_response', default=None)
+
+
+# Function to make the ApiResponse of a request the one used by the singletons while serving it
+def set_current_api_response(api_response: ApiResponse) -> None:
+    _current_api_response.set(api_response)
+
+
+def current_api_response() -> ApiResponse:
+    api_response = _current_api_response.get()
+    # Outside a request, like at startup, the calls get their own process id
+    if api_response is None:
+        api_response = ApiResponse()
+        _current_api_response.set(api_response)
+    return api_response
+
+
+# Base of the application-scoped repositories and services, which log with the ApiResponse of the request
+class RequestScoped:
+    logger_name: str = 'services'
+
+    @property
+    def api_response(self) -> ApiResponse:
+        return current_api_response()
+
+    @property
+    def logger(self) -> StructuredLogger:
+        return current_api_response().module_logger(self.logger_name)
@@ -1,23 +1,35 @@
+import time
 from typing import Annotated
-from fastapi import Depends
+from fastapi import Depends, Request
 from fastapi.security import OAuth2PasswordBearer
 
 from core.api_response import ApiResponse
+from core.config import settings
 from core.errors import UnauthorizedError
 from core.jwt_handler import decode_token, TokenType
+from core.token_cache import token_cache
 from models.response_model import LocationError
 from models.users import TokenData
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token")
 
 
-# Add function to extract user from token
+# Add function to extract user from token. The session of the token is checked when it is not cached, so a
+# logout or a revoked session ends its access tokens too
 async def get_current_user(
+        request: Request,
         token: Annotated[str, Depends(oauth2_scheme)],
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> TokenData:
+    token_data = token_cache.get(token)
+    if token_data:
+        return token_data
+
     payload = decode_token(token, TokenType.ACCESS_TOKEN)
     if not payload or 'id' not in payload:
         raise UnauthorizedError(message="Invalid credentials", location=LocationError.Headers)
     token_data = TokenData(**payload)
+    if not await request.app.container.auth_services.is_session_active(token_data):
+        raise UnauthorizedError(message="Session expired", location=LocationError.Headers)
+    token_cache.set(token, token_data, min(payload['exp'], time.time() + settings.TOKEN_SESSION_CHECK_SECONDS))
     return token_data
@@ -0,0 +1,55 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+# Merges the loads of single keys made in the same event loop iteration into one load of all of them, like a
+# DataLoader. Keys are not cached between iterations, so a load after a write always reads the new value
+class BatchLoader(Generic[K, V]):
+    def __init__(self, load_many: Callable[[list[K]], Awaitable[dict[K, V]]], max_batch_size: int):
+        self._load_many = load_many
+        self.max_batch_size = max_batch_size
+        self._pending: dict[K, asyncio.Future] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+
+    # Returns None for the keys missing from the result of load_many
+    async def load(self, key: K) -> V | None:
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                # Runs after the callbacks already scheduled, so the loads of every task resumed in this
+                # iteration are in the batch
+                loop.call_soon(self._dispatch)
+            future = self._pending[key] = loop.create_future()
+        # A cancelled caller does not cancel the load of the other callers of the same key
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        pending, self._pending = list(self._pending.items()), {}
+        for start in range(0, len(pending), self.max_batch_size):
+            task = asyncio.create_task(self._load(dict(pending[start:start + self.max_batch_size])))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _load(self, futures: dict[K, asyncio.Future]) -> None:
+        self.batches += 1
+        try:
+            values = await self._load_many(list(futures))
+        except BaseException as error:
+            for future in futures.values():
+                if isinstance(error, asyncio.CancelledError):
+                    future.cancel()
+                elif not future.done():
+                    future.set_exception(error)
+                    # Mark the exception as retrieved when nobody else was waiting for it
+                    future.exception()
+            if isinstance(error, asyncio.CancelledError):
+                raise
+            return
+        for key, future in futures.items():
+            if not future.done():
+                future.set_result(values.get(key))
@@ -0,0 +1,225 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Protocol
+from uuid import uuid4
+
+from pydantic import TypeAdapter
+
+from core.config import settings
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> Any | None:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+
+# Bounded LRU of python objects local to the process, entries expire after the ttl
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+
+    async def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+
+# Client of a key-value store shared by every process, redis.asyncio.Redis has this interface
+class KeyValueClient(Protocol):
+    async def get(self, key: str) -> bytes | None:
+        ...
+
+    async def set(self, key: str, value: bytes, ex: int | None = None) -> Any:
+        ...
+
+    async def delete(self, *keys: str) -> Any:
+        ...
+
+
+# Shared key-value store with atomic counters, also in redis.asyncio.Redis
+class CounterClient(KeyValueClient, Protocol):
+    async def incr(self, key: str) -> int:
+        ...
+
+    async def expire(self, key: str, seconds: int) -> Any:
+        ...
+
+
+# Local fake of a shared key-value store, for tests and single process deployments
+class InMemoryKeyValueClient:
+    def __init__(self):
+        self._values: dict[str, tuple[bytes, float | None]] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._values[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: bytes, ex: int | None = None) -> None:
+        self._values[key] = (value, time.monotonic() + ex if ex else None)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._values.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        value = await self.get(key)
+        count = int(value or 0) + 1
+        expires_at = self._values[key][1] if value is not None else None
+        self._values[key] = (str(count).encode('utf-8'), expires_at)
+        return count
+
+    async def expire(self, key: str, seconds: int) -> None:
+        if key in self._values:
+            self._values[key] = (self._values[key][0], time.monotonic() + seconds)
+
+
+shared_cache_client: CounterClient = InMemoryKeyValueClient()
+
+
+# Stores values as JSON in the shared client, clear() moves the namespace to a new generation
+class SharedCacheBackend(CacheBackend):
+    def __init__(self, namespace: str, adapter: TypeAdapter, ttl: int, client: KeyValueClient | None = None):
+        self.namespace = namespace
+        self.adapter = adapter
+        self.ttl = ttl
+        self._client = client
+
+    @property
+    def client(self) -> KeyValueClient:
+        return self._client or shared_cache_client
+
+    async def _generation(self) -> str:
+        generation_key = f'{self.namespace}:generation'
+        generation = await self.client.get(generation_key)
+        if generation is None:
+            generation = uuid4().hex.encode('utf-8')
+            await self.client.set(generation_key, generation)
+        return generation.decode('utf-8')
+
+    async def _key(self, key: str) -> str:
+        return f'{self.namespace}:{await self._generation()}:{key}'
+
+    async def get(self, key: str) -> Any | None:
+        value = await self.client.get(await self._key(key))
+        return None if value is None else self.adapter.validate_json(value)
+
+    async def set(self, key: str, value: Any) -> None:
+        await self.client.set(await self._key(key), self.adapter.dump_json(value, by_alias=True), ex=self.ttl)
+
+    async def delete(self, *keys: str) -> None:
+        generation = await self._generation()
+        await self.client.delete(*[f'{self.namespace}:{generation}:{key}' for key in keys])
+
+    async def clear(self) -> None:
+        await self.client.set(f'{self.namespace}:generation', uuid4().hex.encode('utf-8'))
+
+
+def build_cache_backend(namespace: str, adapter: TypeAdapter) -> CacheBackend:
+    if settings.CACHE_BACKEND == 'shared':
+        return SharedCacheBackend(namespace, adapter, ttl=settings.CACHE_TTL)
+    return MemoryCacheBackend(max_size=settings.CACHE_MAX_SIZE, ttl=settings.CACHE_TTL)
+
+
+# Read-through cache that merges concurrent misses of the same key into a single load
+class ReadThroughCache:
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._loading: dict[str, asyncio.Future] = {}
+        self._version = 0
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        loading = self._loading.get(key)
+        if loading is not None:
+            self.coalesced += 1
+            return await asyncio.shield(loading)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        version = self._version
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as error:
+            future.set_exception(error)
+            # Mark the exception as retrieved when nobody else was waiting for it
+            future.exception()
+            raise
+        finally:
+            del self._loading[key]
+
+        # A write during the load makes the value stale, so it is returned but not stored
+        if value is not None and version == self._version:
+            await self.backend.set(key, value)
+        future.set_result(value)
+        return value
+
+    async def invalidate(self, *keys: str) -> None:
+        self._version += 1
+        await self.backend.delete(*keys)
+
+    async def clear(self) -> None:
+        self._version += 1
+        await self.backend.clear()
+
+    @property
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
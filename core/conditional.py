@@ -0,0 +1,58 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+
+# Strong validator of a document, any write changes its update_at
+def document_etag(_id: str, update_at: datetime) -> str:
+    digest = hashlib.sha256(f'{_id}:{update_at.isoformat()}'.encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+# Strong validator of every list of a collection, the version changes with every write to it
+def collection_etag(collection_name: str, version: int) -> str:
+    return f'"{collection_name}-{version}"'
+
+
+def has_conditional_headers(request: Request) -> bool:
+    return 'if-none-match' in request.headers or 'if-modified-since' in request.headers
+
+
+def _http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+# Function to check the validators of a GET request. If-Modified-Since is only used without If-None-Match
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*':
+            return True
+        # Weak comparison, as GET requests allow
+        return etag in (tag.strip().removeprefix('W/') for tag in if_none_match.split(','))
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        modified_since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if modified_since.tzinfo is None:
+        modified_since = modified_since.replace(tzinfo=timezone.utc)
+    # HTTP dates have no fractions of a second
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= modified_since
+
+
+def set_validators(response: Response, etag: str, last_modified: datetime | None) -> None:
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = _http_date(last_modified)
+
+
+def not_modified_response(etag: str, last_modified: datetime | None) -> Response:
+    response = Response(status_code=304)
+    set_validators(response, etag, last_modified)
+    return response
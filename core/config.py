@@ -1,19 +1,70 @@
-from pydantic import EmailStr
+from typing import Literal
+
+from pydantic import BaseModel, EmailStr
 from pydantic_settings import BaseSettings
 
 
+ReadPreferenceMode = Literal["primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"]
+
+
+# Bursts of up to `requests`, refilled at `requests` per `seconds`
+class RateLimit(BaseModel):
+    requests: int
+    seconds: float
+
+
+class RouteRateLimit(BaseModel):
+    # Limit of each client IP
+    ip: RateLimit
+    # Limit of each account, identified by the account_field of the JSON or form body
+    account: RateLimit | None = None
+    account_field: str | None = None
+
+
 class Settings(BaseSettings):
     ENV: str
     DB_CONNECTION: str
     DB_NAME: str
+    DB_MAX_POOL_SIZE: int = 100
+    # Connections opened at startup and kept open by the driver
+    DB_MIN_POOL_SIZE: int = 10
+    DB_MAX_IDLE_TIME_MS: int | None = None
+    DB_WAIT_QUEUE_TIMEOUT_MS: int | None = None
+    DB_CONNECT_TIMEOUT_MS: int = 10000
+    DB_SERVER_SELECTION_TIMEOUT_MS: int = 10000
+    DB_SOCKET_TIMEOUT_MS: int | None = None
+    # Comma separated, e.g. "zstd,snappy,zlib", the server uses the first one it supports
+    DB_COMPRESSORS: str = ""
+    DB_READ_PREFERENCE: ReadPreferenceMode = "primary"
+    # Read preference of long reads like the product lists, search and exports.
+    # Reads from secondaries may not see the latest writes yet
+    DB_LONG_READ_PREFERENCE: ReadPreferenceMode = "primary"
+    DB_MAX_STALENESS_SECONDS: int = -1
+    DB_POOL_SATURATION_THRESHOLD: float = 0.9
+    HEALTH_CHECK_TIMEOUT: float = 2
     API_STR: str = "/api"
     SECRET_KEY: str
     SECRET_KEY_REFRESH: str
+    # Key ids sent in the kid header of the tokens. To rotate a key, move the current one to the *_PREVIOUS
+    # settings by its id, its tokens are accepted until they expire
+    SECRET_KEY_ID: str | None = None
+    SECRET_KEY_REFRESH_ID: str | None = None
+    SECRET_KEYS_PREVIOUS: dict[str, str] = {}
+    SECRET_KEYS_REFRESH_PREVIOUS: dict[str, str] = {}
 
     SMTP_SERVER: str
     SMTP_PORT: int
     SMTP_USERNAME: EmailStr
     SMTP_PASSWORD: str
+    SMTP_STARTTLS: bool = True
+    SMTP_TIMEOUT: float = 10
+
+    EMAIL_OUTBOX_SIZE: int = 1000
+    EMAIL_WORKERS: int = 2
+    EMAIL_BATCH_SIZE: int = 20
+    EMAIL_MAX_ATTEMPTS: int = 5
+    EMAIL_RETRY_BACKOFF: float = 1.0
+    EMAIL_SHUTDOWN_TIMEOUT: float = 10
 
     MAIL_USERNAME: str
     MAIL_PASSWORD: str
@@ -24,7 +75,72 @@ class Settings(BaseSettings):
     MAIL_STARTTLS: bool
     MAIL_SSL_TLS: bool
 
+    LOG_LEVEL: str = "INFO"
+    LOG_FILE: str = "logs/data_processor.log"
+    LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    LOG_BACKUP_COUNT: int = 5
+    # Rotates the log file by time instead of size, with a `when` of TimedRotatingFileHandler, e.g. "midnight" or "H"
+    LOG_ROTATE_WHEN: str | None = None
+    LOG_ROTATE_INTERVAL: int = 1
+    LOG_QUEUE_SIZE: int = 10000
+    # Levels of the modules that log apart from LOG_LEVEL, e.g. {"repositories": "WARNING", "services.auth": "DEBUG"}
+    LOG_LEVELS: dict[str, str] = {}
+    # Fraction of the debug logs of whole documents and lists that are written
+    LOG_PAYLOAD_SAMPLE_RATE: float = 0.01
+    # Longest rendering of a logged field, longer values are cut
+    LOG_FIELD_MAX_LENGTH: int = 200
+
+    PAGE_DEFAULT_LIMIT: int = 100
+    PAGE_MAX_LIMIT: int = 1000
+    STREAM_BATCH_SIZE: int = 500
+    BULK_CHUNK_SIZE: int = 1000
+    BULK_MAX_ERRORS: int = 1000
+    # Longest record of a CSV import, with the lines of its quoted fields
+    BULK_MAX_RECORD_LENGTH: int = 64 * 1024
+    BULK_EXPORT_BUFFER_SIZE: int = 64 * 1024
+    # Most ids of a batch get request
+    BATCH_GET_MAX_IDS: int = 100
+    # Most ids merged into one query by the batch loaders of a request
+    BATCH_LOAD_MAX_SIZE: int = 500
+    # Boundaries of the price ranges in the products summary, prices outside them count as "other"
+    PRODUCT_PRICE_RANGES: list[float] = [0, 10, 50, 100, 500, 1000]
+    # Disabled users and products can be restored for this time, then the db removes them
+    SOFT_DELETE_RETENTION_DAYS: int = 30
+
+    TOKEN_CACHE_SIZE: int = 10000
+    # Most time a validated access token is served from the cache before its session is checked again, so a
+    # session revoked by another process stops working within it
+    TOKEN_SESSION_CHECK_SECONDS: int = 60
+
+    # Time the responses of requests with an Idempotency-Key are kept to be replayed
+    IDEMPOTENCY_TTL: int = 24 * 60 * 60
+    # A request still in progress after this time is considered abandoned and its key can be used again
+    IDEMPOTENCY_LOCK_TIMEOUT: int = 60
+    IDEMPOTENCY_KEY_MAX_LENGTH: int = 255
+
+    CACHE_BACKEND: str = "memory"
+    CACHE_TTL: int = 60
+    CACHE_MAX_SIZE: int = 10000
+
+    BCRYPT_ROUNDS: int = 12
+    BCRYPT_MAX_WORKERS: int = 4
+    BCRYPT_MAX_PENDING: int = 64
 
+    RATE_LIMIT_ENABLED: bool = True
+    # "memory" keeps the buckets in the process, "shared" counts in the shared key-value store of every process
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    # By path under API_STR
+    RATE_LIMITS: dict[str, RouteRateLimit] = {
+        "/auth/login": RouteRateLimit(ip=RateLimit(requests=30, seconds=60),
+                                      account=RateLimit(requests=10, seconds=60), account_field="username"),
+        "/auth/token": RouteRateLimit(ip=RateLimit(requests=30, seconds=60),
+                                      account=RateLimit(requests=10, seconds=60), account_field="username"),
+        "/users/restore": RouteRateLimit(ip=RateLimit(requests=30, seconds=60),
+                                         account=RateLimit(requests=10, seconds=60), account_field="username"),
+        "/auth/recovery-password": RouteRateLimit(ip=RateLimit(requests=10, seconds=300),
+                                                  account=RateLimit(requests=3, seconds=900), account_field="email"),
+    }
 
 
 # Create a Settings instance that will load the variables from the .env file
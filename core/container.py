@@ -0,0 +1,21 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from api.auth.services.auth_services import AuthServices
+from api.monitoring.services.monitoring_services import MonitoringService
+from api.products.services.products_services import ProductsService
+from api.users.services.users_services import UsersService
+from repositories.idempotency import IdempotencyRepository
+from services.email_sending_service import EmailService
+
+
+# Services and repositories of the application, built once at startup and shared by every request. They keep no
+# request state: the ApiResponse comes from the request context and the token data is passed to each call
+class Container:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.email_service = EmailService()
+        self.idempotency_repository = IdempotencyRepository(db)
+        self.auth_services = AuthServices(db, self.email_service)
+        self.users_service = UsersService(db, self.email_service)
+        self.products_service = ProductsService(db)
+        self.monitoring_service = MonitoringService(db)
@@ -0,0 +1,48 @@
+import asyncio
+import functools
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+from core.config import settings
+from core.db_metrics import db_event_listeners
+from utils.logger import api_logger
+
+READ_PREFERENCES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+# Function to build a read preference from its mode name, primary reads do not accept a max staleness
+@functools.cache
+def get_read_preference(mode: str):
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCES[mode](max_staleness=settings.DB_MAX_STALENESS_SECONDS)
+
+
+def create_database_client() -> AsyncIOMotorClient:
+    options = {
+        "maxPoolSize": settings.DB_MAX_POOL_SIZE,
+        "minPoolSize": settings.DB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.DB_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.DB_WAIT_QUEUE_TIMEOUT_MS,
+        "connectTimeoutMS": settings.DB_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.DB_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": settings.DB_SOCKET_TIMEOUT_MS,
+        "compressors": settings.DB_COMPRESSORS or None,
+        "read_preference": get_read_preference(settings.DB_READ_PREFERENCE),
+    }
+    return AsyncIOMotorClient(settings.DB_CONNECTION, event_listeners=db_event_listeners,
+                              **{name: value for name, value in options.items() if value is not None})
+
+
+# Function to check the connection at startup and open the pool connections before the first requests
+async def warm_up_database(client: AsyncIOMotorClient) -> None:
+    await client.admin.command("ping")
+    # Every concurrent ping holds its own connection, so the pool opens them now
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(settings.DB_MIN_POOL_SIZE)))
+    api_logger.info(f'Database connection ready, {settings.DB_MIN_POOL_SIZE} pool connections opened')
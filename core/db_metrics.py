@@ -0,0 +1,68 @@
+from pymongo import monitoring
+
+from core.metrics import (db_command_duration_seconds, db_command_failures_total, db_pool_checkout_failures_total,
+                          db_pool_connections_in_use, db_pool_wait_seconds, db_pool_waiting_checkouts)
+
+
+# Server side duration of every command sent by the driver
+class CommandMetricsListener(monitoring.CommandListener):
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        db_command_duration_seconds.observe(event.duration_micros / 1e6, event.command_name)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        db_command_duration_seconds.observe(event.duration_micros / 1e6, event.command_name)
+        db_command_failures_total.inc(event.command_name)
+
+
+# The driver keeps one pool per server, so the pool gauges are labeled with its address
+def _server(address: tuple[str, int]) -> str:
+    host, port = address
+    return f'{host}:{port}'
+
+
+# Time waited for a free connection, which grows when the pool is too small for the load
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+        db_pool_waiting_checkouts.inc(_server(event.address))
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        db_pool_waiting_checkouts.dec(_server(event.address))
+        if event.duration is not None:
+            db_pool_wait_seconds.observe(event.duration)
+        db_pool_connections_in_use.inc(_server(event.address))
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        db_pool_connections_in_use.dec(_server(event.address))
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        db_pool_waiting_checkouts.dec(_server(event.address))
+        if event.duration is not None:
+            db_pool_wait_seconds.observe(event.duration)
+        db_pool_checkout_failures_total.inc(event.reason)
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        pass
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        pass
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        pass
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        pass
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        pass
+
+
+db_event_listeners = [CommandMetricsListener(), PoolMetricsListener()]
@@ -52,6 +52,21 @@ class UnexpectedError(_BaseException):
     description = "Unexpected error"
 
 
+class ConflictError(_BaseException):
+    status = Status.CONFLICT
+    description = "Conflict"
+
+
+class TooManyRequestsError(_BaseException):
+    status = Status.TOO_MANY_REQUESTS
+    description = "Too many requests"
+
+
+class ServiceUnavailableError(_BaseException):
+    status = Status.SERVICE_UNAVAILABLE
+    description = "Service unavailable"
+
+
 class InvalidCredentialsError(_BaseException):
     status = Status.UNAUTHORIZED
     description = "Invalid credentials"
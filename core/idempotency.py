@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from fastapi import Request, Response
+
+from core.api_response import ApiResponse
+from core.config import settings
+from core.errors import ConflictError, InvalidParameterError
+from models.response_model import LocationError
+
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+IDEMPOTENT_REPLAYED_HEADER = 'Idempotent-Replayed'
+# Headers the replay sets by itself or that must not be sent again
+NOT_STORED_HEADERS = {'content-length', 'content-type', 'date', 'server', 'set-cookie'}
+
+
+@dataclass
+class StoredResponse:
+    request_hash: str
+    status_code: int
+    content: bytes
+    media_type: str | None
+    headers: list[tuple[str, str]]
+
+
+# Requests with an Idempotency-Key being processed in this process, repeated ones wait for the first
+_in_flight: dict[str, asyncio.Future] = {}
+
+
+# Function to identify a request by its method, path, authenticated user and body, a key can only be used by one
+# request. The user is hashed instead of the credentials, so a retry with a refreshed access token is the same request
+async def request_hash(request: Request, subject: str | None = None) -> str:
+    digest = hashlib.sha256()
+    for part in (request.method, request.url.path, subject or ''):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(await request.body())
+    return digest.hexdigest()
+
+
+def replay(stored: StoredResponse, current_hash: str) -> Response:
+    if stored.request_hash != current_hash:
+        raise InvalidParameterError(message=f'The {IDEMPOTENCY_KEY_HEADER} was already used with a different request',
+                                    location=LocationError.Headers)
+    response = Response(content=stored.content, status_code=stored.status_code, media_type=stored.media_type)
+    response.raw_headers.extend((name.encode('latin-1'), value.encode('latin-1')) for name, value in stored.headers)
+    response.headers[IDEMPOTENT_REPLAYED_HEADER] = 'true'
+    return response
+
+
+def stored_headers(response: Response) -> list[tuple[str, str]]:
+    return [(name.decode('latin-1'), value.decode('latin-1')) for name, value in response.raw_headers
+            if name.decode('latin-1').lower() not in NOT_STORED_HEADERS]
+
+
+# Function to run a request at most once per key and user. The stored response is replayed for repeated keys,
+# without running the endpoint again. Server errors are not stored, so those requests can be retried
+async def run_idempotent(request: Request, api_response: ApiResponse, key: str,
+                         handle: Callable[[], Awaitable[Response]], subject: str | None = None) -> Response:
+    if len(key) > settings.IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise InvalidParameterError(message=f'The {IDEMPOTENCY_KEY_HEADER} can have at most '
+                                            f'{settings.IDEMPOTENCY_KEY_MAX_LENGTH} characters',
+                                    location=LocationError.Headers)
+    record_id = f'{request.method}:{request.url.path}:{subject or ""}:{key}'
+    current_hash = await request_hash(request, subject)
+
+    in_flight = _in_flight.get(record_id)
+    if in_flight is not None:
+        api_response.logger.info(f'Waiting for the request with the same {IDEMPOTENCY_KEY_HEADER}')
+        return replay(await asyncio.shield(in_flight), current_hash)
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[record_id] = future
+    idempotency_repository = request.app.container.idempotency_repository
+    try:
+        record = await idempotency_repository.reserve(record_id, current_hash)
+        if record is not None:
+            if record.status_code is None:
+                raise ConflictError(message=f'A request with the same {IDEMPOTENCY_KEY_HEADER} is in progress',
+                                    location=LocationError.Headers)
+            stored = StoredResponse(record.request_hash, record.status_code, record.content, record.media_type,
+                                    record.headers)
+            future.set_result(stored)
+            api_response.logger.info(f'Replaying the stored response of the {IDEMPOTENCY_KEY_HEADER}')
+            return replay(stored, current_hash)
+
+        try:
+            response = await handle()
+        except BaseException:
+            await idempotency_repository.release(record_id)
+            raise
+        stored = StoredResponse(current_hash, response.status_code, bytes(response.body), response.media_type,
+                                stored_headers(response))
+        # The request already ran, so a failure to store its response is not sent to the client
+        try:
+            if response.status_code < 500:
+                await idempotency_repository.complete(record_id, stored.status_code, stored.content,
+                                                      stored.media_type, stored.headers)
+            else:
+                await idempotency_repository.release(record_id)
+        except Exception as error:
+            api_response.logger.error(f'The response of the {IDEMPOTENCY_KEY_HEADER} could not be stored', error=error)
+        future.set_result(stored)
+        return response
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as error:
+        if not future.done():
+            future.set_exception(error)
+            # Mark the exception as retrieved when nobody else was waiting for it
+            future.exception()
+        raise
+    finally:
+        del _in_flight[record_id]
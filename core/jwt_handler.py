@@ -1,14 +1,16 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
 import secrets
-from datetime import datetime, timedelta
+import time
 from enum import Enum
-from jose import jwt, JWTError, ExpiredSignatureError
 
 from core.config import settings
 from core.errors import UnauthorizedError
 from models.response_model import LocationError
 
-SECRET_KEY = settings.SECRET_KEY
-SECRET_KEY_REFRESH = settings.SECRET_KEY_REFRESH
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
@@ -19,36 +21,113 @@ class TokenType(str, Enum):
     REFRESH_TOKEN = "refresh_token"
 
 
-# Function to create the JWT
-def create_token(data: dict, token_type: TokenType):
-    to_encode = data.copy()
-    if token_type == TokenType.ACCESS_TOKEN:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, SECRET_KEY, ALGORITHM)
-    if token_type == TokenType.REFRESH_TOKEN:
-        expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-        to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, SECRET_KEY_REFRESH, ALGORITHM)
-    return encoded_jwt
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b'=' * (-len(data) % 4))
+
+
+def _json_dumps(data: dict) -> bytes:
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+# HMAC key with its HMAC object and its encoded token header built once, tokens only copy them
+class SigningKey:
+    def __init__(self, secret: str, kid: str | None = None):
+        self.kid = kid
+        self._mac = hmac.new(secret.encode('utf-8'), digestmod=hashlib.sha256)
+        header = {"alg": ALGORITHM, "typ": "JWT"}
+        if kid is not None:
+            header["kid"] = kid
+        self.header = _b64encode(_json_dumps(header))
+
+    def sign(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+
+# Current key of a token type, which signs the new tokens, and the previous keys still accepted
+class KeyRing:
+    def __init__(self, secret: str, kid: str | None, previous: dict[str, str], expire_seconds: int):
+        self.current = SigningKey(secret, kid)
+        self.expire_seconds = expire_seconds
+        self._by_kid = {previous_kid: SigningKey(previous_secret, previous_kid)
+                        for previous_kid, previous_secret in previous.items()}
+        self._by_kid[kid] = self.current
+        # Tokens without kid were signed before the key had an id
+        self._by_kid[None] = self.current
+        self._by_header = {key.header: key for key in self._by_kid.values()}
+
+    def key_of(self, header_segment: bytes) -> SigningKey | None:
+        # The headers written by this module are known, any other one is parsed
+        key = self._by_header.get(header_segment)
+        if key is not None:
+            return key
+        header = json.loads(_b64decode(header_segment))
+        if not isinstance(header, dict) or header.get("alg") != ALGORITHM:
+            return None
+        # A token without kid is signed with the current key, a kid of any other type is forged
+        kid = header.get("kid")
+        if kid is not None and not isinstance(kid, str):
+            return None
+        return self._by_kid.get(kid)
+
+    def encode(self, claims: dict) -> str:
+        signing_input = self.current.header + b'.' + _b64encode(_json_dumps(claims))
+        return (signing_input + b'.' + _b64encode(self.current.sign(signing_input))).decode('ascii')
+
+
+KEY_RINGS = {
+    TokenType.ACCESS_TOKEN: KeyRing(settings.SECRET_KEY, settings.SECRET_KEY_ID, settings.SECRET_KEYS_PREVIOUS,
+                                    ACCESS_TOKEN_EXPIRE_MINUTES * 60),
+    TokenType.REFRESH_TOKEN: KeyRing(settings.SECRET_KEY_REFRESH, settings.SECRET_KEY_REFRESH_ID,
+                                     settings.SECRET_KEYS_REFRESH_PREVIOUS, REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60),
+}
+
+
+# Function to create the JWT, exp and iat are integer timestamps
+def create_token(data: dict, token_type: TokenType) -> str:
+    key_ring = KEY_RINGS[token_type]
+    now = int(time.time())
+    return key_ring.encode({**data, "iat": now, "exp": now + key_ring.expire_seconds})
+
+
+# Function to create the access and refresh tokens of the same data, jti identifies the refresh token
+def create_token_pair(data: dict, jti: str) -> tuple[str, str]:
+    now = int(time.time())
+    access_ring, refresh_ring = KEY_RINGS[TokenType.ACCESS_TOKEN], KEY_RINGS[TokenType.REFRESH_TOKEN]
+    claims = {**data, "iat": now, "exp": now + access_ring.expire_seconds}
+    access_token = access_ring.encode(claims)
+    claims.update(exp=now + refresh_ring.expire_seconds, jti=jti)
+    return access_token, refresh_ring.encode(claims)
+
+
+def _invalid_token() -> UnauthorizedError:
+    return UnauthorizedError(message="Invalid token or signature verification failed", location=LocationError.Headers)
 
 
 # Function to decode the JWT
-def decode_token(token: str, token_type: TokenType):
+def decode_token(token: str, token_type: TokenType) -> dict:
     try:
-        if token_type == TokenType.ACCESS_TOKEN:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        if token_type == TokenType.REFRESH_TOKEN:
-            payload = jwt.decode(token, SECRET_KEY_REFRESH, algorithms=[ALGORITHM])
-
-        if not payload.get("id"):
-            raise UnauthorizedError(message="Invalid token", location=LocationError.Body)
-        return payload
-    except ExpiredSignatureError:
+        header_segment, payload_segment, signature_segment = token.encode('ascii').split(b'.')
+        key = KEY_RINGS[token_type].key_of(header_segment)
+        if key is None or not hmac.compare_digest(key.sign(header_segment + b'.' + payload_segment),
+                                                  _b64decode(signature_segment)):
+            raise _invalid_token()
+        payload = json.loads(_b64decode(payload_segment))
+    except (ValueError, binascii.Error):
+        raise _invalid_token()
+
+    if not isinstance(payload, dict) or not isinstance(payload.get("exp"), (int, float)):
+        raise _invalid_token()
+    if payload["exp"] <= time.time():
         raise UnauthorizedError(message="Token has expired", location=LocationError.Headers)
-    except JWTError:
-        raise UnauthorizedError(message="Invalid token or signature verification failed",
-                                location=LocationError.Headers)
+    if not payload.get("id"):
+        raise UnauthorizedError(message="Invalid token", location=LocationError.Body)
+    return payload
 
 
 # Function to create random token
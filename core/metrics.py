@@ -0,0 +1,200 @@
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+PASSWORD_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_value(value: float) -> str:
+    return '+Inf' if value == float('inf') else str(value)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    labels = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+# Base of the metrics, each series is identified by the values of its labels.
+# Motor calls the event listeners from its worker threads, so every update takes the metric lock
+class Metric(ABC):
+    type_name = 'untyped'
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = labels
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, ...], object] = {}
+
+    @abstractmethod
+    def _samples(self) -> list[str]:
+        ...
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} {self.type_name}']
+        with self._lock:
+            lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    type_name = 'counter'
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._series.get(labels, 0)
+
+    def _samples(self) -> list[str]:
+        return [f'{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}'
+                for labels, value in self._series.items()]
+
+
+class Gauge(Metric):
+    type_name = 'gauge'
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._series[labels] = value
+
+    def value(self, *labels: str) -> float:
+        return self._series.get(labels, 0)
+
+    # Current value of every series, by the values of its labels
+    def values(self) -> dict[tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._series)
+
+    def _samples(self) -> list[str]:
+        return [f'{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}'
+                for labels, value in self._series.items()]
+
+
+# Fixed buckets, an observation is one bisect and one increment
+class Histogram(Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Counts of each bucket plus the +Inf one, the sum and the count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def _samples(self) -> list[str]:
+        samples = []
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float('inf')), counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.label_names, labels, f'le="{_format_value(bound)}"')
+                samples.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            samples.append(f'{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}')
+            samples.append(f'{self.name}_count{_format_labels(self.label_names, labels)} {count}')
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, description, labels))
+
+    def histogram(self, name: str, description: str, labels: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, description, labels, buckets))
+
+    # Prometheus text exposition format
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+metrics = MetricsRegistry()
+
+http_requests_total = metrics.counter(
+    'http_requests_total', 'HTTP requests by route and status code', ('method', 'route', 'status'))
+http_request_duration_seconds = metrics.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route', ('method', 'route'))
+http_requests_in_progress = metrics.gauge(
+    'http_requests_in_progress', 'HTTP requests being served', ('method',))
+http_requests_rate_limited_total = metrics.counter(
+    'http_requests_rate_limited_total', 'HTTP requests rejected by the rate limits, by path and limit',
+    ('path', 'limit'))
+
+db_operation_duration_seconds = metrics.histogram(
+    'db_operation_duration_seconds', 'Duration of the repository calls to the database by operation and collection',
+    ('operation', 'collection'), DB_BUCKETS)
+db_command_duration_seconds = metrics.histogram(
+    'db_command_duration_seconds', 'Server duration of the database commands', ('command',), DB_BUCKETS)
+db_command_failures_total = metrics.counter(
+    'db_command_failures_total', 'Database commands that failed', ('command',))
+db_pool_wait_seconds = metrics.histogram(
+    'db_pool_wait_seconds', 'Time spent waiting for a connection of the database pool', (), DB_BUCKETS)
+db_pool_checkout_failures_total = metrics.counter(
+    'db_pool_checkout_failures_total', 'Connections that could not be taken from the database pool', ('reason',))
+db_pool_connections_in_use = metrics.gauge(
+    'db_pool_connections_in_use', 'Connections of the database pool in use, by server', ('server',))
+db_pool_waiting_checkouts = metrics.gauge(
+    'db_pool_waiting_checkouts', 'Operations waiting for a connection of the database pool, by server', ('server',))
+
+password_operation_duration_seconds = metrics.histogram(
+    'password_operation_duration_seconds', 'Duration of bcrypt operations, including the wait for a worker',
+    ('operation',), PASSWORD_BUCKETS)
+password_operations_pending = metrics.gauge(
+    'password_operations_pending', 'bcrypt operations running or waiting for a worker')
+password_operations_rejected_total = metrics.counter(
+    'password_operations_rejected_total', 'bcrypt operations rejected because the worker pool was full')
+
+smtp_connect_duration_seconds = metrics.histogram(
+    'smtp_connect_duration_seconds', 'Duration of the SMTP connection and login')
+smtp_send_duration_seconds = metrics.histogram(
+    'smtp_send_duration_seconds', 'Duration of each SMTP message sent', ('outcome',))
+email_dropped_total = metrics.counter(
+    'email_dropped_total', 'Emails dropped, by reason: every delivery attempt failed, the message could not be sent '
+    'or the outbox was full', ('reason',))
@@ -0,0 +1,74 @@
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from core.cache import CounterClient, shared_cache_client
+from core.config import RateLimit, settings
+
+
+class RateLimitBackend(ABC):
+    # Returns 0 when the request is allowed, otherwise the seconds until it would be
+    @abstractmethod
+    async def acquire(self, key: str, limit: RateLimit) -> float:
+        ...
+
+
+# Token buckets local to the process. A bucket that refilled completely is the same as a missing one, so the
+# buckets not used since then are dropped, and the least recently used ones when there are more than max_keys
+class MemoryRateLimitBackend(RateLimitBackend):
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # Tokens left, time of the last request and time the bucket is full again
+        self._buckets: OrderedDict[str, tuple[float, float, float]] = OrderedDict()
+
+    async def acquire(self, key: str, limit: RateLimit) -> float:
+        now = time.monotonic()
+        refill_rate = limit.requests / limit.seconds
+        tokens, updated_at, _ = self._buckets.pop(key, (limit.requests, now, now))
+        tokens = min(limit.requests, tokens + (now - updated_at) * refill_rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / refill_rate
+        self._buckets[key] = (tokens, now, now + (limit.requests - tokens) / refill_rate)
+
+        while self._buckets:
+            _, (_, _, full_at) = next(iter(self._buckets.items()))
+            if full_at > now and len(self._buckets) <= self.max_keys:
+                break
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+# Sliding window counters in the shared key-value store, so every process counts the same requests.
+# The count of the previous window is weighted by the part of it still inside the sliding window
+class SharedRateLimitBackend(RateLimitBackend):
+    def __init__(self, namespace: str, client: CounterClient | None = None):
+        self.namespace = namespace
+        self._client = client
+
+    @property
+    def client(self) -> CounterClient:
+        return self._client or shared_cache_client
+
+    async def acquire(self, key: str, limit: RateLimit) -> float:
+        position = time.time() / limit.seconds
+        window = math.floor(position)
+        current_key = f'{self.namespace}:{key}:{window}'
+        count = await self.client.incr(current_key)
+        if count == 1:
+            await self.client.expire(current_key, math.ceil(limit.seconds * 2))
+        previous_count = int(await self.client.get(f'{self.namespace}:{key}:{window - 1}') or 0)
+
+        elapsed = position - window
+        if previous_count * (1 - elapsed) + count <= limit.requests:
+            return 0.0
+        return (1 - elapsed) * limit.seconds
+
+
+def build_rate_limit_backend() -> RateLimitBackend:
+    if settings.RATE_LIMIT_BACKEND == 'shared':
+        return SharedRateLimitBackend('rate_limit')
+    return MemoryRateLimitBackend(max_keys=settings.RATE_LIMIT_MAX_KEYS)
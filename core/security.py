@@ -1,20 +1,62 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
 
-from core.errors import UnauthorizedError
+from core.config import settings
+from core.errors import UnauthorizedError, ServiceUnavailableError
+from core.metrics import password_operation_duration_seconds, password_operations_pending, \
+    password_operations_rejected_total
 from models.response_model import LocationError
 
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+_password_executor: ThreadPoolExecutor | None = None
+_pending_operations = 0
+
+
+# Function to get the worker pool, built again after stop_password_executor when the same process starts the
+# application again
+def _get_password_executor() -> ThreadPoolExecutor:
+    global _password_executor
+    if _password_executor is None:
+        _password_executor = ThreadPoolExecutor(max_workers=settings.BCRYPT_MAX_WORKERS, thread_name_prefix='bcrypt')
+    return _password_executor
+
+
+# Function to run a bcrypt call in the worker pool, rejecting new work when the queue is full
+async def _run_in_password_pool(operation: str, func, *args):
+    global _pending_operations
+    if _pending_operations >= settings.BCRYPT_MAX_PENDING:
+        password_operations_rejected_total.inc()
+        raise ServiceUnavailableError(message="Too many password operations in progress, try again later",
+                                      location=LocationError.Server)
+    _pending_operations += 1
+    password_operations_pending.set(_pending_operations)
+    try:
+        loop = asyncio.get_running_loop()
+        with password_operation_duration_seconds.time(operation):
+            return await loop.run_in_executor(_get_password_executor(), func, *args)
+    finally:
+        _pending_operations -= 1
+        password_operations_pending.set(_pending_operations)
+
+
+def _hash_password(password_bytes: bytes) -> bytes:
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
+    return bcrypt.hashpw(password_bytes, salt)
+
 
 # Function to hash the password using bcrypt
 async def hash_password(password: str):
-    password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password_bytes, salt)
+    hashed_password = await _run_in_password_pool('hash', _hash_password, password.encode('utf-8'))
     return hashed_password.decode('utf-8')
 
 
 # Function to verify password using bcrypt
 async def verify_password(plain_password: str, hashed_password: str) -> None:
-    if not bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8')):
+    password_match = await _run_in_password_pool('verify', bcrypt.checkpw, plain_password.encode('utf-8'),
+                                                 hashed_password.encode('utf-8'))
+    if not password_match:
         raise UnauthorizedError(message="Incorrect username or password", location=LocationError.Body)
 
 
@@ -22,3 +64,11 @@ async def verify_password(plain_password: str, hashed_password: str) -> None:
 async def confirmation_verify_user(verified_user: bool) -> None:
     if not verified_user:
         raise UnauthorizedError(message="The user has not been verified", location=LocationError.Body)
+
+
+# Function to stop the worker pool when the application closes
+def stop_password_executor() -> None:
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False, cancel_futures=True)
+        _password_executor = None
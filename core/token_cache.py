@@ -0,0 +1,86 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+from core.config import settings
+from models.users import TokenData
+
+
+def _discard_key(index: dict[str, set[bytes]], name: str, key: bytes) -> None:
+    keys = index.get(name)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del index[name]
+
+
+# Bounded LRU cache of validated access tokens, each entry expires with its token
+class TokenCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, tuple[TokenData, float]] = OrderedDict()
+        self._user_keys: dict[str, set[bytes]] = {}
+        self._session_keys: dict[str, set[bytes]] = {}
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token: str) -> TokenData | None:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        token_data, expires_at = entry
+        if expires_at <= time.time():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return token_data
+
+    def set(self, token: str, token_data: TokenData, expires_at: float) -> None:
+        key = self._key(token)
+        self._entries[key] = (token_data, expires_at)
+        self._entries.move_to_end(key)
+        self._user_keys.setdefault(token_data.id, set()).add(key)
+        if token_data.sid:
+            self._session_keys.setdefault(token_data.sid, set()).add(key)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: str) -> None:
+        for key in list(self._user_keys.get(user_id, ())):
+            self._remove(key)
+
+    def invalidate_session(self, session_id: str) -> None:
+        for key in list(self._session_keys.get(session_id, ())):
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._user_keys.clear()
+        self._session_keys.clear()
+
+    def _remove(self, key: bytes) -> None:
+        token_data, _ = self._entries.pop(key)
+        _discard_key(self._user_keys, token_data.id, key)
+        if token_data.sid:
+            _discard_key(self._session_keys, token_data.sid, key)
+
+    @property
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+token_cache = TokenCache(max_size=settings.TOKEN_CACHE_SIZE)
@@ -1,26 +1,50 @@
 from contextlib import asynccontextmanager
 import uvicorn
 from fastapi import FastAPI
-from motor.motor_asyncio import AsyncIOMotorClient
 
+from api.monitoring.controllers.monitoring_controller import monitoring_router
 from api.routes import routes
 from core.config import settings
+from core.container import Container
+from core.database import create_database_client, warm_up_database
+from core.security import stop_password_executor
+from repositories.indexes import sync_indexes
+from services.email_outbox import email_outbox
+from services.email_templates import email_templates
 from utils.app_exception_handlers import app_exception_handlers
+from utils.logger import start_logger, stop_logger
+from utils.metrics_middleware import MetricsMiddleware
+from utils.rate_limit_middleware import RateLimitMiddleware
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    start_logger()
     print("Application starting...")
     env = settings.ENV
-    app.mongodb_client = AsyncIOMotorClient(settings.DB_CONNECTION)
+    app.mongodb_client = create_database_client()
     app.database = app.mongodb_client[settings.DB_NAME]
+    app.container = Container(app.database)
+    await warm_up_database(app.mongodb_client)
+    await sync_indexes(app.database)
+    email_templates.load()
+    await email_outbox.start()
     print(f"Started successfully: {env}")
     yield
     print("Application closing...")
+    await email_outbox.stop()
     app.mongodb_client.close()
+    stop_password_executor()
+    stop_logger()
 
 
 app = FastAPI(lifespan=lifespan, exception_handlers=app_exception_handlers)
+app.add_middleware(RateLimitMiddleware)
+# Added last so it wraps the rate limits and also counts the rejected requests
+app.add_middleware(MetricsMiddleware)
+
+# Scraped by Prometheus and the health checks at the root, outside the API prefix
+app.include_router(monitoring_router)
 
 for route in routes:
     app.include_router(route, prefix=settings.API_STR)
@@ -1,14 +1,40 @@
 from datetime import datetime
+from functools import cache
+from typing import Optional
 from uuid import uuid4
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, create_model
+from pymongo import IndexModel, ASCENDING
+
+from core.config import settings
+
+# Serves the keyset pagination of BaseRepository.get_all, which only reads active documents
+ACTIVE_PAGINATION_INDEX = IndexModel([("create_at", ASCENDING), ("_id", ASCENDING)], name="active_create_at_id",
+                                     partialFilterExpression={"is_deleted": False})
+# Purges the disabled documents once the retention is over, active documents have no deleted_at
+SOFT_DELETED_TTL_INDEX = IndexModel([("deleted_at", ASCENDING)], name="deleted_at_ttl",
+                                    expireAfterSeconds=settings.SOFT_DELETE_RETENTION_DAYS * 24 * 60 * 60)
 
 
 class DBModels(BaseModel):
     _collection_name: str
+    _indexes: list[IndexModel] = []
     model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
     id: str = Field(default_factory=lambda: str(uuid4()), alias="_id")
     create_at: datetime = Field(default_factory=datetime.utcnow)
     update_at: datetime = Field(default_factory=datetime.utcnow)
     is_deleted: bool = False
+    deleted_at: datetime | None = None
+
+
+# Function to build a copy of a model where every field is optional, used for projected documents
+@cache
+def partial_model(model: type[BaseModel]) -> type[BaseModel]:
+    fields = {
+        name: (Optional[field.annotation], Field(default=None, alias=field.alias))
+        for name, field in model.model_fields.items()
+    }
+    return create_model(f'Partial{model.__name__}',
+                        __config__=ConfigDict(populate_by_name=True, extra="ignore"),
+                        **fields)
@@ -0,0 +1,18 @@
+from pymongo import IndexModel, ASCENDING
+
+from core.config import settings
+from models.base_models import DBModels
+
+
+# Response stored for an Idempotency-Key, the status code is empty while the first request is in progress
+class IdempotencyModel(DBModels):
+    _collection_name = 'idempotency_keys'
+    _indexes = [
+        IndexModel([("create_at", ASCENDING)], name="create_at_ttl", expireAfterSeconds=settings.IDEMPOTENCY_TTL),
+    ]
+    request_hash: str
+    status_code: int | None = None
+    content: bytes | None = None
+    media_type: str | None = None
+    # Headers of the response like ETag or Location, replayed with it
+    headers: list[tuple[str, str]] = []
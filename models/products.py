@@ -1,8 +1,28 @@
-from models.base_models import DBModels
+from pymongo import IndexModel, ASCENDING, TEXT
+
+from models.base_models import DBModels, partial_model, ACTIVE_PAGINATION_INDEX, SOFT_DELETED_TTL_INDEX
 
 
 class ProductsModel(DBModels):
     _collection_name = 'products'
+    _indexes = [
+        IndexModel([("product_code", ASCENDING)], name="product_code_unique", unique=True),
+        ACTIVE_PAGINATION_INDEX,
+        SOFT_DELETED_TTL_INDEX,
+        # Product search: one index per equality filter, followed by the price range
+        IndexModel([("product_category", ASCENDING), ("product_price", ASCENDING)], name="active_category_price",
+                   partialFilterExpression={"is_deleted": False}),
+        IndexModel([("product_brand", ASCENDING), ("product_price", ASCENDING)], name="active_brand_price",
+                   partialFilterExpression={"is_deleted": False}),
+        IndexModel([("supplier_name", ASCENDING), ("product_price", ASCENDING)], name="active_supplier_price",
+                   partialFilterExpression={"is_deleted": False}),
+        IndexModel([("product_price", ASCENDING)], name="active_price",
+                   partialFilterExpression={"is_deleted": False}),
+        IndexModel([("product_name", ASCENDING)], name="active_name",
+                   partialFilterExpression={"is_deleted": False}),
+        IndexModel([("product_name", TEXT)], name="active_name_text", default_language="none",
+                   partialFilterExpression={"is_deleted": False}),
+    ]
     product_code: int
     product_name: str
     product_category: str
@@ -11,3 +31,6 @@ class ProductsModel(DBModels):
     product_quantity_presentation: int
     product_price: float
     supplier_name: str
+
+
+PartialProductsModel = partial_model(ProductsModel)
@@ -14,6 +14,9 @@ class Status(Enum):
     BAD_REQUEST = "BAD_REQUEST", 400
     UNAUTHORIZED = "UNAUTHORIZED", 401
     FORBIDDEN = "FORBIDDEN", 403
+    CONFLICT = "CONFLICT", 409
+    TOO_MANY_REQUESTS = "TOO_MANY_REQUESTS", 429
+    SERVICE_UNAVAILABLE = "SERVICE_UNAVAILABLE", 503
 
     def __new__(cls, *args, **kwargs):
         obj = object.__new__(cls)
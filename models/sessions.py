@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from pymongo import IndexModel, ASCENDING
+
+from models.base_models import DBModels
+
+
+# Session of a user, by its id, the sid of its tokens. Every refresh rotates the refresh token of the session: the
+# jti of the new token replaces the current one. A refresh token of the session with another jti was already
+# rotated, so presenting it again reveals a stolen token. A session is one document however many times it refreshes
+class SessionsModel(DBModels):
+    _collection_name = 'sessions'
+    _indexes = [
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]
+    user_id: str
+    # Id of the current refresh token of the session
+    jti: str
+    device: str | None = None
+    expires_at: datetime
+    rotated_at: datetime | None = None
@@ -1,17 +1,23 @@
 from pydantic import EmailStr, BaseModel
+from pymongo import IndexModel, ASCENDING
 
-from models.base_models import DBModels
+from models.base_models import DBModels, ACTIVE_PAGINATION_INDEX, SOFT_DELETED_TTL_INDEX
 
 
 class UsersModel(DBModels):
     _collection_name = 'users'
+    _indexes = [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        ACTIVE_PAGINATION_INDEX,
+        SOFT_DELETED_TTL_INDEX,
+    ]
     username: str
     full_name: str
     email: EmailStr
     password: str
     is_verified: bool = False
     verification_token: str | None
-    refresh_token: str | None = None
     password_token: str | None = None
 
 
@@ -20,6 +26,8 @@ class TokenData(BaseModel):
     email: EmailStr
     username: str
     full_name: str
+    # Id of the session of the tokens, the same for every refresh of the session
+    sid: str | None = None
 
 
 class TokenResponse(BaseModel):
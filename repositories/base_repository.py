@@ -1,23 +1,39 @@
+import base64
+import json
 from datetime import datetime
 from enum import Enum
-from typing import TypeVar, Generic, Type
+from typing import TypeVar, Generic, Type, AsyncIterator
 from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
 from pydantic import BaseModel
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, BulkWriteError
 
-from core.api_response import ApiResponse
+from core.api_response import RequestScoped
+from core.config import settings
+from core.database import get_read_preference
 from core.errors import InvalidParameterError, NotFoundError
+from core.metrics import db_operation_duration_seconds
 from models.response_model import LocationError
 
 DBModel = TypeVar('DBModel', bound=BaseModel)
 
 
-class BaseRepository(Generic[DBModel]):
+class BaseRepository(RequestScoped, Generic[DBModel]):
+    logger_name = 'repositories'
     _entity_model: Type[DBModel]
 
-    def __init__(self, db: AsyncIOMotorDatabase, api_response: ApiResponse):
+    def __init__(self, db: AsyncIOMotorDatabase):
         self.collection: AsyncIOMotorCollection = db.get_collection(
             self._entity_model._collection_name.default)
-        self.api_response = api_response
+        # Collection for long reads, which may be served by secondaries
+        self.long_read_collection: AsyncIOMotorCollection = self.collection
+        if settings.DB_LONG_READ_PREFERENCE != settings.DB_READ_PREFERENCE:
+            self.long_read_collection = self.collection.with_options(
+                read_preference=get_read_preference(settings.DB_LONG_READ_PREFERENCE))
+
+    # Function to time a database call, labeled with the operation and the collection
+    def _timed(self, operation: str):
+        return db_operation_duration_seconds.time(operation, self.collection.name)
 
     @staticmethod
     def convert_enum_values(data):
@@ -30,69 +46,225 @@ class BaseRepository(Generic[DBModel]):
         else:
             return data
 
+    @staticmethod
+    def duplicate_key_error(error: DuplicateKeyError) -> InvalidParameterError:
+        duplicated_fields = ', '.join((error.details or {}).get('keyValue', {})) or 'key'
+        return InvalidParameterError(message=f'There is already an instance with that {duplicated_fields}',
+                                     location=LocationError.Body)
+
     async def create(self, data: dict, raise_exception: bool = True, session=None) -> DBModel:
-        self.api_response.logger.info(f'Creating in instance')
+        self.logger.info('Creating in instance')
         document_created = self._entity_model.model_validate(data)
         data_parsed_enums = self.convert_enum_values(document_created.model_dump())
         data_parsed_enums["_id"] = data_parsed_enums.pop("id")
 
-        await self.collection.insert_one(data_parsed_enums, session=session)
+        try:
+            with self._timed('insert_one'):
+                await self.collection.insert_one(data_parsed_enums, session=session)
+        except DuplicateKeyError as error:
+            raise self.duplicate_key_error(error)
         if not document_created and raise_exception:
             raise InvalidParameterError(message="Instance not created", location=LocationError.Body)
-        self.api_response.logger.info(f'Instance created: {document_created}')
+        self.logger.info('Instance created', collection=self.collection.name, _id=document_created.id)
+        self.logger.payload('Instance created', document_created)
         return document_created
 
+    async def create_many(self, data: list[dict]) -> tuple[int, dict[int, str]]:
+        self.logger.info('Creating instances', collection=self.collection.name, count=len(data))
+        documents = []
+        for item in data:
+            document = self.convert_enum_values(self._entity_model.model_validate(item).model_dump())
+            document["_id"] = document.pop("id")
+            documents.append(document)
+
+        # Unordered inserts keep going after a failed document and report it by its index
+        try:
+            with self._timed('insert_many'):
+                result = await self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as error:
+            write_errors = {write_error["index"]: write_error["errmsg"] for write_error in error.details["writeErrors"]}
+            return error.details["nInserted"], write_errors
+        return len(result.inserted_ids), {}
+
+    async def _find_by_ids(self, ids: list[str], fields: list[str] | None = None) -> dict[str, dict]:
+        documents = self.collection.find({"_id": {"$in": ids}, "is_deleted": False}, self.build_projection(fields))
+        with self._timed('find'):
+            return {document["_id"]: document async for document in documents}
+
+    # Function to get a document by id in the same query as the other lookups of the request in the same
+    # event loop iteration
+    async def load_by_id(self, _id: str) -> dict | None:
+        return await self.api_response.batch_loader(self.collection.name, self._find_by_ids).load(_id)
+
     async def get_by_id(self, _id: str, raise_exception: bool = True) -> DBModel | None:
-        self.api_response.logger.info('Getting in instance')
-        document_found = await self.collection.find_one({"_id": _id, "is_deleted": False})
-        if not document_found and raise_exception:
-            raise NotFoundError(message="Instance not found", location=LocationError.Params)
-        self.api_response.logger.info(f'Instance found: {document_found}')
+        self.logger.info('Getting in instance')
+        document_found = await self.load_by_id(_id)
+        if not document_found:
+            if raise_exception:
+                raise NotFoundError(message="Instance not found", location=LocationError.Params)
+            return None
+        self.logger.info('Instance found', collection=self.collection.name, _id=_id)
+        self.logger.payload('Instance found', document_found)
         return self._entity_model.model_validate(document_found)
 
-    async def get_all(self, raise_exception: bool = True) -> list[DBModel] | None:
-        self.api_response.logger.info('Getting all instances')
-        documents_found = self.collection.find({"is_deleted": False})
-        documents_list = await documents_found.to_list(None)
-        if not documents_list and raise_exception:
+    # Returns the documents in the order of the ids, each id once, and the ids not found, with one query
+    async def get_many(self, ids: list[str], fields: list[str] | None = None) -> tuple[list[dict], list[str]]:
+        self.logger.info('Getting instances by id', collection=self.collection.name, count=len(ids))
+        unique_ids = list(dict.fromkeys(ids))
+        documents_found = await self._find_by_ids(unique_ids, fields)
+        documents = [documents_found[_id] for _id in unique_ids if _id in documents_found]
+        missing_ids = [_id for _id in unique_ids if _id not in documents_found]
+        self.logger.info('Instances found', collection=self.collection.name, count=len(documents),
+                         missing=len(missing_ids))
+        return documents, missing_ids
+
+    # Function to read only the update_at of a document, to answer conditional requests without fetching it
+    async def get_update_at(self, _id: str) -> datetime:
+        with self._timed('find_one'):
+            document_found = await self.collection.find_one({"_id": _id, "is_deleted": False}, {"update_at": 1})
+        if not document_found:
+            raise NotFoundError(message="Instance not found", location=LocationError.Params)
+        return document_found["update_at"]
+
+    @staticmethod
+    def encode_cursor(document: dict) -> str:
+        cursor_data = json.dumps([document["create_at"].isoformat(), document["_id"]])
+        return base64.urlsafe_b64encode(cursor_data.encode('utf-8')).decode('utf-8')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> dict:
+        try:
+            create_at, _id = json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')))
+            create_at = datetime.fromisoformat(create_at)
+        except (ValueError, TypeError):
+            raise InvalidParameterError(message="Invalid cursor", location=LocationError.Params)
+        # Keyset condition on the (create_at, _id) sort order
+        return {"$or": [{"create_at": {"$gt": create_at}}, {"create_at": create_at, "_id": {"$gt": _id}}]}
+
+    def build_projection(self, fields: list[str] | None) -> dict | None:
+        if not fields:
+            return None
+        model_fields = self._entity_model.model_fields
+        unknown_fields = [field for field in fields if field not in model_fields]
+        if unknown_fields:
+            raise InvalidParameterError(message=f"Unknown fields: {', '.join(unknown_fields)}",
+                                        location=LocationError.Params)
+        projection = {model_fields[field].alias or field: 1 for field in fields}
+        # The cursor is built from these fields, so they are always returned
+        projection.update({"_id": 1, "create_at": 1})
+        return projection
+
+    def _find_all(self, cursor: str | None, fields: list[str] | None):
+        query = {"is_deleted": False}
+        if cursor:
+            query.update(self.decode_cursor(cursor))
+        projection = self.build_projection(fields)
+        return self.long_read_collection.find(query, projection).sort([("create_at", 1), ("_id", 1)])
+
+    async def get_all(self, limit: int = settings.PAGE_DEFAULT_LIMIT, cursor: str | None = None,
+                      fields: list[str] | None = None, raise_exception: bool = True) -> tuple[list[dict], str | None]:
+        self.logger.info('Getting all instances')
+        # One extra document tells whether there is a next page
+        with self._timed('find'):
+            documents_list = await self._find_all(cursor, fields).limit(limit + 1).to_list(None)
+        if not documents_list and not cursor and raise_exception:
             raise NotFoundError(message="There are no products", location=LocationError.Params)
 
-        all_documents = []
-        for document in documents_list:
-            validated_document = self._entity_model.model_validate(document)
-            all_documents.append(validated_document)
-        self.api_response.logger.info(f'All instances found: {all_documents}')
-        return all_documents
-
-    async def update(self, _id: str, _data: dict) -> DBModel:
-        self.api_response.logger.info('Updating instance data')
-        _data["update_at"] = datetime.utcnow()
-        if _data.get("id"):
-            _data["_id"] = _data.pop("id")
-        await self.collection.find_one_and_update({"_id": _id}, {"$set": _data})
-        instance_updated = await self.collection.find_one({"_id": _id})
-        return self._entity_model.model_validate(instance_updated)
+        next_cursor = None
+        if len(documents_list) > limit:
+            documents_list = documents_list[:limit]
+            next_cursor = self.encode_cursor(documents_list[-1])
+        self.logger.info('Instances found', collection=self.collection.name, count=len(documents_list))
+        return documents_list, next_cursor
 
-    async def patch(self, _id: str, _data: BaseModel) -> DBModel:
-        self.api_response.logger.info('Updating instance data')
-        instance = await self.get_by_id(_id)
-        update_data = _data.model_dump(exclude_unset=True)
-        data_copy = instance.model_copy(update=update_data)
-        instance_updated = await self.update(_id, data_copy.model_dump())
-        return instance_updated
+    def stream_all(self, cursor: str | None = None, fields: list[str] | None = None,
+                   batch_size: int = settings.STREAM_BATCH_SIZE) -> AsyncIterator[dict]:
+        self.logger.info('Streaming all instances')
+        # The cursor is built here so invalid parameters fail before the response starts
+        return self._find_all(cursor, fields).batch_size(batch_size)
 
-    async def disable(self, _id: str, update_data: dict) -> None:
-        self.api_response.logger.info('Deactivating instance')
+    async def _find_and_update(self, _id: str, _data: dict, query: dict | None = None,
+                               return_document: ReturnDocument = ReturnDocument.AFTER) -> tuple[dict | None, dict]:
+        update_data = {key: value for key, value in _data.items() if key not in ("id", "_id")}
         update_data["update_at"] = datetime.utcnow()
-        validated_document = self._entity_model.model_validate(update_data)
+        update_data = self.convert_enum_values(update_data)
+        # Only the given fields are sent and the document comes back in the same round trip
+        try:
+            with self._timed('find_one_and_update'):
+                document = await self.collection.find_one_and_update(
+                    {**(query or {}), "_id": _id, "is_deleted": False},
+                    {"$set": update_data},
+                    return_document=return_document,
+                )
+        except DuplicateKeyError as error:
+            raise self.duplicate_key_error(error)
+        return document, update_data
+
+    async def update(self, _id: str, _data: dict, query: dict | None = None,
+                     raise_exception: bool = True) -> DBModel | None:
+        self.logger.info('Updating instance data')
+        instance_updated, _ = await self._find_and_update(_id, _data, query)
+        if not instance_updated:
+            if raise_exception:
+                raise NotFoundError(message="Instance not found", location=LocationError.Params)
+            return None
+        return self._entity_model.model_validate(instance_updated)
+
+    async def patch(self, _id: str, _data: BaseModel | dict, query: dict | None = None,
+                    raise_exception: bool = True) -> DBModel | None:
+        update_data = _data.model_dump(exclude_unset=True) if isinstance(_data, BaseModel) else _data
+        return await self.update(_id, update_data, query, raise_exception)
+
+    @staticmethod
+    def disable_update() -> dict:
+        # Truncated to the millisecond precision of BSON dates, so the stamp of a batch can be queried back
+        now = datetime.utcnow()
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        return {"$set": {"is_deleted": True, "deleted_at": now, "update_at": now}}
+
+    @staticmethod
+    def restore_update() -> dict:
+        return {"$set": {"is_deleted": False, "update_at": datetime.utcnow()}, "$unset": {"deleted_at": ""}}
+
+    # Soft deletes the document in one statement, only the flags are written so concurrent changes are kept.
+    # The TTL index on deleted_at purges it after SOFT_DELETE_RETENTION_DAYS
+    async def disable(self, _id: str, raise_exception: bool = True) -> bool:
+        self.logger.info('Deactivating instance')
+        with self._timed('update_one'):
+            result = await self.collection.update_one({"_id": _id, "is_deleted": False}, self.disable_update())
+        if not result.matched_count:
+            if raise_exception:
+                raise NotFoundError(message="Instance not found", location=LocationError.Params)
+            return False
+        self.logger.info('Instance disabled', collection=self.collection.name, _id=_id)
+        return True
+
+    async def restore(self, _id: str, raise_exception: bool = True) -> bool:
+        self.logger.info('Restoring instance')
+        with self._timed('update_one'):
+            result = await self.collection.update_one({"_id": _id, "is_deleted": True}, self.restore_update())
+        if not result.matched_count:
+            if raise_exception:
+                raise NotFoundError(message="Disabled instance not found", location=LocationError.Params)
+            return False
+        self.logger.info('Instance restored', collection=self.collection.name, _id=_id)
+        return True
 
-        await self.collection.update_one({"_id": _id}, {"$set": validated_document.model_dump(exclude={"id"})})
-        document_disabled = await self.collection.find_one({"_id": _id})
-        self.api_response.logger.info(f'Instance disabled: {document_disabled}')
+    # Returns the number of documents disabled, all of them share the deleted_at of the update
+    async def disable_many(self, query: dict, update: dict | None = None) -> int:
+        self.logger.info('Deactivating instances', collection=self.collection.name)
+        with self._timed('update_many'):
+            result = await self.collection.update_many({**query, "is_deleted": False},
+                                                       update or self.disable_update())
+        self.logger.info('Instances disabled', collection=self.collection.name, count=result.modified_count)
+        return result.modified_count
 
-    async def delete(self, _id: str, raise_exception: bool = True) -> None:
-        self.api_response.logger.info('Deleting instance')
-        document_deleted = await self.collection.find_one_and_delete({"_id": _id})
+    async def delete(self, _id: str, raise_exception: bool = True) -> dict | None:
+        self.logger.info('Deleting instance')
+        with self._timed('find_one_and_delete'):
+            document_deleted = await self.collection.find_one_and_delete({"_id": _id})
         if not document_deleted and raise_exception:
             raise NotFoundError(message="Instance not found", location=LocationError.Params)
-        self.api_response.logger.info(f'Instance deleted: {document_deleted}')
+        self.logger.info('Instance deleted', collection=self.collection.name, _id=_id)
+        self.logger.payload('Instance deleted', document_deleted)
+        return document_deleted
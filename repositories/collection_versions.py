@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+
+from core.api_response import RequestScoped
+from core.metrics import db_operation_duration_seconds
+
+COLLECTION_VERSIONS_COLLECTION = 'collection_versions'
+
+
+# Counter of the writes to a collection through the API, the version of its lists for conditional requests
+class CollectionVersionsRepository(RequestScoped):
+    logger_name = 'repositories'
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.collection: AsyncIOMotorCollection = db.get_collection(COLLECTION_VERSIONS_COLLECTION)
+
+    def _timed(self, operation: str):
+        return db_operation_duration_seconds.time(operation, self.collection.name)
+
+    async def bump(self, collection_name: str) -> None:
+        with self._timed('update_one'):
+            await self.collection.update_one({"_id": collection_name},
+                                             {"$inc": {"version": 1}, "$set": {"update_at": datetime.utcnow()}},
+                                             upsert=True)
+
+    # Returns the version and the time of the last write, a collection never written has version 0
+    async def get(self, collection_name: str) -> tuple[int, datetime | None]:
+        with self._timed('find_one'):
+            document = await self.collection.find_one({"_id": collection_name})
+        if not document:
+            return 0, None
+        return document["version"], document["update_at"]
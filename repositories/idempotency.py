@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+from core.config import settings
+from models.idempotency import IdempotencyModel
+from repositories.base_repository import BaseRepository
+
+
+class IdempotencyRepository(BaseRepository[IdempotencyModel]):
+    _entity_model = IdempotencyModel
+
+    # Returns None when the key is reserved for this request, or the record of the request that already has it
+    async def reserve(self, _id: str, request_hash: str) -> IdempotencyModel | None:
+        now = datetime.utcnow()
+        abandoned_before = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+        # Inserts the key, or takes it over from an abandoned request. Any other record makes the upsert
+        # fail with a duplicated _id
+        try:
+            with self._timed('find_one_and_update'):
+                await self.collection.find_one_and_update(
+                    {"_id": _id, "status_code": None, "update_at": {"$lt": abandoned_before}},
+                    {"$set": {"request_hash": request_hash, "update_at": now},
+                     "$setOnInsert": {"create_at": now, "is_deleted": False}},
+                    upsert=True,
+                )
+            return None
+        except DuplicateKeyError:
+            pass
+        with self._timed('find_one'):
+            record = await self.collection.find_one({"_id": _id})
+        return self._entity_model.model_validate(record) if record else None
+
+    async def complete(self, _id: str, status_code: int, content: bytes, media_type: str | None,
+                       headers: list[tuple[str, str]]) -> None:
+        with self._timed('update_one'):
+            await self.collection.update_one({"_id": _id}, {"$set": {
+                "status_code": status_code,
+                "content": content,
+                "media_type": media_type,
+                "headers": headers,
+                "update_at": datetime.utcnow(),
+            }})
+
+    async def release(self, _id: str) -> None:
+        with self._timed('delete_one'):
+            await self.collection.delete_one({"_id": _id, "status_code": None})
@@ -0,0 +1,86 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+from models.base_models import DBModels
+from models.idempotency import IdempotencyModel
+from models.products import ProductsModel
+from models.sessions import SessionsModel
+from models.users import UsersModel
+from utils.logger import api_logger
+
+DB_MODELS: list[type[DBModels]] = [UsersModel, ProductsModel, IdempotencyModel, SessionsModel]
+
+DEFAULT_INDEX_NAME = '_id_'
+COMPARED_INDEX_OPTIONS = ('unique', 'partialFilterExpression', 'expireAfterSeconds')
+TEXT_INDEX_KEYS = ('_fts', '_ftsx')
+
+
+# Function to keep only the parts of an index that define its behaviour. The server keys a text index by _fts and
+# _ftsx and keeps its fields in the weights, so the declared text fields are turned into weights the same way
+def _index_spec(index: dict) -> dict:
+    key = []
+    weights = {}
+    for field, direction in dict(index['key']).items():
+        if direction != 'text' and field not in TEXT_INDEX_KEYS:
+            key.append((field, direction))
+            continue
+        if field not in TEXT_INDEX_KEYS:
+            weights[field] = 1
+        if (TEXT_INDEX_KEYS[0], 'text') not in key:
+            key.append((TEXT_INDEX_KEYS[0], 'text'))
+    spec = {'key': key}
+    if weights or index.get('weights'):
+        spec['weights'] = {**weights, **dict(index.get('weights') or {})}
+    spec.update({option: index[option] for option in COMPARED_INDEX_OPTIONS if index.get(option)})
+    return spec
+
+
+# Function to update the TTL of an index in place, like after a new retention setting, and report any other drift
+async def _resolve_drift(db: AsyncIOMotorDatabase, collection_name: str, existing: dict, declared: dict) -> None:
+    name = declared['name']
+    ttl = declared.get('expireAfterSeconds')
+    if ttl is not None and existing.get('expireAfterSeconds') is not None and \
+            _index_spec({**existing, 'expireAfterSeconds': ttl}) == _index_spec(declared):
+        try:
+            await db.command('collMod', collection_name, index={'name': name, 'expireAfterSeconds': ttl})
+            api_logger.info(f'Index {collection_name}.{name} now expires after {ttl} seconds')
+        except OperationFailure as error:
+            api_logger.error(f'The TTL of {collection_name}.{name} could not be updated: {error}')
+        return
+    api_logger.warning(f'Index drift in {collection_name}.{name}: '
+                       f'expected {_index_spec(declared)}, found {_index_spec(existing)}')
+
+
+# Function to create the indexes declared in a model and report the ones that differ from the db
+async def sync_model_indexes(db: AsyncIOMotorDatabase, model: type[DBModels]) -> None:
+    collection_name = model._collection_name.default
+    declared_indexes: list[IndexModel] = model._indexes.default
+    collection = db.get_collection(collection_name)
+    existing_indexes = await collection.index_information()
+
+    missing_indexes = []
+    for index in declared_indexes:
+        name = index.document['name']
+        if name not in existing_indexes:
+            missing_indexes.append(index)
+        elif _index_spec(existing_indexes[name]) != _index_spec(index.document):
+            await _resolve_drift(db, collection_name, existing_indexes[name], index.document)
+
+    declared_names = {index.document['name'] for index in declared_indexes}
+    for name in existing_indexes:
+        if name != DEFAULT_INDEX_NAME and name not in declared_names:
+            api_logger.warning(f'Index {collection_name}.{name} exists in db but is not declared in {model.__name__}')
+
+    if not missing_indexes:
+        return
+    try:
+        created_indexes = await collection.create_indexes(missing_indexes)
+        api_logger.info(f'Indexes created in {collection_name}: {", ".join(created_indexes)}')
+    except OperationFailure as error:
+        api_logger.error(f'Indexes could not be created in {collection_name}: {error}')
+
+
+async def sync_indexes(db: AsyncIOMotorDatabase) -> None:
+    for model in DB_MODELS:
+        await sync_model_indexes(db, model)
@@ -1,19 +1,254 @@
-from core.api_response import ApiResponse
-from core.errors import InvalidParameterError
+import functools
+import json
+from dataclasses import dataclass
+from datetime import datetime
+
+from pydantic import BaseModel, TypeAdapter
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+
+from core.cache import ReadThroughCache, build_cache_backend
+from core.config import settings
+from core.errors import InvalidParameterError, NotFoundError
 from models.products import ProductsModel
 from models.response_model import LocationError
 from repositories.base_repository import BaseRepository
+from repositories.collection_versions import CollectionVersionsRepository
+from repositories.products_summary import (OTHER_PRICE_RANGE, PRICE_RANGE_DIMENSION, SUMMARY_GROUP_FIELDS,
+                                           SUMMARY_PRODUCT_FIELDS, TOTAL_DIMENSION, ProductsSummaryRepository,
+                                           summary_document)
+
+# Filters, sort and page of a product search, already validated by the caller
+@dataclass
+class ProductSearchFilter:
+    q: str | None = None
+    product_category: str | None = None
+    product_brand: str | None = None
+    supplier_name: str | None = None
+    min_price: float | None = None
+    max_price: float | None = None
+    sort_by: str | None = None
+    sort_order: str = "asc"
+    limit: int = settings.PAGE_DEFAULT_LIMIT
+    skip: int = 0
+
+
+products_cache = ReadThroughCache(build_cache_backend('products:id', TypeAdapter(ProductsModel)))
+products_pages_cache = ReadThroughCache(build_cache_backend('products:pages',
+                                                            TypeAdapter(tuple[list[dict], str | None])))
 
 
 class ProductsRepository(BaseRepository[ProductsModel]):
     _entity_model = ProductsModel
 
-    def __init__(self, db, api_response: ApiResponse):
-        super().__init__(db, api_response)
-        self.api_response = api_response
+    def __init__(self, db):
+        super().__init__(db)
+        self.summary_repository = ProductsSummaryRepository(db)
+        self.versions_repository = CollectionVersionsRepository(db)
 
     async def check_if_the_product_exists(self, product_code: int) -> None:
-        product_found = await self.collection.find_one({"product_code": product_code})
+        with self._timed('find_one'):
+            product_found = await self.collection.find_one({"product_code": product_code}, {"_id": 1})
         if product_found:
             raise InvalidParameterError(message='There is already a product with that product_code',
                                         location=LocationError.Body)
+
+    async def get_existing_product_codes(self, product_codes: list[int]) -> set[int]:
+        documents = self.collection.find({"product_code": {"$in": product_codes}}, {"product_code": 1, "_id": 0})
+        with self._timed('find'):
+            return {document["product_code"] async for document in documents}
+
+    @staticmethod
+    def build_search_query(search: ProductSearchFilter) -> tuple[dict, dict | None, list]:
+        query = {"is_deleted": False}
+        for field in ("product_category", "product_brand", "supplier_name"):
+            if getattr(search, field) is not None:
+                query[field] = getattr(search, field)
+        price_range = {}
+        if search.min_price is not None:
+            price_range["$gte"] = search.min_price
+        if search.max_price is not None:
+            price_range["$lte"] = search.max_price
+        if price_range:
+            query["product_price"] = price_range
+
+        projection = None
+        sort_by = search.sort_by or ("relevance" if search.q else "create_at")
+        if search.q:
+            query["$text"] = {"$search": search.q}
+        if sort_by == "relevance":
+            projection = {"score": {"$meta": "textScore"}}
+            sort = [("score", {"$meta": "textScore"})]
+        else:
+            direction = ASCENDING if search.sort_order == "asc" else DESCENDING
+            sort = [(sort_by, direction), ("_id", direction)]
+        return query, projection, sort
+
+    def _find_search(self, search: ProductSearchFilter):
+        query, projection, sort = self.build_search_query(search)
+        return self.long_read_collection.find(query, projection).sort(sort).skip(search.skip).limit(search.limit)
+
+    async def search(self, search: ProductSearchFilter) -> list[dict]:
+        self.logger.info('Searching products')
+        with self._timed('find'):
+            documents_list = await self._find_search(search).to_list(None)
+        self.logger.info('Products found', count=len(documents_list))
+        return documents_list
+
+    # Query plan of a search, to check that it is served by an index and not by a collection scan
+    async def explain_search(self, search: ProductSearchFilter) -> dict:
+        return await self._find_search(search).explain()
+
+    async def aggregate_summary(self) -> list[dict]:
+        self.logger.info('Aggregating products summary')
+        accumulators = {
+            "count": {"$sum": 1},
+            "price_sum": {"$sum": "$product_price"},
+            "quantity_sum": {"$sum": "$product_quantity_presentation"},
+        }
+        facets = {TOTAL_DIMENSION: [{"$group": {"_id": None, **accumulators}}]}
+        for dimension, field in SUMMARY_GROUP_FIELDS.items():
+            facets[dimension] = [{"$group": {"_id": f"${field}", **accumulators}}]
+        facets[PRICE_RANGE_DIMENSION] = [{"$bucket": {"groupBy": "$product_price",
+                                                      "boundaries": settings.PRODUCT_PRICE_RANGES,
+                                                      "default": OTHER_PRICE_RANGE,
+                                                      "output": accumulators}}]
+        # Every group is computed in the db in a single pass, only the grouped counters are transferred
+        with self._timed('aggregate'):
+            results = await self.collection.aggregate([{"$match": {"is_deleted": False}},
+                                                       {"$facet": facets}]).to_list(None)
+
+        documents = [summary_document(TOTAL_DIMENSION, None)]
+        for dimension, groups in results[0].items():
+            for group in groups:
+                document = summary_document(dimension, group["_id"], group["count"], group["price_sum"],
+                                            group["quantity_sum"])
+                if dimension == TOTAL_DIMENSION:
+                    documents[0] = document
+                else:
+                    documents.append(document)
+        return documents
+
+    # Every write ends here, so it also moves the version of the product lists
+    async def _invalidate_cache(self, _id: str | None = None) -> None:
+        if _id:
+            await products_cache.invalidate(_id)
+        await products_pages_cache.clear()
+        await self.versions_repository.bump(self.collection.name)
+
+    async def get_collection_version(self) -> tuple[int, datetime | None]:
+        return await self.versions_repository.get(self.collection.name)
+
+    async def get_by_id(self, _id: str, raise_exception: bool = True) -> ProductsModel | None:
+        # The load is shared with the concurrent lookups of the same id, so it never raises for a missing one
+        product_found = await products_cache.get_or_load(_id, functools.partial(super().get_by_id, _id, False))
+        if not product_found and raise_exception:
+            raise NotFoundError(message="Instance not found", location=LocationError.Params)
+        return product_found
+
+    async def get_all(self, limit: int = settings.PAGE_DEFAULT_LIMIT, cursor: str | None = None,
+                      fields: list[str] | None = None,
+                      raise_exception: bool = True) -> tuple[list[dict], str | None]:
+        page_key = json.dumps([limit, cursor, fields])
+        documents_list, next_cursor = await products_pages_cache.get_or_load(
+            page_key, functools.partial(super().get_all, limit, cursor, fields, raise_exception=False))
+        if not documents_list and not cursor and raise_exception:
+            raise NotFoundError(message="There are no products", location=LocationError.Params)
+        return documents_list, next_cursor
+
+    async def create(self, data: dict, raise_exception: bool = True, session=None) -> ProductsModel:
+        try:
+            product_created = await super().create(data, raise_exception, session)
+            await self.summary_repository.apply_changes(added=[product_created.model_dump()])
+            return product_created
+        finally:
+            await self._invalidate_cache()
+
+    async def create_many(self, data: list[dict]) -> tuple[int, dict[int, str]]:
+        try:
+            inserted, write_errors = await super().create_many(data)
+            await self.summary_repository.apply_changes(
+                added=[product for index, product in enumerate(data) if index not in write_errors])
+            return inserted, write_errors
+        finally:
+            await self._invalidate_cache()
+
+    async def update(self, _id: str, _data: dict, query: dict | None = None,
+                     raise_exception: bool = True) -> ProductsModel | None:
+        self.logger.info('Updating product data')
+        try:
+            # The previous document gives the summary changes, the updated one is built from it and the new values
+            product_before, update_data = await self._find_and_update(_id, _data, query, ReturnDocument.BEFORE)
+            if not product_before:
+                if raise_exception:
+                    raise NotFoundError(message="Instance not found", location=LocationError.Params)
+                return None
+            product_after = {**product_before, **update_data}
+            await self.summary_repository.apply_changes(removed=[product_before], added=[product_after])
+            return ProductsModel.model_validate(product_after)
+        finally:
+            await self._invalidate_cache(_id)
+
+    async def update_all(self, _id: str, _data: BaseModel) -> ProductsModel:
+        return await self.update(_id, _data.model_dump())
+
+    # Still one statement, which also returns the fields the summary needs
+    async def _switch_deleted(self, _id: str, was_deleted: bool, raise_exception: bool) -> bool:
+        update = self.restore_update() if was_deleted else self.disable_update()
+        try:
+            with self._timed('find_one_and_update'):
+                product = await self.collection.find_one_and_update({"_id": _id, "is_deleted": was_deleted}, update,
+                                                                    projection=SUMMARY_PRODUCT_FIELDS)
+            if not product:
+                if raise_exception:
+                    raise NotFoundError(message="Instance not found", location=LocationError.Params)
+                return False
+            if was_deleted:
+                await self.summary_repository.apply_changes(added=[product])
+            else:
+                await self.summary_repository.apply_changes(removed=[product])
+            return True
+        finally:
+            await self._invalidate_cache(_id)
+
+    async def disable(self, _id: str, raise_exception: bool = True) -> bool:
+        self.logger.info('Deactivating product')
+        return await self._switch_deleted(_id, False, raise_exception)
+
+    async def restore(self, _id: str, raise_exception: bool = True) -> bool:
+        self.logger.info('Restoring product')
+        return await self._switch_deleted(_id, True, raise_exception)
+
+    # The products disabled by update_many are not returned, they are read back by the deleted_at of the batch
+    async def disable_many(self, query: dict) -> int:
+        update = self.disable_update()
+        try:
+            disabled = await super().disable_many(query, update)
+            if disabled:
+                await self._remove_from_summary({**query, "is_deleted": True,
+                                                 "deleted_at": update["$set"]["deleted_at"]})
+            return disabled
+        finally:
+            await products_cache.clear()
+            await self._invalidate_cache()
+
+    # The products are already disabled when this runs, so a failure leaves the summary to be rebuilt on the next
+    # read instead of failing the request
+    async def _remove_from_summary(self, query: dict) -> None:
+        try:
+            with self._timed('find'):
+                products = await self.collection.find(query, SUMMARY_PRODUCT_FIELDS).to_list(None)
+            await self.summary_repository.apply_changes(removed=products)
+        except Exception as error:
+            self.logger.error('The products summary could not be updated', error=error)
+            try:
+                await self.summary_repository.invalidate()
+            except Exception as error:
+                self.logger.error('The products summary could not be invalidated', error=error)
+
+    async def delete(self, _id: str, raise_exception: bool = True) -> None:
+        try:
+            product_deleted = await super().delete(_id, raise_exception)
+            if product_deleted and not product_deleted["is_deleted"]:
+                await self.summary_repository.apply_changes(removed=[product_deleted])
+        finally:
+            await self._invalidate_cache(_id)
@@ -0,0 +1,113 @@
+import bisect
+from datetime import datetime
+
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import ReplaceOne, UpdateOne
+
+from core.api_response import RequestScoped
+from core.config import settings
+from core.metrics import db_operation_duration_seconds
+
+PRODUCTS_SUMMARY_COLLECTION = 'products_summary'
+
+# Groups of the summary and the product field each one is grouped by
+SUMMARY_GROUP_FIELDS = {
+    "categories": "product_category",
+    "brands": "product_brand",
+    "suppliers": "supplier_name",
+}
+# Fields of a product read by the summary
+SUMMARY_PRODUCT_FIELDS = {field: 1 for field in (*SUMMARY_GROUP_FIELDS.values(), "product_price",
+                                                 "product_quantity_presentation")}
+TOTAL_DIMENSION = 'total'
+PRICE_RANGE_DIMENSION = 'price_ranges'
+OTHER_PRICE_RANGE = 'other'
+# Written by rebuild, a summary without it has never been computed from the products collection
+BUILT_MARKER_ID = 'built'
+
+
+# Function to find the price range of a price with the same rules as $bucket
+def price_range_of(price: float) -> float | str:
+    boundaries = settings.PRODUCT_PRICE_RANGES
+    index = bisect.bisect_right(boundaries, price) - 1
+    if 0 <= index < len(boundaries) - 1:
+        return boundaries[index]
+    return OTHER_PRICE_RANGE
+
+
+def summary_document(dimension: str, value, count: int = 0, price_sum: float = 0, quantity_sum: int = 0) -> dict:
+    return {
+        "_id": f'{dimension}:{value}',
+        "dimension": dimension,
+        "value": value,
+        "count": count,
+        "price_sum": price_sum,
+        "quantity_sum": quantity_sum,
+    }
+
+
+# Precomputed counters of the active products, kept up to date by every write of ProductsRepository
+class ProductsSummaryRepository(RequestScoped):
+    logger_name = 'repositories'
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.collection: AsyncIOMotorCollection = db.get_collection(PRODUCTS_SUMMARY_COLLECTION)
+
+    def _timed(self, operation: str):
+        return db_operation_duration_seconds.time(operation, self.collection.name)
+
+    @staticmethod
+    def _groups_of(product: dict) -> list[tuple[str, object]]:
+        groups = [(TOTAL_DIMENSION, None)]
+        groups.extend((dimension, product[field]) for dimension, field in SUMMARY_GROUP_FIELDS.items())
+        groups.append((PRICE_RANGE_DIMENSION, price_range_of(product["product_price"])))
+        return groups
+
+    async def apply_changes(self, removed: list[dict] = (), added: list[dict] = ()) -> None:
+        deltas: dict[str, dict] = {}
+        for products, sign in ((removed, -1), (added, 1)):
+            for product in products:
+                for dimension, value in self._groups_of(product):
+                    delta = summary_document(dimension, value)
+                    delta = deltas.setdefault(delta["_id"], delta)
+                    delta["count"] += sign
+                    delta["price_sum"] += sign * product["product_price"]
+                    delta["quantity_sum"] += sign * product["product_quantity_presentation"]
+
+        # Groups that did not change, like an update that keeps the price and the category, are not written
+        operations = [
+            UpdateOne({"_id": key},
+                      {"$set": {"dimension": delta["dimension"], "value": delta["value"]},
+                       "$inc": {"count": delta["count"], "price_sum": delta["price_sum"],
+                                "quantity_sum": delta["quantity_sum"]}},
+                      upsert=True)
+            for key, delta in deltas.items()
+            if delta["count"] or delta["price_sum"] or delta["quantity_sum"]
+        ]
+        if operations:
+            with self._timed('bulk_write'):
+                await self.collection.bulk_write(operations, ordered=False)
+
+    # Removes the built marker, the next read rebuilds the summary from the products collection
+    async def invalidate(self) -> None:
+        with self._timed('delete_one'):
+            await self.collection.delete_one({"_id": BUILT_MARKER_ID})
+
+    # Returns None when the summary has not been built yet
+    async def get_documents(self) -> list[dict] | None:
+        with self._timed('find'):
+            documents = await self.collection.find({}).to_list(None)
+        if not any(document["_id"] == BUILT_MARKER_ID for document in documents):
+            return None
+        return [document for document in documents if document["_id"] != BUILT_MARKER_ID]
+
+    # Every group is overwritten in place and then the groups that no longer exist are removed, so the summary is
+    # never empty while it is replaced and overlapping replaces do not collide on the _id of the groups
+    async def replace(self, documents: list[dict]) -> None:
+        self.logger.info('Replacing products summary', groups=len(documents))
+        documents = [*documents, {"_id": BUILT_MARKER_ID, "dimension": BUILT_MARKER_ID, "built_at": datetime.utcnow()}]
+        with self._timed('bulk_write'):
+            await self.collection.bulk_write(
+                [ReplaceOne({"_id": document["_id"]}, document, upsert=True) for document in documents], ordered=False)
+        with self._timed('delete_many'):
+            await self.collection.delete_many({"_id": {"$nin": [document["_id"] for document in documents]}})
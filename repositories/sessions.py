@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from core.errors import UnauthorizedError
+from core.token_cache import token_cache
+from models.response_model import LocationError
+from models.sessions import SessionsModel
+from repositories.base_repository import BaseRepository
+
+
+class SessionsRepository(BaseRepository[SessionsModel]):
+    _entity_model = SessionsModel
+
+    # Function to replace the current refresh token of a session by a new one. Presenting a rotated token again
+    # revokes the session, the legitimate user and the attacker both have to log in again
+    async def rotate(self, session_id: str, jti: str, new_jti: str, expires_at: datetime) -> None:
+        now = datetime.utcnow()
+        with self._timed('find_one_and_update'):
+            session = await self.collection.find_one_and_update(
+                {"_id": session_id, "jti": jti},
+                {"$set": {"jti": new_jti, "expires_at": expires_at, "rotated_at": now, "update_at": now}},
+                projection={"_id": 1})
+        if session:
+            return
+
+        if await self.revoke_session(session_id):
+            self.logger.warning('Refresh token reused, revoking session', session_id=session_id)
+        raise UnauthorizedError(message="Invalid token", location=LocationError.Body)
+
+    async def is_active(self, session_id: str) -> bool:
+        with self._timed('find_one'):
+            session = await self.collection.find_one({"_id": session_id}, {"_id": 1})
+        return session is not None
+
+    # The cached access tokens of a revoked session stop working at once in this process
+    async def revoke_session(self, session_id: str) -> int:
+        with self._timed('delete_one'):
+            result = await self.collection.delete_one({"_id": session_id})
+        token_cache.invalidate_session(session_id)
+        return result.deleted_count
+
+    # Function to revoke the sessions of a user, but the one given in keep_session_id
+    async def revoke_user(self, user_id: str, keep_session_id: str | None = None) -> int:
+        query = {"user_id": user_id}
+        if keep_session_id:
+            query["_id"] = {"$ne": keep_session_id}
+        with self._timed('delete_many'):
+            result = await self.collection.delete_many(query)
+        token_cache.invalidate_user(user_id)
+        self.logger.info('Sessions revoked', count=result.deleted_count)
+        return result.deleted_count
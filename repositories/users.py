@@ -1,4 +1,3 @@
-from core.api_response import ApiResponse
 from core.errors import InvalidParameterError, InvalidCredentialsError
 from models.response_model import LocationError
 from models.users import UsersModel
@@ -8,24 +7,24 @@ from repositories.base_repository import BaseRepository, DBModel
 class UsersRepository(BaseRepository[UsersModel]):
     _entity_model = UsersModel
 
-    def __init__(self, db, api_response: ApiResponse):
-        super().__init__(db, api_response)
-        self.api_response = api_response
-
     async def check_if_the_username_exists(self, username: str) -> None:
-        user_found = await self.collection.find_one({'username': username})
+        with self._timed('find_one'):
+            user_found = await self.collection.find_one({'username': username}, {"_id": 1})
         if user_found:
             raise InvalidParameterError(message="There is already a user with that username",
                                         location=LocationError.Body)
 
-    async def get_user_by_username(self, username: str, raise_exception: bool = True) -> DBModel:
-        user_found = await self.collection.find_one({'username': username, "is_deleted": False})
+    async def get_user_by_username(self, username: str, raise_exception: bool = True,
+                                   is_deleted: bool = False) -> DBModel:
+        with self._timed('find_one'):
+            user_found = await self.collection.find_one({'username': username, "is_deleted": is_deleted})
         if not user_found and raise_exception:
             raise InvalidCredentialsError(message="Incorrect username or password", location=LocationError.Body)
         return self._entity_model.model_validate(user_found)
 
     async def get_user_by_email(self, email: str, raise_exception: bool = True) -> DBModel:
-        user_found = await self.collection.find_one({'email': email, "is_deleted": False})
+        with self._timed('find_one'):
+            user_found = await self.collection.find_one({'email': email, "is_deleted": False})
         if not user_found and raise_exception:
             raise InvalidCredentialsError(message="Incorrect email", location=LocationError.Body)
         return self._entity_model.model_validate(user_found)
@@ -0,0 +1,151 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from email.message import Message
+
+import aiosmtplib
+
+from core.config import settings
+from core.metrics import email_dropped_total, smtp_connect_duration_seconds, smtp_send_duration_seconds
+from utils.logger import api_logger
+
+
+@dataclass
+class OutboxMessage:
+    message: Message
+    attempts: int = 0
+
+
+# In-process outbox drained by background workers over persistent SMTP connections
+class EmailOutbox:
+    def __init__(self):
+        self._queue: asyncio.Queue[OutboxMessage] | None = None
+        self._workers: list[asyncio.Task] = []
+        self._retries: set[asyncio.Task] = set()
+        self._stopping = False
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self) -> None:
+        if self.is_running:
+            return
+        self._queue = asyncio.Queue(maxsize=settings.EMAIL_OUTBOX_SIZE)
+        self._stopping = False
+        self._workers = [asyncio.create_task(self._worker(), name=f'email-outbox-{number}')
+                         for number in range(settings.EMAIL_WORKERS)]
+        api_logger.info(f'Email outbox started with {settings.EMAIL_WORKERS} workers')
+
+    # Sends the pending messages for up to EMAIL_SHUTDOWN_TIMEOUT. The retries waiting for their backoff go back to
+    # the queue at once and the messages that fail from now on are retried without waiting
+    async def stop(self) -> None:
+        if not self.is_running:
+            return
+        self._stopping = True
+        retries = list(self._retries)
+        for task in retries:
+            task.cancel()
+        await asyncio.gather(*retries, return_exceptions=True)
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=settings.EMAIL_SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            api_logger.warning(f'Email outbox closed with {self._queue.qsize()} messages pending')
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        api_logger.info('Email outbox stopped')
+
+    async def enqueue(self, message: Message) -> None:
+        if not self.is_running:
+            await self.start()
+        self._put(OutboxMessage(message=message))
+
+    # Drops the message when the outbox is full, so a request never waits for a slow or unreachable SMTP server
+    def _put(self, item: OutboxMessage) -> None:
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            api_logger.error(f'Email to {item.message["To"]} dropped, the outbox is full')
+            email_dropped_total.inc('full')
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(hostname=settings.SMTP_SERVER, port=settings.SMTP_PORT,
+                               start_tls=settings.SMTP_STARTTLS, timeout=settings.SMTP_TIMEOUT)
+        with smtp_connect_duration_seconds.time():
+            await smtp.connect()
+            if smtp.supports_extension('auth'):
+                await smtp.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+        return smtp
+
+    @staticmethod
+    async def _close(smtp: aiosmtplib.SMTP | None) -> None:
+        if smtp is None or not smtp.is_connected:
+            return
+        try:
+            await smtp.quit()
+        except aiosmtplib.SMTPException:
+            smtp.close()
+
+    async def _worker(self) -> None:
+        smtp = None
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                while len(batch) < settings.EMAIL_BATCH_SIZE and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+
+                # Every message of the batch goes through the same authenticated connection
+                for item in batch:
+                    try:
+                        if smtp is None or not smtp.is_connected:
+                            smtp = await self._connect()
+                        start = time.perf_counter()
+                        try:
+                            await smtp.send_message(item.message, sender=settings.SMTP_USERNAME)
+                        except (aiosmtplib.SMTPException, OSError):
+                            smtp_send_duration_seconds.observe(time.perf_counter() - start, 'failed')
+                            raise
+                        smtp_send_duration_seconds.observe(time.perf_counter() - start, 'sent')
+                    except (aiosmtplib.SMTPException, OSError) as error:
+                        await self._close(smtp)
+                        smtp = None
+                        self._retry(item, error)
+                    except Exception as error:
+                        # Not a delivery failure, sending it again would fail again. The connection may be left
+                        # in any state, so the next message opens a new one
+                        api_logger.exception(f'Email to {item.message["To"]} dropped: {error!r}')
+                        email_dropped_total.inc('error')
+                        if smtp is not None:
+                            smtp.close()
+                        smtp = None
+                    finally:
+                        self._queue.task_done()
+        finally:
+            await self._close(smtp)
+
+    def _retry(self, item: OutboxMessage, error: Exception) -> None:
+        item.attempts += 1
+        if item.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+            api_logger.error(f'Email to {item.message["To"]} dropped after {item.attempts} attempts: {error}')
+            email_dropped_total.inc('failed')
+            return
+        if self._stopping:
+            self._put(item)
+            return
+        delay = settings.EMAIL_RETRY_BACKOFF * 2 ** (item.attempts - 1)
+        api_logger.warning(f'Email to {item.message["To"]} failed, retrying in {delay}s: {error}')
+        task = asyncio.create_task(self._requeue(item, delay))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    # A retry cancelled by stop goes back to the queue without waiting for its delay
+    async def _requeue(self, item: OutboxMessage, delay: float) -> None:
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self._put(item)
+
+
+email_outbox = EmailOutbox()
@@ -1,12 +1,13 @@
-import smtplib
+from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
 from fastapi_mail import MessageSchema, FastMail
-from jinja2 import Environment, FileSystemLoader
 from pydantic import EmailStr
 
 from core.config import settings
 from core.connection_config import conf
+from services.email_outbox import email_outbox
+from services.email_templates import email_templates
 
 
 # Function to send password reset email / with FastMail
@@ -23,39 +24,36 @@ async def send_password_reset_email(user_id: str, email: EmailStr, token: str):
     await fm.send_message(message)
 
 
-# Function to send password reset email / with smtplib
+# Function to send emails through the background outbox / with aiosmtplib
 class EmailService:
     def __init__(self):
-        self.smtp_server = settings.SMTP_SERVER
-        self.smtp_port = settings.SMTP_PORT
         self.smtp_username = settings.SMTP_USERNAME
-        self.smtp_password = settings.SMTP_PASSWORD
-        self.env = Environment(loader=FileSystemLoader('templates'))
 
-    async def create_password_reset_message(self, user_id: str, email: EmailStr, token: str) -> MIMEText:
+    async def create_password_reset_message(self, user_id: str, email: EmailStr, token: str) -> None:
         url = f'https://yodomain.com/reset-password/?id={user_id}&token={token}'
         text_link = f'Restablecer contraseña'
-        template = self.env.get_template('password_reset_message.html')
-        text_message = template.render(url=url, text_link=text_link)
-        message = MIMEText(text_message, "html")
+        message = await self._build_message('password_reset_message.html', url=url, text_link=text_link)
         message['Subject'] = 'Password Reset Request'
         message['To'] = email
         await self._send_email(message)
 
-    async def create_verify_email_message(self, user_id: str, email: EmailStr, token: str) -> MIMEText:
+    async def create_verify_email_message(self, user_id: str, email: EmailStr, token: str) -> None:
         url = f'https://yodomain.com/verificar-email/?id={user_id}&token={token}'
         text_link = f'Confirmar correo'
-        template = self.env.get_template('email_verification_message.html')
-        text_message = template.render(url=url, text_link=text_link)
-        message = MIMEText(text_message, "html")
+        message = await self._build_message('email_verification_message.html', url=url, text_link=text_link)
         message['Subject'] = 'We will confirm your email'
         message['To'] = email
         await self._send_email(message)
 
-    async def _send_email(self, message: MIMEText):
-        mailServer = smtplib.SMTP(self.smtp_server, self.smtp_port)
-        mailServer.starttls()
-        mailServer.ehlo()
-        mailServer.login(self.smtp_username, self.smtp_password)
-        mailServer.sendmail(self.smtp_username, message['To'], message.as_string())
-        mailServer.close()
+    # Function to build an email with the plain text and HTML versions of a template, clients show the last one
+    @staticmethod
+    async def _build_message(template_name: str, **context) -> MIMEMultipart:
+        html_message, text_message = await email_templates.render(template_name, **context)
+        message = MIMEMultipart('alternative')
+        message.attach(MIMEText(text_message, "plain"))
+        message.attach(MIMEText(html_message, "html"))
+        return message
+
+    async def _send_email(self, message: MIMEMultipart):
+        message['From'] = self.smtp_username
+        await email_outbox.enqueue(message)
@@ -0,0 +1,85 @@
+import re
+from html.parser import HTMLParser
+
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
+
+TEMPLATES_DIR = 'templates'
+TEMPLATE_EXTENSIONS = ('html',)
+
+BLOCK_TAGS = {'p', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'tr', 'table', 'ul', 'ol', 'br', 'hr'}
+SKIPPED_TAGS = {'head', 'title', 'style', 'script'}
+
+
+# Converts the source of an HTML template to the source of a plain text template. The Jinja expressions are
+# kept, so the text version is compiled once and rendered with the same variables as the HTML one
+class _PlainTextConverter(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.parts: list[str] = []
+        self._skipped = 0
+        self._links: list[str | None] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag in SKIPPED_TAGS:
+            self._skipped += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append('\n')
+        elif tag == 'a':
+            self._links.append(dict(attrs).get('href'))
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in SKIPPED_TAGS:
+            self._skipped -= 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append('\n')
+        elif tag == 'a' and self._links:
+            href = self._links.pop()
+            if href:
+                self.parts.append(f' ({href})')
+
+    def handle_data(self, data: str) -> None:
+        if not self._skipped:
+            self.parts.append(data)
+
+    def text(self) -> str:
+        lines = (re.sub(r'[ \t\r\f\v]+', ' ', line).strip() for line in ''.join(self.parts).split('\n'))
+        return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip() + '\n'
+
+
+def html_to_text_source(html_source: str) -> str:
+    converter = _PlainTextConverter()
+    converter.feed(html_source)
+    converter.close()
+    return converter.text()
+
+
+# Templates of the emails shared by the whole process. They are compiled once, with their plain text
+# versions, so rendering an email only fills in the variables
+class EmailTemplates:
+    def __init__(self, templates_dir: str):
+        self.env = Environment(
+            loader=FileSystemLoader(templates_dir),
+            autoescape=select_autoescape(TEMPLATE_EXTENSIONS, default_for_string=False),
+            enable_async=True,
+            auto_reload=False,
+        )
+        self._templates: dict[str, tuple[Template, Template]] = {}
+
+    def _compile(self, name: str) -> tuple[Template, Template]:
+        html_source, _, _ = self.env.loader.get_source(self.env, name)
+        compiled = (self.env.get_template(name), self.env.from_string(html_to_text_source(html_source)))
+        self._templates[name] = compiled
+        return compiled
+
+    # Called at startup, so no request pays for reading and compiling a template
+    def load(self) -> None:
+        for name in self.env.list_templates(extensions=TEMPLATE_EXTENSIONS):
+            self._compile(name)
+
+    # Returns the HTML and the plain text versions
+    async def render(self, name: str, **context) -> tuple[str, str]:
+        html_template, text_template = self._templates.get(name) or self._compile(name)
+        return await html_template.render_async(**context), await text_template.render_async(**context)
+
+
+email_templates = EmailTemplates(TEMPLATES_DIR)
@@ -0,0 +1,70 @@
+# Fixtures of the tests that run the app. The app runs against an in-memory mongomock database, a new one for
+# each test, and the emails are captured instead of sent
+import os
+import tempfile
+
+# Settings of the test run, the variables of the environment win
+TEST_SETTINGS = {
+    "ENV": "test",
+    "DB_CONNECTION": "mongodb://localhost:27017",
+    "DB_NAME": "test",
+    "DB_MIN_POOL_SIZE": "0",
+    "SECRET_KEY": "test-secret-key",
+    "SECRET_KEY_REFRESH": "test-secret-key-refresh",
+    "SMTP_SERVER": "localhost",
+    "SMTP_PORT": "1025",
+    "SMTP_USERNAME": "sender@example.com",
+    "SMTP_PASSWORD": "password",
+    "MAIL_USERNAME": "sender",
+    "MAIL_PASSWORD": "password",
+    "MAIL_FROM": "sender@example.com",
+    "MAIL_PORT": "1025",
+    "MAIL_SERVER": "localhost",
+    "MAIL_FROM_NAME": "sender",
+    "MAIL_STARTTLS": "false",
+    "MAIL_SSL_TLS": "false",
+    "LOG_LEVEL": "WARNING",
+    "LOG_FILE": os.path.join(tempfile.gettempdir(), "api-tests.log"),
+    "BCRYPT_ROUNDS": "4",
+    "RATE_LIMIT_ENABLED": "false",
+}
+for name, value in TEST_SETTINGS.items():
+    os.environ.setdefault(name, value)
+
+import pytest  # noqa: E402
+
+mongomock_motor = pytest.importorskip('mongomock_motor')
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import core.database  # noqa: E402
+import main  # noqa: E402
+from core.token_cache import token_cache  # noqa: E402
+from repositories.products import products_cache  # noqa: E402
+from services.email_outbox import email_outbox  # noqa: E402
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(core.database, 'AsyncIOMotorClient', mongomock_motor.AsyncMongoMockClient)
+    return main.app
+
+
+@pytest.fixture
+def emails(monkeypatch) -> list:
+    sent = []
+
+    async def enqueue(message) -> None:
+        sent.append(message)
+
+    monkeypatch.setattr(email_outbox, 'enqueue', enqueue)
+    return sent
+
+
+@pytest.fixture
+def client(app, emails):
+    token_cache.clear()
+    with TestClient(app) as test_client:
+        test_client.portal.call(products_cache.clear)
+        yield test_client
+
@@ -0,0 +1,102 @@
+from tests.utils import PASSWORD, auth_headers, create_user, run
+
+
+def test_token_with_wrong_password_is_unauthorized(client):
+    create_user(client)
+
+    response = client.post('/api/auth/token', data={'username': 'user1', 'password': 'Wrong-passw0rd'})
+
+    assert response.status_code == 401
+    assert response.json()["status"] == 'UNAUTHORIZED'
+    assert response.json()["errors"][0]["message"] == 'Incorrect username or password'
+
+
+def test_token_of_unknown_user_is_unauthorized(client):
+    response = client.post('/api/auth/token', data={'username': 'nobody', 'password': PASSWORD})
+
+    assert response.status_code == 401
+    assert response.json()["data"] is None
+
+
+def test_token_returns_the_raw_tokens(client):
+    create_user(client)
+
+    response = client.post('/api/auth/token', data={'username': 'user1', 'password': PASSWORD})
+
+    assert response.status_code == 200
+    assert response.json()["token_type"] == 'bearer'
+    assert response.json()["access_token"]
+
+
+def login(client, username: str = 'user1', password: str = PASSWORD) -> dict:
+    response = client.post('/api/auth/login', json={'username': username, 'password': password})
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+def is_authorized(client, user_id: str, tokens: dict) -> bool:
+    return client.get(f'/api/users/{user_id}', headers=auth_headers(tokens)).status_code == 200
+
+
+def test_refresh_rotates_the_token_of_the_session(client):
+    user_id, tokens = create_user(client)
+
+    response = client.post('/api/auth/refresh', json={'token': tokens["refresh_token"]})
+
+    new_tokens = response.json()["data"]
+    assert response.status_code == 200
+    assert is_authorized(client, user_id, new_tokens)
+    assert run(client, client.app.database.sessions.count_documents, {}) == 1
+
+
+def test_reused_refresh_token_revokes_the_session(client):
+    user_id, tokens = create_user(client)
+    new_tokens = client.post('/api/auth/refresh', json={'token': tokens["refresh_token"]}).json()["data"]
+    assert is_authorized(client, user_id, new_tokens)
+
+    response = client.post('/api/auth/refresh', json={'token': tokens["refresh_token"]})
+
+    assert response.status_code == 401
+    # The cached access token of the revoked session stops working at once
+    assert not is_authorized(client, user_id, new_tokens)
+    assert client.post('/api/auth/refresh', json={'token': new_tokens["refresh_token"]}).status_code == 401
+
+
+def test_logout_ends_only_its_session(client):
+    user_id, tokens = create_user(client)
+    other_tokens = login(client)
+    assert is_authorized(client, user_id, tokens)
+
+    response = client.post('/api/auth/logout', headers=auth_headers(tokens))
+
+    assert response.status_code == 200
+    assert not is_authorized(client, user_id, tokens)
+    assert is_authorized(client, user_id, other_tokens)
+
+
+def test_change_password_logs_out_the_other_sessions(client):
+    user_id, tokens = create_user(client)
+    other_tokens = login(client)
+    assert is_authorized(client, user_id, other_tokens)
+
+    response = client.patch(f'/api/users/change-password/{user_id}', headers=auth_headers(tokens),
+                            json={'current_password': PASSWORD, 'new_password': 'New-passw0rd!',
+                                  'confirm_password': 'New-passw0rd!'})
+
+    assert response.status_code == 200
+    assert is_authorized(client, user_id, tokens)
+    assert not is_authorized(client, user_id, other_tokens)
+    assert client.post('/api/auth/refresh', json={'token': other_tokens["refresh_token"]}).status_code == 401
+
+
+def test_reset_password_logs_out_every_session(client):
+    user_id, tokens = create_user(client)
+    assert is_authorized(client, user_id, tokens)
+    run(client, client.app.database.users.update_one, {"_id": user_id}, {"$set": {"password_token": 'reset-token'}})
+
+    response = client.post('/api/auth/reset-password', json={'token_password_reset': 'reset-token', 'user_id': user_id,
+                                                             'new_password': 'New-passw0rd!',
+                                                             'confirm_password': 'New-passw0rd!'})
+
+    assert response.status_code == 200
+    assert not is_authorized(client, user_id, tokens)
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from core.batch_loader import BatchLoader
+
+PRODUCT = {'product_code': 1, 'product_name': 'Radio', 'product_category': 'c', 'product_brand': 'b',
+           'product_unit_presentation': 'u', 'product_quantity_presentation': 1, 'product_price': 1.5,
+           'supplier_name': 's'}
+
+
+class FakeStore:
+    def __init__(self, values: dict, error: Exception | None = None):
+        self.values = values
+        self.error = error
+        self.calls: list[list] = []
+
+    async def load_many(self, keys: list) -> dict:
+        self.calls.append(keys)
+        await asyncio.sleep(0)
+        if self.error:
+            raise self.error
+        return {key: self.values[key] for key in keys if key in self.values}
+
+
+def load_all(loader: BatchLoader, keys: list) -> list:
+    async def gather() -> list:
+        return await asyncio.gather(*(loader.load(key) for key in keys), return_exceptions=True)
+
+    return asyncio.run(gather())
+
+
+def test_concurrent_loads_are_one_batch():
+    store = FakeStore({'a': 1, 'b': 2, 'c': 3})
+    loader = BatchLoader(store.load_many, max_batch_size=10)
+
+    assert load_all(loader, ['a', 'b', 'c']) == [1, 2, 3]
+    assert store.calls == [['a', 'b', 'c']]
+    assert loader.batches == 1
+
+
+def test_repeated_keys_are_loaded_once_and_missing_keys_are_none():
+    store = FakeStore({'a': 1})
+    loader = BatchLoader(store.load_many, max_batch_size=10)
+
+    assert load_all(loader, ['a', 'missing', 'a']) == [1, None, 1]
+    assert store.calls == [['a', 'missing']]
+
+
+def test_batches_are_split_by_max_batch_size():
+    store = FakeStore({key: key for key in range(5)})
+    loader = BatchLoader(store.load_many, max_batch_size=2)
+
+    assert load_all(loader, list(range(5))) == list(range(5))
+    assert store.calls == [[0, 1], [2, 3], [4]]
+
+
+def test_error_of_the_load_reaches_every_caller():
+    error = RuntimeError('database down')
+    loader = BatchLoader(FakeStore({}, error).load_many, max_batch_size=10)
+
+    assert load_all(loader, ['a', 'b']) == [error, error]
+
+
+def test_loads_after_the_batch_start_a_new_one():
+    store = FakeStore({'a': 1, 'b': 2})
+    loader = BatchLoader(store.load_many, max_batch_size=10)
+
+    async def sequential() -> list:
+        return [await loader.load('a'), await loader.load('b')]
+
+    assert asyncio.run(sequential()) == [1, 2]
+    assert store.calls == [['a'], ['b']]
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    store = FakeStore({'a': 1})
+    loader = BatchLoader(store.load_many, max_batch_size=10)
+
+    async def cancel_one() -> int:
+        cancelled = asyncio.create_task(loader.load('a'))
+        waiting = asyncio.create_task(loader.load('a'))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await waiting
+
+    assert asyncio.run(cancel_one()) == 1
+
+
+def create_product(client, **changes) -> str:
+    response = client.post('/api/products', json={**PRODUCT, **changes})
+    assert response.status_code == 200, response.text
+    return response.json()["data"]["_id"]
+
+
+def test_batch_get_returns_products_and_missing_ids(client):
+    first_id, second_id = create_product(client), create_product(client, product_code=2)
+    disabled_id = create_product(client, product_code=3)
+    client.patch(f'/api/products/disable/{disabled_id}')
+
+    response = client.post('/api/products/batch-get', json={'ids': [first_id, 'unknown', second_id, first_id,
+                                                                    disabled_id]})
+
+    assert response.status_code == 200, response.text
+    data = response.json()["data"]
+    assert [product["_id"] for product in data["products"]] == [first_id, second_id]
+    assert data["missing_ids"] == ['unknown', disabled_id]
+
+
+def test_batch_get_with_fields_returns_only_those_fields(client):
+    product_id = create_product(client)
+
+    response = client.post('/api/products/batch-get', json={'ids': [product_id, 'unknown'],
+                                                            'fields': ['product_name']})
+
+    data = response.json()["data"]
+    products = [{key: value for key, value in product.items() if value is not None} for product in data["products"]]
+    assert [product["product_name"] for product in products] == ['Radio']
+    assert 'product_price' not in products[0]
+    assert data["missing_ids"] == ['unknown']
@@ -0,0 +1,142 @@
+import asyncio
+import time
+from email.message import Message
+
+import aiosmtplib
+import pytest
+
+from core.config import settings
+from core.metrics import email_dropped_total
+from services.email_outbox import EmailOutbox
+
+
+class FakeSMTP:
+    def __init__(self, failures: dict[str, list[Exception]], blocked: asyncio.Event | None = None):
+        self.failures = failures
+        self.blocked = blocked
+        self.sent: list[str] = []
+        self.is_connected = True
+
+    async def send_message(self, message: Message, sender: str) -> None:
+        if self.blocked is not None:
+            await self.blocked.wait()
+        errors = self.failures.get(message["To"])
+        if errors:
+            raise errors.pop(0)
+        self.sent.append(message["To"])
+
+    async def quit(self) -> None:
+        self.is_connected = False
+
+    def close(self) -> None:
+        self.is_connected = False
+
+
+def message_to(recipient: str) -> Message:
+    message = Message()
+    message["To"] = recipient
+    return message
+
+
+@pytest.fixture
+def outbox_settings(monkeypatch):
+    monkeypatch.setattr(settings, 'EMAIL_WORKERS', 1)
+    monkeypatch.setattr(settings, 'EMAIL_BATCH_SIZE', 1)
+    monkeypatch.setattr(settings, 'EMAIL_MAX_ATTEMPTS', 3)
+    monkeypatch.setattr(settings, 'EMAIL_RETRY_BACKOFF', 0.01)
+    monkeypatch.setattr(settings, 'EMAIL_SHUTDOWN_TIMEOUT', 5)
+    return settings
+
+
+def build_outbox(monkeypatch, smtp: FakeSMTP) -> EmailOutbox:
+    outbox = EmailOutbox()
+
+    async def connect() -> FakeSMTP:
+        smtp.is_connected = True
+        return smtp
+
+    monkeypatch.setattr(outbox, '_connect', connect)
+    return outbox
+
+
+def test_failed_delivery_is_retried(monkeypatch, outbox_settings):
+    smtp = FakeSMTP({'a@example.com': [aiosmtplib.SMTPServerDisconnected('lost'), OSError('refused')]})
+    outbox = build_outbox(monkeypatch, smtp)
+
+    async def scenario():
+        await outbox.enqueue(message_to('a@example.com'))
+        await asyncio.sleep(0.2)
+        await outbox.stop()
+
+    asyncio.run(scenario())
+
+    assert smtp.sent == ['a@example.com']
+
+
+def test_delivery_is_dropped_after_the_last_attempt(monkeypatch, outbox_settings):
+    smtp = FakeSMTP({'a@example.com': [OSError('refused')] * 3})
+    outbox = build_outbox(monkeypatch, smtp)
+    dropped = email_dropped_total.value('failed')
+
+    async def scenario():
+        await outbox.enqueue(message_to('a@example.com'))
+        await outbox.enqueue(message_to('b@example.com'))
+        await asyncio.sleep(0.2)
+        await outbox.stop()
+
+    asyncio.run(scenario())
+
+    assert smtp.sent == ['b@example.com']
+    assert email_dropped_total.value('failed') == dropped + 1
+
+
+def test_unexpected_error_does_not_stop_the_worker(monkeypatch, outbox_settings):
+    smtp = FakeSMTP({'a@example.com': [RuntimeError('broken message')]})
+    outbox = build_outbox(monkeypatch, smtp)
+    dropped = email_dropped_total.value('error')
+
+    async def scenario():
+        await outbox.enqueue(message_to('a@example.com'))
+        await outbox.enqueue(message_to('b@example.com'))
+        await outbox.stop()
+
+    asyncio.run(scenario())
+
+    assert smtp.sent == ['b@example.com']
+    assert email_dropped_total.value('error') == dropped + 1
+
+
+def test_enqueue_does_not_wait_when_the_outbox_is_full(monkeypatch, outbox_settings):
+    monkeypatch.setattr(settings, 'EMAIL_OUTBOX_SIZE', 1)
+    dropped = email_dropped_total.value('full')
+
+    async def scenario():
+        blocked = asyncio.Event()
+        smtp = FakeSMTP({}, blocked)
+        outbox = build_outbox(monkeypatch, smtp)
+        # The worker takes the first message and waits on the server, the second one fills the queue
+        for recipient in ('a@example.com', 'b@example.com', 'c@example.com'):
+            await asyncio.wait_for(outbox.enqueue(message_to(recipient)), timeout=1)
+            await asyncio.sleep(0)
+        blocked.set()
+        await outbox.stop()
+        return smtp.sent
+
+    assert asyncio.run(scenario()) == ['a@example.com', 'b@example.com']
+    assert email_dropped_total.value('full') == dropped + 1
+
+
+def test_stop_sends_the_retries_waiting_for_their_backoff(monkeypatch, outbox_settings):
+    monkeypatch.setattr(settings, 'EMAIL_RETRY_BACKOFF', 60)
+    smtp = FakeSMTP({'a@example.com': [OSError('refused')]})
+    outbox = build_outbox(monkeypatch, smtp)
+
+    async def scenario():
+        await outbox.enqueue(message_to('a@example.com'))
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        await outbox.stop()
+        return time.perf_counter() - start
+
+    assert asyncio.run(scenario()) < 1
+    assert smtp.sent == ['a@example.com']
@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+from typing import Annotated
+
+import mongomock_motor
+import pytest
+from fastapi import Depends, FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+from core.api_response import ApiResponse
+from core.idempotency import IDEMPOTENCY_KEY_HEADER, IDEMPOTENT_REPLAYED_HEADER
+from models.response_model import ResponseModel
+from models.users import TokenData
+from repositories.idempotency import IdempotencyRepository
+from utils.response_handler import response_handler
+
+PRODUCT = {'product_code': 1, 'product_name': 'Radio', 'product_category': 'c', 'product_brand': 'b',
+           'product_unit_presentation': 'u', 'product_quantity_presentation': 1, 'product_price': 1.5,
+           'supplier_name': 's'}
+
+
+def test_repeated_key_replays_the_response(client):
+    headers = {IDEMPOTENCY_KEY_HEADER: 'key-1'}
+    first = client.post('/api/products', json=PRODUCT, headers=headers)
+
+    second = client.post('/api/products', json=PRODUCT, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.headers[IDEMPOTENT_REPLAYED_HEADER] == 'true'
+    assert second.content == first.content
+    assert client.portal.call(client.app.database.products.count_documents, {}) == 1
+
+
+def test_key_used_with_another_body_is_rejected(client):
+    client.post('/api/products', json=PRODUCT, headers={IDEMPOTENCY_KEY_HEADER: 'key-1'})
+
+    response = client.post('/api/products', json={**PRODUCT, 'product_code': 2},
+                           headers={IDEMPOTENCY_KEY_HEADER: 'key-1'})
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["location"] == 'request.headers'
+
+
+# App with one authenticated idempotent endpoint, the bearer token is "<user id>:<anything>"
+@pytest.fixture
+def idempotent_client():
+    app = FastAPI()
+    app.container = SimpleNamespace(idempotency_repository=IdempotencyRepository(
+        mongomock_motor.AsyncMongoMockClient()['test']))
+    app.calls = []
+
+    def current_user(request: Request) -> TokenData:
+        user_id = request.headers['authorization'].removeprefix('Bearer ').split(':')[0]
+        return TokenData(id=user_id, email=f'{user_id}@example.com', username=user_id, full_name=user_id)
+
+    @app.post('/things')
+    @response_handler(idempotent=True)
+    async def create_thing(
+            request: Request,
+            response: Response,
+            token_data: Annotated[TokenData, Depends(current_user)],
+            api_response: ApiResponse = Depends(ApiResponse)
+    ) -> ResponseModel:
+        app.calls.append(token_data.id)
+        response.headers['ETag'] = f'"{len(app.calls)}"'
+        response.headers['Location'] = f'/things/{len(app.calls)}'
+        return
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_retry_with_a_refreshed_token_is_replayed(idempotent_client):
+    first = idempotent_client.post('/things', headers={'Authorization': 'Bearer user-1:first-token',
+                                                       IDEMPOTENCY_KEY_HEADER: 'key-1'})
+
+    retry = idempotent_client.post('/things', headers={'Authorization': 'Bearer user-1:refreshed-token',
+                                                       IDEMPOTENCY_KEY_HEADER: 'key-1'})
+
+    assert retry.status_code == first.status_code == 200
+    assert retry.headers[IDEMPOTENT_REPLAYED_HEADER] == 'true'
+    assert idempotent_client.app.calls == ['user-1']
+
+
+def test_replay_keeps_the_response_headers(idempotent_client):
+    headers = {'Authorization': 'Bearer user-1:token', IDEMPOTENCY_KEY_HEADER: 'key-1'}
+    first = idempotent_client.post('/things', headers=headers)
+
+    retry = idempotent_client.post('/things', headers=headers)
+
+    assert retry.headers['ETag'] == first.headers['ETag'] == '"1"'
+    assert retry.headers['Location'] == first.headers['Location'] == '/things/1'
+    assert retry.headers['content-length'] == first.headers['content-length']
+
+
+def test_same_key_of_another_user_is_another_request(idempotent_client):
+    idempotent_client.post('/things', headers={'Authorization': 'Bearer user-1:token', IDEMPOTENCY_KEY_HEADER: 'key-1'})
+
+    response = idempotent_client.post('/things', headers={'Authorization': 'Bearer user-2:token',
+                                                          IDEMPOTENCY_KEY_HEADER: 'key-1'})
+
+    assert response.status_code == 200
+    assert IDEMPOTENT_REPLAYED_HEADER not in response.headers
+    assert idempotent_client.app.calls == ['user-1', 'user-2']
@@ -0,0 +1,36 @@
+from models.products import ProductsModel
+from repositories.indexes import _index_spec
+
+TEXT_INDEX = next(index.document for index in ProductsModel._indexes.default
+                  if index.document['name'] == 'active_name_text')
+
+
+# index_information() of the text index as the server reports it
+def server_text_index(weights: dict) -> dict:
+    return {'v': 2, 'key': [('_fts', 'text'), ('_ftsx', 1)], 'weights': weights, 'default_language': 'none',
+            'language_override': 'language', 'textIndexVersion': 3,
+            'partialFilterExpression': {'is_deleted': False}}
+
+
+def test_text_index_matches_the_server_form():
+    assert _index_spec(server_text_index({'product_name': 1})) == _index_spec(TEXT_INDEX)
+
+
+def test_text_index_with_other_fields_is_a_drift():
+    assert _index_spec(server_text_index({'product_name': 1, 'product_brand': 1})) != _index_spec(TEXT_INDEX)
+
+
+def test_compound_text_index_keeps_its_other_fields():
+    declared = {'key': {'product_category': 1, 'product_name': 'text'}, 'weights': {'product_name': 5}}
+    existing = {'key': [('product_category', 1), ('_fts', 'text'), ('_ftsx', 1)], 'weights': {'product_name': 5}}
+
+    assert _index_spec(existing) == _index_spec(declared)
+    assert _index_spec(existing)['key'] == [('product_category', 1), ('_fts', 'text')]
+
+
+def test_regular_index_is_unchanged():
+    index = next(index.document for index in ProductsModel._indexes.default
+                 if index.document['name'] == 'active_category_price')
+
+    assert _index_spec(index) == {'key': [('product_category', 1), ('product_price', 1)],
+                                  'partialFilterExpression': {'is_deleted': False}}
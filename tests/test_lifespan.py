@@ -0,0 +1,29 @@
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+
+from core.config import settings
+from core.security import hash_password, verify_password
+from utils.logger import api_logger
+
+
+def test_logs_are_written_after_the_app_restarts(app):
+    for _ in range(2):
+        with TestClient(app):
+            pass
+
+    message = f'Logged after a restart {uuid4()}'
+    with TestClient(app):
+        api_logger.warning(message)
+
+    with open(settings.LOG_FILE, encoding='utf-8') as log_file:
+        assert message in log_file.read()
+
+
+def test_passwords_are_hashed_after_the_app_restarts(app):
+    with TestClient(app):
+        pass
+
+    with TestClient(app) as client:
+        hashed_password = client.portal.call(hash_password, 'Passw0rd!')
+        client.portal.call(verify_password, 'Passw0rd!', hashed_password)
@@ -0,0 +1,80 @@
+from repositories.products import products_cache
+from tests.utils import run
+
+PRODUCT = {'product_code': 1, 'product_name': 'Radio', 'product_category': 'c', 'product_brand': 'b',
+           'product_unit_presentation': 'u', 'product_quantity_presentation': 1, 'product_price': 1.5,
+           'supplier_name': 's'}
+
+
+def create_product(client, **changes) -> str:
+    response = client.post('/api/products', json={**PRODUCT, **changes})
+    assert response.status_code == 200, response.text
+    return response.json()["data"]["_id"]
+
+
+def get_product(client, product_id: str):
+    return client.get(f'/api/products/{product_id}')
+
+
+def test_get_is_served_from_the_cache(client):
+    product_id = create_product(client)
+
+    get_product(client, product_id)
+    hits = products_cache.hits
+    response = get_product(client, product_id)
+
+    assert response.status_code == 200
+    assert products_cache.hits == hits + 1
+
+
+def test_update_invalidates_the_cached_product(client):
+    product_id = create_product(client)
+    get_product(client, product_id)
+
+    client.patch(f'/api/products/update/{product_id}', json={'product_name': 'TV'})
+
+    assert get_product(client, product_id).json()["data"]["product_name"] == 'TV'
+
+
+def test_update_all_invalidates_the_cached_product(client):
+    product_id = create_product(client)
+    get_product(client, product_id)
+
+    response = client.put(f'/api/products/update-all/{product_id}',
+                          json={**PRODUCT, 'product_code': 2, 'product_price': 9.0})
+
+    assert response.status_code == 200, response.text
+    assert get_product(client, product_id).json()["data"]["product_price"] == 9.0
+
+
+def test_disable_and_delete_invalidate_the_cached_product(client):
+    disabled_id, deleted_id = create_product(client), create_product(client, product_code=2)
+    get_product(client, disabled_id), get_product(client, deleted_id)
+
+    client.patch(f'/api/products/disable/{disabled_id}')
+    client.delete(f'/api/products/delete/{deleted_id}')
+
+    assert get_product(client, disabled_id).status_code == 404
+    assert get_product(client, deleted_id).status_code == 404
+
+
+def test_write_outside_the_api_is_seen_after_invalidate(client):
+    product_id = create_product(client)
+    get_product(client, product_id)
+
+    run(client, client.app.database.products.update_one, {"_id": product_id}, {"$set": {"product_name": "TV"}})
+    assert get_product(client, product_id).json()["data"]["product_name"] == 'Radio'
+
+    run(client, products_cache.invalidate, product_id)
+    assert get_product(client, product_id).json()["data"]["product_name"] == 'TV'
+
+
+def test_list_reflects_the_writes(client):
+    first_id = create_product(client)
+    assert len(client.get('/api/products/all/').json()["data"]) == 1
+
+    create_product(client, product_code=2)
+    client.patch(f'/api/products/update/{first_id}', json={'product_name': 'TV'})
+
+    names = sorted(product["product_name"] for product in client.get('/api/products/all/').json()["data"])
+    assert names == ['Radio', 'TV']
@@ -0,0 +1,64 @@
+from core.config import settings
+
+HEADER = ('product_code,product_name,product_category,product_brand,product_unit_presentation,'
+          'product_quantity_presentation,product_price,supplier_name\n')
+
+
+def import_csv(client, body: str):
+    return client.post('/api/products/bulk', content=body.encode('utf-8'), headers={'Content-Type': 'text/csv'})
+
+
+def product_names(client) -> list[str]:
+    products = client.portal.call(client.app.database.products.find({}, {"product_name": 1}).to_list, None)
+    return sorted(product["product_name"] for product in products)
+
+
+def test_csv_with_a_quote_inside_an_unquoted_field(client):
+    body = HEADER + '1,TV 32" screen,c,b,u,1,10,s\n2,Radio,c,b,u,1,20,s\n3,Phone,c,b,u,1,30,s\n'
+
+    response = import_csv(client, body)
+
+    assert response.status_code == 200
+    assert response.json()["data"] == {'received': 3, 'inserted': 3, 'failed': 0, 'errors': []}
+    assert product_names(client) == ['Phone', 'Radio', 'TV 32" screen']
+
+
+def test_csv_with_multiline_quoted_fields(client):
+    body = HEADER + ('1,"Multi\nline ""name""",c,b,u,1,10,s\n'
+                     '2,"Two,\n\nparagraphs",c,b,u,1,20,s\n'
+                     '3,Plain,c,b,u,1,30,s\n')
+
+    response = import_csv(client, body)
+
+    assert response.json()["data"]["inserted"] == 3
+    assert product_names(client) == ['Multi\nline "name"', 'Plain', 'Two,\n\nparagraphs']
+
+
+def test_csv_with_an_unclosed_quote_reports_the_record(client, monkeypatch):
+    monkeypatch.setattr(settings, 'BULK_MAX_RECORD_LENGTH', 200)
+    body = HEADER + '1,"Never closed,c,b,u,1,10,s\n' + 'x' * 200 + '\n2,Radio,c,b,u,1,20,s\n'
+
+    response = import_csv(client, body)
+
+    data = response.json()["data"]
+    assert response.status_code == 200
+    assert data["inserted"] == 1
+    assert data["errors"][0]["row"] == 1
+    assert data["errors"][0]["message"] == 'Invalid CSV: record longer than 200 characters'
+    assert product_names(client) == ['Radio']
+
+
+def test_csv_with_a_quoted_field_at_the_end_of_the_body(client):
+    response = import_csv(client, HEADER + '1,"Unclosed,c,b,u,1,10,s\n')
+
+    data = response.json()["data"]
+    assert data["inserted"] == 0
+    assert data["errors"][0]["message"].startswith('Invalid CSV:')
+
+
+def test_csv_that_is_not_utf8_is_rejected(client):
+    response = client.post('/api/products/bulk', content=(HEADER + '1,Caf\xe9,c,b,u,1,10,s\n').encode('latin-1'),
+                           headers={'Content-Type': 'text/csv'})
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["location"] == 'request.body'
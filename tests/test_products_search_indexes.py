@@ -0,0 +1,99 @@
+# Checks with explain() that every product search is served by an index and never by a collection scan.
+# Runs against the MongoDB of DB_CONNECTION, in a temporary database that is dropped at the end, and is
+# skipped when the settings are missing or no server answers.
+#
+#   python -m pytest tests/test_products_search_indexes.py
+import asyncio
+from uuid import uuid4
+
+import pytest
+from pydantic import ValidationError
+
+try:
+    from core.config import settings
+except ValidationError:
+    pytest.skip('The settings of the app are not configured', allow_module_level=True)
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from models.products import ProductsModel
+from repositories.base_repository import BaseRepository
+from repositories.products import ProductSearchFilter, ProductsRepository
+
+SEED_PRODUCTS = 500
+SERVER_SELECTION_TIMEOUT_MS = 2000
+
+SEARCHES = {
+    "category": ProductSearchFilter(product_category='category-1'),
+    "brand": ProductSearchFilter(product_brand='brand-1'),
+    "supplier": ProductSearchFilter(supplier_name='supplier-1'),
+    "category_price": ProductSearchFilter(product_category='category-1', min_price=10, max_price=100),
+    "brand_price": ProductSearchFilter(product_brand='brand-1', min_price=10, max_price=100),
+    "supplier_price": ProductSearchFilter(supplier_name='supplier-1', min_price=10, max_price=100),
+    "category_price_sorted_by_price": ProductSearchFilter(product_category='category-1', max_price=100,
+                                                          sort_by='product_price', sort_order='desc'),
+    "price": ProductSearchFilter(min_price=10, max_price=100),
+    "text": ProductSearchFilter(q='product'),
+    "text_category": ProductSearchFilter(q='product', product_category='category-1'),
+    "text_sorted_by_name": ProductSearchFilter(q='product', sort_by='product_name'),
+    "no_filters": ProductSearchFilter(),
+    "sorted_by_name": ProductSearchFilter(sort_by='product_name'),
+}
+
+
+@pytest.fixture(scope='module')
+def db_name():
+    client = MongoClient(settings.DB_CONNECTION, serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS)
+    try:
+        client.admin.command('ping')
+    except PyMongoError:
+        client.close()
+        pytest.skip('No MongoDB server answers at DB_CONNECTION')
+
+    name = f'test_{uuid4().hex[:12]}'
+    collection = client[name].get_collection(ProductsModel._collection_name.default)
+    collection.create_indexes(ProductsModel._indexes.default)
+    documents = []
+    for code in range(SEED_PRODUCTS):
+        document = BaseRepository.convert_enum_values(ProductsModel(
+            product_code=code, product_name=f'product {code}', product_category=f'category-{code % 10}',
+            product_brand=f'brand-{code % 7}', product_unit_presentation='unit', product_quantity_presentation=1,
+            product_price=code % 200, supplier_name=f'supplier-{code % 5}', is_deleted=code % 20 == 0).model_dump())
+        document["_id"] = document.pop("id")
+        documents.append(document)
+    collection.insert_many(documents)
+    try:
+        yield name
+    finally:
+        client.drop_database(name)
+        client.close()
+
+
+# Function to collect the stages of a query plan, in the classic and in the slot based execution formats
+def plan_stages(plan) -> list[str]:
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in plan_stages(item)]
+    if not isinstance(plan, dict):
+        return []
+    stages = [plan["stage"]] if "stage" in plan else []
+    for value in plan.values():
+        stages.extend(plan_stages(value))
+    return stages
+
+
+async def explain(db_name: str, search: ProductSearchFilter) -> dict:
+    client = AsyncIOMotorClient(settings.DB_CONNECTION, serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS)
+    try:
+        return await ProductsRepository(client[db_name]).explain_search(search)
+    finally:
+        client.close()
+
+
+@pytest.mark.parametrize('search', SEARCHES.values(), ids=SEARCHES.keys())
+def test_search_uses_an_index(db_name: str, search: ProductSearchFilter):
+    stages = plan_stages(asyncio.run(explain(db_name, search))["queryPlanner"]["winningPlan"])
+
+    assert 'COLLSCAN' not in stages
+    assert {'IXSCAN', 'TEXT', 'TEXT_MATCH', 'TEXT_OR'} & set(stages)
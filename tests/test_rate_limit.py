@@ -0,0 +1,72 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from core.config import RateLimit, RouteRateLimit, settings
+from utils.rate_limit_middleware import RateLimitMiddleware
+
+LIMITS = {
+    "/auth/login": RouteRateLimit(ip=RateLimit(requests=5, seconds=60), account=RateLimit(requests=2, seconds=60),
+                                  account_field="username"),
+}
+
+
+# Function to build the middleware around an app that answers with the body it got
+def build_client() -> TestClient:
+    echo_app = FastAPI()
+
+    @echo_app.post(f'{settings.API_STR}/auth/login')
+    @echo_app.post(f'{settings.API_STR}/products')
+    async def echo(request: Request) -> dict:
+        return {"body": (await request.body()).decode()}
+
+    return TestClient(RateLimitMiddleware(echo_app))
+
+
+@pytest.fixture
+def limited_client(monkeypatch) -> TestClient:
+    monkeypatch.setattr(settings, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(settings, 'RATE_LIMITS', LIMITS)
+    return build_client()
+
+
+def login(client: TestClient, username: str):
+    return client.post(f'{settings.API_STR}/auth/login', json={'username': username, 'password': 'x'})
+
+
+def test_account_limit_answers_429_with_retry_after(limited_client):
+    assert [login(limited_client, 'user1').status_code for _ in range(2)] == [200, 200]
+
+    response = login(limited_client, 'User1 ')
+
+    assert response.status_code == 429
+    assert 0 < int(response.headers['Retry-After']) <= 60
+    assert response.json()["errors"][0]["location"] == 'request.body'
+    assert login(limited_client, 'user2').status_code == 200
+
+
+def test_ip_limit_answers_429_for_every_account(limited_client):
+    statuses = [login(limited_client, f'user{number}').status_code for number in range(6)]
+
+    assert statuses == [200] * 5 + [429]
+    assert limited_client.post(f'{settings.API_STR}/auth/login', content=b'').status_code == 429
+
+
+def test_body_reaches_the_app(limited_client):
+    response = limited_client.post(f'{settings.API_STR}/auth/login', data={'username': 'user1'})
+
+    assert response.status_code == 200
+    assert response.json() == {"body": "username=user1"}
+
+
+def test_paths_without_limit_are_not_limited(limited_client):
+    statuses = {limited_client.post(f'{settings.API_STR}/products', json={}).status_code for _ in range(10)}
+
+    assert statuses == {200}
+
+
+def test_disabled_limits_let_every_request_through(monkeypatch):
+    monkeypatch.setattr(settings, 'RATE_LIMITS', LIMITS)
+    client = build_client()
+
+    assert {login(client, 'user1').status_code for _ in range(10)} == {200}
@@ -0,0 +1,90 @@
+from repositories.products_summary import ProductsSummaryRepository
+from tests.utils import PASSWORD, auth_headers, create_user
+
+PRODUCT = {'product_code': 1, 'product_name': 'Radio', 'product_category': 'c', 'product_brand': 'b',
+           'product_unit_presentation': 'u', 'product_quantity_presentation': 1, 'product_price': 1.5,
+           'supplier_name': 's'}
+
+
+def create_product(client, **changes) -> str:
+    response = client.post('/api/products', json={**PRODUCT, **changes})
+    assert response.status_code == 200, response.text
+    return response.json()["data"]["_id"]
+
+
+def stats(client, live: bool = False) -> dict:
+    response = client.get('/api/products/stats', params={'live': 'true'} if live else {})
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+def test_disabled_product_is_hidden_until_restored(client):
+    product_id = create_product(client)
+
+    assert client.patch(f'/api/products/disable/{product_id}').status_code == 200
+    assert client.get(f'/api/products/{product_id}').status_code == 404
+    assert client.get('/api/products/all/').status_code == 404
+    assert stats(client)["total_products"] == 0
+
+    assert client.patch(f'/api/products/restore/{product_id}').status_code == 200
+    assert client.get(f'/api/products/{product_id}').status_code == 200
+    assert stats(client)["total_products"] == 1
+
+
+def test_restore_of_an_active_product_is_not_found(client):
+    product_id = create_product(client)
+
+    assert client.patch(f'/api/products/restore/{product_id}').status_code == 404
+    assert client.patch('/api/products/restore/unknown').status_code == 404
+
+
+def test_bulk_disable_keeps_the_summary_equal_to_the_products(client):
+    create_product(client)
+    create_product(client, product_code=2, supplier_name='other', product_price=20.0)
+    create_product(client, product_code=3, product_category='d')
+
+    response = client.patch('/api/products/bulk/disable', json={'supplier_name': 's'})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["data"] == {'disabled': 2}
+    assert stats(client)["total_products"] == 1
+    assert stats(client) == stats(client, live=True)
+
+
+def test_bulk_disable_rebuilds_the_summary_when_its_update_fails(client, monkeypatch):
+    create_product(client)
+    create_product(client, product_code=2, supplier_name='other')
+
+    async def apply_changes(self, removed=(), added=()) -> None:
+        raise RuntimeError('summary down')
+
+    monkeypatch.setattr(ProductsSummaryRepository, 'apply_changes', apply_changes)
+    response = client.patch('/api/products/bulk/disable', json={'supplier_name': 's'})
+    monkeypatch.undo()
+
+    assert response.status_code == 200, response.text
+    assert client.get('/api/products/all/').json()["data"][0]["supplier_name"] == 'other'
+    assert stats(client) == stats(client, live=True)
+    assert stats(client)["total_products"] == 1
+
+
+def test_disabled_user_is_restored_with_its_password(client):
+    user_id, tokens = create_user(client)
+    assert client.patch(f'/api/users/disable/{user_id}', headers=auth_headers(tokens)).status_code == 200
+    login = {'username': 'user1', 'password': PASSWORD}
+    assert client.post('/api/auth/login', json=login).status_code != 200
+
+    wrong_password = client.patch('/api/users/restore', json={**login, 'password': 'Wrong-passw0rd!'})
+    assert wrong_password.status_code == 401
+    assert client.post('/api/auth/login', json=login).status_code != 200
+
+    assert client.patch('/api/users/restore', json=login).status_code == 200
+    assert client.post('/api/auth/login', json=login).status_code == 200
+
+
+def test_restore_of_an_active_user_is_rejected_like_a_wrong_login(client):
+    create_user(client)
+
+    response = client.patch('/api/users/restore', json={'username': 'user1', 'password': PASSWORD})
+
+    assert response.status_code == 401
@@ -0,0 +1,37 @@
+import json
+
+from tests.utils import auth_headers, create_user
+
+PRODUCT = {'product_code': 1, 'product_name': 'Radio', 'product_category': 'c', 'product_brand': 'b',
+           'product_unit_presentation': 'u', 'product_quantity_presentation': 1, 'product_price': 1.5,
+           'supplier_name': 's'}
+
+
+def stream_rows(response) -> list[dict]:
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def page_rows(response) -> list[dict]:
+    assert response.status_code == 200
+    return [{key: value for key, value in row.items() if value is not None} for row in response.json()["data"]]
+
+
+def test_products_stream_has_the_fields_of_the_page(client):
+    client.post('/api/products', json=PRODUCT)
+
+    page = page_rows(client.get('/api/products/all/'))
+    stream = stream_rows(client.get('/api/products/all/', params={'stream': 'true'}))
+
+    assert stream == page
+    assert '_id' in stream[0]
+
+
+def test_users_stream_has_the_fields_of_the_page(client):
+    _, tokens = create_user(client)
+
+    page = page_rows(client.get('/api/users', headers=auth_headers(tokens)))
+    stream = stream_rows(client.get('/api/users', headers=auth_headers(tokens), params={'stream': 'true'}))
+
+    assert stream == page
@@ -0,0 +1,25 @@
+from fastapi.testclient import TestClient
+
+PASSWORD = 'Passw0rd!'
+
+
+# Function to run a coroutine function of the app, like a repository call, in the event loop of the client
+def run(client: TestClient, func, *args):
+    return client.portal.call(func, *args)
+
+
+# Function to create a verified user and log it in, returns its id and the tokens of the session
+def create_user(client: TestClient, username: str = 'user1') -> tuple[str, dict]:
+    response = client.post('/api/users', json={'username': username, 'full_name': 'Test User',
+                                               'email': f'{username}@example.com', 'password': PASSWORD})
+    assert response.status_code == 200, response.text
+    user = run(client, client.app.database.users.find_one_and_update, {"username": username},
+               {"$set": {"is_verified": True}})
+    user_id = user["_id"]
+    response = client.post('/api/auth/login', json={'username': username, 'password': PASSWORD})
+    assert response.status_code == 200, response.text
+    return user_id, response.json()["data"]
+
+
+def auth_headers(tokens: dict) -> dict:
+    return {'Authorization': f'Bearer {tokens["access_token"]}'}
@@ -1,8 +1,8 @@
 from fastapi import Request
-from fastapi.responses import JSONResponse
 
 from core.api_response import ApiResponse
 from core.errors import UnauthorizedError, InvalidParameterError
+from utils.response_handler import build_response
 
 
 async def auth_validation_error_handler(request: Request, exception: UnauthorizedError):
@@ -10,14 +10,14 @@ async def auth_validation_error_handler(request: Request, exception: Unauthorize
     api_response.status = exception.status
     api_response.add_error(exception)
     api_response.logger.error(exception)
-    return JSONResponse(content=api_response.set_result, status_code=exception.status.code)
+    return build_response(api_response)
 
 async def invalid_password_error_handler(request: Request, exception: InvalidParameterError):
     api_response = ApiResponse()
     api_response.status = exception.status
     api_response.add_error(exception)
     api_response.logger.error(exception)
-    return JSONResponse(content=api_response.set_result, status_code=exception.status.code)
+    return build_response(api_response)
 
 
 
@@ -1,27 +1,142 @@
 import logging
+import queue
+import random
+import reprlib
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 
+from core.config import settings
 
-def logger_api(id_logger_: str):
-    logger = logging.getLogger(id_logger_)
+LOGGER_NAME = 'api'
+DEFAULT_PROCESS_ID = '-'
 
-    # Avoid reconfiguring the logger if it has already been configured
-    if not logger.hasHandlers():
-        logger.setLevel(logging.INFO)
+_log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+_listener: QueueListener | None = None
+
+
+class ProcessIdFilter(logging.Filter):
+    # Records logged outside a request (startup, shutdown) have no process id
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'process_id'):
+            record.process_id = DEFAULT_PROCESS_ID
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    dropped_records: int = 0
+
+    # Drop the record instead of blocking the event loop when the queue is full
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped_records += 1
+
+
+# Function to build the console and file handlers run by the listener thread
+def _build_handlers() -> list[logging.Handler]:
+    # Log format
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s: %(process_id)s - %(message)s',
+                                  datefmt='%m/%d/%Y %I:%M:%S %p')
 
-        # Log format
-        formatter = logging.Formatter(f'%(asctime)s - %(levelname)s: {id_logger_} - %(message)s',
-                                      datefmt='%m/%d/%Y %I:%M:%S %p')
+    # StreamHandler to print to console
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
 
-        # StreamHandler to print to console
-        stream_handler = logging.StreamHandler()
-        stream_handler.setFormatter(formatter)
+    # File handler to save logs to a file, rotated by time when LOG_ROTATE_WHEN is set and by size otherwise
+    if settings.LOG_ROTATE_WHEN:
+        file_handler = TimedRotatingFileHandler(settings.LOG_FILE, when=settings.LOG_ROTATE_WHEN,
+                                                interval=settings.LOG_ROTATE_INTERVAL,
+                                                backupCount=settings.LOG_BACKUP_COUNT, encoding='utf-8', delay=True)
+    else:
+        file_handler = RotatingFileHandler(settings.LOG_FILE, maxBytes=settings.LOG_MAX_BYTES,
+                                           backupCount=settings.LOG_BACKUP_COUNT, encoding='utf-8', delay=True)
+    file_handler.setFormatter(formatter)
+    return [stream_handler, file_handler]
 
-        # FileHandler to save logs to a file
-        file_handler = logging.FileHandler("logs/data_processor.log")
-        file_handler.setFormatter(formatter)
 
-        # Add both handlers
-        logger.addHandler(stream_handler)
-        logger.addHandler(file_handler)
+def _build_logger() -> logging.Logger:
+    logger = logging.getLogger(LOGGER_NAME)
 
+    # Avoid reconfiguring the logger if it has already been configured
+    if logger.handlers:
+        return logger
+
+    logger.setLevel(settings.LOG_LEVEL)
+    logger.propagate = False
+
+    # Handlers run in the listener thread, so requests never wait on console or disk I/O
+    queue_handler = NonBlockingQueueHandler(_log_queue)
+    queue_handler.addFilter(ProcessIdFilter())
+    logger.addHandler(queue_handler)
+
+    # Modules without a level of their own log at LOG_LEVEL
+    for module_name, level in settings.LOG_LEVELS.items():
+        logging.getLogger(f'{LOGGER_NAME}.{module_name}').setLevel(level.upper())
+
+    start_logger()
     return logger
+
+
+# Function to start the listener thread, it does nothing when it is running. The application starts it again
+# after a stop_logger, e.g. when the same process runs the lifespan twice
+def start_logger() -> None:
+    global _listener
+    if _listener is None:
+        _listener = QueueListener(_log_queue, *_build_handlers(), respect_handler_level=True)
+        _listener.start()
+
+
+def stop_logger() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+api_logger = _build_logger()
+
+# Keyword arguments of the logging calls that are not fields
+_LOGGING_KWARGS = {'exc_info', 'stack_info', 'stacklevel', 'extra'}
+
+
+# Repr with bounded nesting and sizes, a long list or a large document never becomes a long string
+def _build_field_repr() -> reprlib.Repr:
+    field_repr = reprlib.Repr()
+    field_repr.maxlevel = 3
+    field_repr.maxdict = field_repr.maxlist = field_repr.maxtuple = field_repr.maxset = 10
+    field_repr.maxstring = field_repr.maxother = settings.LOG_FIELD_MAX_LENGTH
+    return field_repr
+
+
+_field_repr = _build_field_repr()
+
+
+def render_field(value) -> str:
+    rendered = value if isinstance(value, str) else _field_repr.repr(value)
+    if len(rendered) > settings.LOG_FIELD_MAX_LENGTH:
+        return f'{rendered[:settings.LOG_FIELD_MAX_LENGTH]}...'
+    return rendered
+
+
+# Adapter with structured fields given as keyword arguments, e.g. logger.info('Instance found', _id=_id).
+# The fields are only rendered when the level is enabled, so a disabled call costs a level check
+class StructuredLogger(logging.LoggerAdapter):
+    def process(self, msg, kwargs):
+        fields = [f'{key}={render_field(kwargs.pop(key))}' for key in list(kwargs) if key not in _LOGGING_KWARGS]
+        kwargs["extra"] = {**self.extra, **kwargs.get("extra", {})}
+        if fields:
+            msg = f'{msg} {" ".join(fields)}'
+        return msg, kwargs
+
+    # Function to log a whole document or list at debug level, only for a sample of the calls
+    def payload(self, msg: str, payload, **fields) -> None:
+        if not self.isEnabledFor(logging.DEBUG) or random.random() >= settings.LOG_PAYLOAD_SAMPLE_RATE:
+            return
+        self.log(logging.DEBUG, msg, payload=payload, **fields)
+
+
+def logger_api(id_logger_: str, module_name: str | None = None) -> StructuredLogger:
+    logger = api_logger.getChild(module_name) if module_name else api_logger
+    return StructuredLogger(logger, {'process_id': id_logger_})
@@ -0,0 +1,41 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import http_request_duration_seconds, http_requests_in_progress, http_requests_total
+
+UNMATCHED_ROUTE = 'unmatched'
+
+
+# ASGI middleware that records the latency and status of every request, labeled with the route template
+# so the paths with ids do not create a series per id. Streamed responses are timed until the last chunk
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            http_requests_in_progress.dec(method)
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", UNMATCHED_ROUTE)
+            http_request_duration_seconds.observe(duration, method, route_path)
+            http_requests_total.inc(method, route_path, str(status_code))
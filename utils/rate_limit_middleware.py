@@ -0,0 +1,113 @@
+import json
+import math
+from urllib.parse import parse_qs
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.api_response import ApiResponse
+from core.config import RouteRateLimit, settings
+from core.errors import TooManyRequestsError
+from core.metrics import http_requests_rate_limited_total
+from core.rate_limit import RateLimitBackend, build_rate_limit_backend
+from models.response_model import LocationError
+from utils.response_handler import build_response
+
+# Longer account values are cut, so the keys of the buckets stay small
+MAX_ACCOUNT_LENGTH = 256
+
+
+async def read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b''))
+        if not message.get("more_body", False):
+            break
+    return b''.join(chunks)
+
+
+# Function to give the app a body that was already read, the next messages like a disconnect come from the client
+def replay_body(body: bytes, receive: Receive) -> Receive:
+    sent = False
+
+    async def replay() -> Message:
+        nonlocal sent
+        if sent:
+            return await receive()
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return replay
+
+
+# Function to get the account of a login body, before the endpoint parses it
+def account_of(body: bytes, content_type: str, field: str) -> str | None:
+    try:
+        if content_type.startswith('application/json'):
+            data = json.loads(body)
+            value = data.get(field) if isinstance(data, dict) else None
+        elif content_type.startswith('application/x-www-form-urlencoded'):
+            value = next(iter(parse_qs(body.decode('utf-8')).get(field, [])), None)
+        else:
+            return None
+    except ValueError:
+        return None
+    if not isinstance(value, str) or not value.strip():
+        return None
+    return value.strip().lower()[:MAX_ACCOUNT_LENGTH]
+
+
+# ASGI middleware that limits the requests to the expensive auth endpoints by client IP and by account.
+# Rejected requests are answered before the body is parsed and before any database or bcrypt work
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, backend: RateLimitBackend | None = None):
+        self.app = app
+        self.backend = backend or build_rate_limit_backend()
+        self.limits: dict[str, RouteRateLimit] = {
+            f'{settings.API_STR}{path}': limit for path, limit in settings.RATE_LIMITS.items()}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        route_limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if route_limit is None or not settings.RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        # The client is the proxy itself unless uvicorn runs with --proxy-headers
+        client_ip = scope["client"][0] if scope.get("client") else 'unknown'
+        retry_after = await self.backend.acquire(f'{path}:ip:{client_ip}', route_limit.ip)
+        if retry_after:
+            await self.reject(scope, receive, send, 'ip', retry_after, LocationError.Headers)
+            return
+
+        if route_limit.account and route_limit.account_field:
+            body = await read_body(receive)
+            receive = replay_body(body, receive)
+            headers = dict(scope["headers"])
+            content_type = headers.get(b'content-type', b'').decode('latin-1')
+            account = account_of(body, content_type, route_limit.account_field)
+            if account is not None:
+                retry_after = await self.backend.acquire(f'{path}:account:{account}', route_limit.account)
+                if retry_after:
+                    await self.reject(scope, receive, send, 'account', retry_after, LocationError.Body)
+                    return
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def reject(scope: Scope, receive: Receive, send: Send, limit: str, retry_after: float,
+                     location: LocationError) -> None:
+        retry_after_seconds = math.ceil(retry_after)
+        api_response = ApiResponse()
+        error = TooManyRequestsError(message=f'Too many requests, retry in {retry_after_seconds} seconds',
+                                     location=location)
+        api_response.status = error.status
+        api_response.add_error(error)
+        api_response.logger.warning(str(error), limit=limit, path=scope["path"])
+        http_requests_rate_limited_total.inc(scope["path"], limit)
+
+        response = build_response(api_response)
+        response.headers["Retry-After"] = str(retry_after_seconds)
+        await response(scope, receive, send)
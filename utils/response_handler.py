@@ -1,19 +1,59 @@
 import functools
+import typing
 
 from fastapi import Request, Response
+from pydantic import TypeAdapter, ValidationError
 
+from core.api_response import ApiResponse, set_current_api_response
 from core.errors import InvalidParameterError, NotFoundError, ForbiddenError, UnauthorizedError, UnexpectedError, \
-    InvalidCredentialsError
-from models.response_model import LocationError
+    InvalidCredentialsError, ServiceUnavailableError, ConflictError
+from core.idempotency import IDEMPOTENCY_KEY_HEADER, run_idempotent
+from models.response_model import LocationError, ResponseModel
 
 
-def response_handler(raw_response: bool = False):
+@functools.cache
+def get_type_adapter(response_type: typing.Any) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+
+# Function to serialize the result straight to JSON bytes, without FastAPI validating and encoding it again
+def build_response(api_response: ApiResponse, response_type: typing.Any = ResponseModel, raw_response: bool = False,
+                   response: Response | None = None) -> Response:
+    # The errors always go in the envelope, the raw response model only describes the data of a success
+    if api_response.errors:
+        response_type, raw_response = ResponseModel, False
+    response_adapter = get_type_adapter(response_type)
+    result = api_response.data if raw_response else api_response.set_result
+    try:
+        content = response_adapter.dump_json(response_adapter.validate_python(result), by_alias=True)
+    except ValidationError as error:
+        unexpected_error = UnexpectedError(message=error.__str__(), location=LocationError.Server)
+        api_response.status = unexpected_error.status
+        api_response.data = None
+        api_response.add_error(unexpected_error)
+        api_response.logger.error(unexpected_error)
+        response_adapter = get_type_adapter(ResponseModel)
+        content = response_adapter.dump_json(response_adapter.validate_python(api_response.set_result))
+
+    json_response = Response(content=content, status_code=api_response.status.code, media_type="application/json")
+    if response is not None:
+        json_response.raw_headers.extend(response.headers.raw)
+    return json_response
+
+
+# With idempotent=True, requests with an Idempotency-Key header run once and the response is replayed for retries
+def response_handler(raw_response: bool = False, idempotent: bool = False):
     def decorator(func):
-        @functools.wraps(func)
-        async def wrapper(request: Request, response: Response, *args, **kwargs):
+        # The response model adapter is built once, when the endpoint is declared
+        response_type = typing.get_type_hints(func).get('return', ResponseModel)
+        get_type_adapter(response_type)
+
+        async def handle(request: Request, response: Response, *args, **kwargs) -> Response:
             api_response = kwargs.get('api_response')
             try:
                 result = await func(request, response, *args, **kwargs)
+                if isinstance(result, Response):
+                    return result
                 if result:
                     api_response.data = result
             except InvalidParameterError as error:
@@ -36,17 +76,50 @@ def response_handler(raw_response: bool = False):
                 api_response.status = error.status
                 api_response.add_error(error)
                 api_response.logger.error(error)
+            except ConflictError as error:
+                api_response.status = error.status
+                api_response.add_error(error)
+                api_response.logger.error(error)
+            except ServiceUnavailableError as error:
+                api_response.status = error.status
+                api_response.add_error(error)
+                api_response.logger.error(error)
+            except Exception as error:
+                unexpected_error = UnexpectedError(message=error.__str__(), location=LocationError.Server)
+                api_response.status = unexpected_error.status
+                api_response.add_error(unexpected_error)
+                api_response.logger.error(unexpected_error)
+
+            return build_response(api_response, response_type, raw_response, response)
+
+        @functools.wraps(func)
+        async def wrapper(request: Request, response: Response, *args, **kwargs):
+            set_current_api_response(kwargs.get('api_response'))
+            idempotency_key = request.headers.get(IDEMPOTENCY_KEY_HEADER) if idempotent else None
+            if not idempotency_key:
+                return await handle(request, response, *args, **kwargs)
+
+            api_response = kwargs.get('api_response')
+            token_data = kwargs.get('token_data')
+            try:
+                return await run_idempotent(request, api_response, idempotency_key,
+                                            functools.partial(handle, request, response, *args, **kwargs),
+                                            token_data.id if token_data else None)
+            except InvalidParameterError as error:
+                api_response.status = error.status
+                api_response.add_error(error)
+                api_response.logger.error(error)
+            except ConflictError as error:
+                api_response.status = error.status
+                api_response.add_error(error)
+                api_response.logger.error(error)
             except Exception as error:
                 unexpected_error = UnexpectedError(message=error.__str__(), location=LocationError.Server)
                 api_response.status = unexpected_error.status
                 api_response.add_error(unexpected_error)
                 api_response.logger.error(unexpected_error)
 
-            response.status_code = api_response.status.code
-            if raw_response:
-                return api_response.data
-            else:
-                return api_response.set_result
+            return build_response(api_response, response=response)
 
         return wrapper
 
@@ -0,0 +1,21 @@
+from typing import AsyncIterator
+
+from pydantic import BaseModel
+
+
+# Function to split a stream of byte chunks into text lines without reading it all in memory
+async def iter_lines(chunks: AsyncIterator[bytes], encoding: str = 'utf-8') -> AsyncIterator[str]:
+    pending = b''
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield line.rstrip(b'\r').decode(encoding)
+    if pending:
+        yield pending.rstrip(b'\r').decode(encoding)
+
+
+# Function to send each document of a stream as an NDJSON line, with the field names of the JSON responses like _id
+async def iter_ndjson(documents: AsyncIterator[dict], model: type[BaseModel]) -> AsyncIterator[str]:
+    async for document in documents:
+        yield model.model_validate(document).model_dump_json(by_alias=True, exclude_none=True) + '\n'